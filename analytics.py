@@ -0,0 +1,205 @@
+# analytics.py
+#!/usr/env/bin python3
+
+"""
+Fee and menu statistics computed with NumPy over the whole guest list at once.
+
+Guests are loaded into a guest_store.GuestColumns, whose typed arrays NumPy reads without copying:
+fees as float64, member types and menu items as uint8 codes. Totals, means, percentiles and cross-tabs
+are then a handful of vectorized passes, which keeps the finance report fast on very large events.
+
+NumPy is optional; without it the finance report says so and the other reports work as before.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import guest_management
+from guest_store import GuestColumns
+from member_types import PAYING_TYPES
+
+# Fee percentiles shown in the finance report
+PERCENTILES = (25, 50, 75, 90)
+
+
+def available():
+    """
+    Returns:
+        bool: True if NumPy is installed.
+    """
+    return np is not None
+
+
+def _view(column, dtype):
+    # Share the array's memory instead of copying it
+    return np.frombuffer(column, dtype=dtype) if len(column) else np.zeros(0, dtype)
+
+
+class GuestArrays:
+    """
+    NumPy views over a GuestColumns store.
+    """
+
+    def __init__(self, store):
+        """
+        Args:
+            store (GuestColumns): The guests to analyse.
+        """
+        self.member_types = list(store.member_types.values)
+        self.menu_items = list(store.menu_items.values)
+        self.party_ids = _view(store.party_ids, np.int64)
+        self.fees = _view(store.amt_paid, np.float64)
+        self.member_type_codes = _view(store.member_type_codes, np.uint8)
+        self.menu_item_codes = _view(store.menu_item_codes, np.uint8)
+
+    def __len__(self):
+        return len(self.fees)
+
+
+def load(store=None):
+    """
+    Load the guest list into arrays.
+
+    Args:
+        store (GuestColumns): Guests already in memory. Defaults to every guest, from the local replica if there is one.
+
+    Returns:
+        GuestArrays: The arrays, or None if NumPy is not installed.
+    """
+    if np is None:
+        print("NumPy is not installed. Install it with 'pip install numpy' to use the finance report.")
+        return None
+    return GuestArrays(store if store is not None else GuestColumns(guest_management.iter_guests()))
+
+
+def fee_summary(guests):
+    """
+    Args:
+        guests (GuestArrays): The guests.
+
+    Returns:
+        dict: "count", "total", "mean", "min", "max" and "percentiles" (a dict keyed by PERCENTILES) of amt_paid.
+    """
+    if not len(guests):
+        return {"count": 0, "total": 0.0, "mean": 0.0, "min": 0.0, "max": 0.0,
+                "percentiles": dict.fromkeys(PERCENTILES, 0.0)}
+
+    values = np.percentile(guests.fees, PERCENTILES)
+    return {
+        "count": len(guests),
+        "total": float(guests.fees.sum()),
+        "mean": float(guests.fees.mean()),
+        "min": float(guests.fees.min()),
+        "max": float(guests.fees.max()),
+        "percentiles": {percentile: float(value) for percentile, value in zip(PERCENTILES, values)},
+    }
+
+
+def fees_by_member_type(guests):
+    """
+    Args:
+        guests (GuestArrays): The guests.
+
+    Returns:
+        dict: For each member type, a tuple (guest count, total paid, mean paid).
+    """
+    width = len(guests.member_types)
+    counts = np.bincount(guests.member_type_codes, minlength=width)
+    totals = np.bincount(guests.member_type_codes, weights=guests.fees, minlength=width)
+    means = np.divide(totals, counts, out=np.zeros(width), where=counts > 0)
+    return {type_: (int(counts[code]), float(totals[code]), float(means[code]))
+            for code, type_ in enumerate(guests.member_types)}
+
+
+def menu_cross_tab(guests):
+    """
+    Count guests per member type and menu item.
+
+    Args:
+        guests (GuestArrays): The guests.
+
+    Returns:
+        numpy.ndarray: Counts with one row per guests.member_types entry and one column per guests.menu_items entry.
+    """
+    rows, columns = len(guests.member_types), len(guests.menu_items)
+    cells = guests.member_type_codes.astype(np.intp) * columns + guests.menu_item_codes
+    return np.bincount(cells, minlength=rows * columns).reshape(rows, columns)
+
+
+def outstanding_payments(guests, paying_types=PAYING_TYPES):
+    """
+    Find paying guests who haven't paid anything yet.
+
+    Args:
+        guests (GuestArrays): The guests.
+        paying_types (iterable): Member types expected to pay.
+
+    Returns:
+        dict: "count", "share" (of paying guests) and "party_ids" of unpaid guests, and "by_type",
+              the unpaid count per paying type.
+    """
+    codes = [code for code, type_ in enumerate(guests.member_types) if type_ in paying_types]
+    paying = np.isin(guests.member_type_codes, codes)
+    unpaid = paying & (guests.fees <= 0)
+    unpaid_counts = np.bincount(guests.member_type_codes[unpaid], minlength=len(guests.member_types))
+
+    paying_count = int(paying.sum())
+    unpaid_count = int(unpaid.sum())
+    return {
+        "count": unpaid_count,
+        "share": unpaid_count / paying_count if paying_count else 0.0,
+        "party_ids": guests.party_ids[unpaid].tolist(),
+        "by_type": {guests.member_types[code]: int(unpaid_counts[code]) for code in codes},
+    }
+
+
+def generate_finance_report(store=None):
+    """
+    Build the finance summary report: fee statistics, fees per member type, outstanding payments and
+    a menu by member type cross-tab.
+
+    Args:
+        store (GuestColumns): Guests already in memory. Defaults to every guest, from the local replica if there is one.
+
+    Returns:
+        str: The report text.
+    """
+    guests = load(store)
+    if guests is None:
+        return "The finance report requires NumPy (pip install numpy)."
+    if not len(guests):
+        return "No guests found."
+
+    summary = fee_summary(guests)
+    report = ["** Finance Report **"]
+    report.append("-" * 44)
+    report.append(f"Guests:          {summary['count']}")
+    report.append(f"Total Fees Paid: ${summary['total']:.2f}")
+    report.append(f"Mean Fee:        ${summary['mean']:.2f}")
+    report.append(f"Lowest/Highest:  ${summary['min']:.2f} / ${summary['max']:.2f}")
+    report.append("Percentiles:     " + ", ".join(f"p{percentile} ${value:.2f}"
+                                                    for percentile, value in summary["percentiles"].items()))
+
+    report.append("")
+    report.append(f"| {'Type'.ljust(21)} | {'Count'.rjust(7)} | {'Paid'.rjust(11)} | {'Mean'.rjust(8)} |")
+    report.append("-" * 60)
+    for type_, (count, total, mean) in fees_by_member_type(guests).items():
+        if count:
+            report.append(f"| {type_.ljust(21)} | {str(count).rjust(7)} | {f'${total:.2f}'.rjust(11)} | {f'${mean:.2f}'.rjust(8)} |")
+    report.append("-" * 60)
+
+    unpaid = outstanding_payments(guests)
+    report.append("")
+    report.append(f"Outstanding Payments: {unpaid['count']} ({unpaid['share']:.1%} of paying guests)")
+    for type_, count in unpaid["by_type"].items():
+        report.append(f"  {type_}: {count}")
+
+    table = menu_cross_tab(guests)
+    report.append("")
+    report.append("| " + "Type".ljust(21) + " |" + "".join(f" {item.ljust(7)} |" for item in guests.menu_items))
+    for code, type_ in enumerate(guests.member_types):
+        if table[code].any():
+            report.append(f"| {type_.ljust(21)} |" + "".join(f" {str(count).ljust(7)} |" for count in table[code]))
+
+    return "\n".join(report)
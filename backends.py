@@ -0,0 +1,415 @@
+# backends.py
+#!/usr/env/bin python3
+
+"""
+Storage backends used by database.py. Each backend knows how to open a connection and which exception
+type its driver raises; the SQL in database.py is written once, with %s placeholders, and runs on all of them.
+
+    MySQLBackend  - The MySQL server used by the event (requires mysql-connector-python)
+    SQLiteBackend - An embedded SQLite file (or in-memory database) needing no server, for small venues,
+                    testing and benchmarks
+"""
+import sqlite3
+import threading
+
+from member_types import MEMBER_TYPES
+from menu_choices import FOOD_OPTIONS
+
+# Indexes matching the app's queries: (name suffix, columns)
+# (l_name, party_id) serves name order and its keyset pages; f_name serves the first-name half of searches
+GUEST_INDEXES = [
+    ("member_type", "member_type"),
+    ("menu_item", "menu_item"),
+    ("last_name", "l_name, party_id"),
+    ("first_name", "f_name"),
+]
+
+# Indexes from earlier versions that GUEST_INDEXES replaced: name suffixes
+RETIRED_INDEXES = ["name"]
+
+# Member types and menu items are stored as text rather than ENUM, so they sort by value like the keyset
+# comparisons in database.py do (an ENUM sorts by its position in the list); the app checks the values
+CATEGORY_TYPES = {"member_type": "VARCHAR(30)", "menu_item": "VARCHAR(20)"}
+
+
+class MySQLBackend:
+    """
+    MySQL server backend. The driver is only imported when the first connection is made.
+    """
+
+    name = "mysql"
+    # Connections go to a host, so database.py picks one from its host list
+    networked = True
+    # Starts a transaction whose reads all see the database as of one moment
+    snapshot_statement = "START TRANSACTION WITH CONSISTENT SNAPSHOT"
+
+    def __init__(self):
+        self._connector = None
+
+    def _driver(self):
+        """
+        Import mysql.connector, offering to install mysql-connector-python if it is missing.
+
+        Returns:
+            module: The mysql.connector module.
+        """
+        if self._connector is None:
+            try:
+                import mysql.connector
+            except ImportError:
+                install = input("Required module 'mysql-connector-python' is missing. Install it now? (y/n)")
+
+                if install.lower() == 'y':
+                    print("Installing mysql-connector-python using pip...")
+                    #Run subprocess for pip to install mysql-connector-python
+                    import subprocess
+                    subprocess.check_call(["pip", "install", "mysql-connector-python"])
+                    import mysql.connector
+                else:
+                    print("Unable to proceed. Required module is not present and will not be installed. Exiting program.")
+                    exit()
+            self._connector = mysql.connector
+        return self._connector
+
+    @property
+    def Error(self):
+        """
+        The exception class raised by the driver.
+        """
+        return self._driver().Error
+
+    def connect(self, host, user, password, database, port=None, timeout=None):
+        """
+        Open a connection to a MySQL server.
+
+        Args:
+            port (int): Server port. Defaults to the driver's (3306).
+            timeout (float): Seconds to wait for the server before giving up. Defaults to the driver's.
+
+        Returns:
+            connection: MySQL database connection object. Raises Error on failure.
+        """
+        options = {}
+        if port is not None:
+            options["port"] = port
+        if timeout is not None:
+            options["connection_timeout"] = timeout
+        return self._driver().connect(host=host, user=user, password=password, database=database, **options)
+
+    def is_connected(self, connection):
+        """
+        Returns:
+            bool: True if the connection is still usable.
+        """
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    def table_statements(self, table_name):
+        """
+        Returns:
+            list: Statements creating the guest table, with fixed-point fees and text categories.
+        """
+        return [
+            f"CREATE TABLE IF NOT EXISTS {table_name} ("
+            f"party_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY, "
+            f"f_name VARCHAR(50) NOT NULL, "
+            f"l_name VARCHAR(50) NOT NULL, "
+            f"member_type {CATEGORY_TYPES['member_type']} NOT NULL, "
+            f"amt_paid DECIMAL(8, 2) NOT NULL DEFAULT 0, "
+            f"menu_item {CATEGORY_TYPES['menu_item']} NOT NULL)"
+        ]
+
+    def column_type_statements(self, table_name):
+        """
+        Returns:
+            list: Statements converting a hand-made guest table, or one with the ENUM categories of earlier
+                  versions, to the column types table_statements uses.
+        """
+        return [
+            f"ALTER TABLE {table_name} "
+            f"MODIFY f_name VARCHAR(50) NOT NULL, "
+            f"MODIFY l_name VARCHAR(50) NOT NULL, "
+            f"MODIFY member_type {CATEGORY_TYPES['member_type']} NOT NULL, "
+            f"MODIFY amt_paid DECIMAL(8, 2) NOT NULL DEFAULT 0, "
+            f"MODIFY menu_item {CATEGORY_TYPES['menu_item']} NOT NULL"
+        ]
+
+    def index_statements(self, table_name, existing=()):
+        """
+        Args:
+            table_name (str): Name of the guest table.
+            existing (iterable): Names of indexes that already exist (MySQL has no CREATE INDEX IF NOT EXISTS).
+
+        Returns:
+            list: Statements dropping RETIRED_INDEXES and creating the missing GUEST_INDEXES.
+        """
+        return ([f"DROP INDEX idx_{table_name}_{suffix} ON {table_name}"
+                 for suffix in RETIRED_INDEXES if f"idx_{table_name}_{suffix}" in existing] +
+                [f"CREATE INDEX idx_{table_name}_{suffix} ON {table_name} ({columns})"
+                 for suffix, columns in GUEST_INDEXES if f"idx_{table_name}_{suffix}" not in existing])
+
+    def index_names_query(self):
+        """
+        Returns:
+            str: Query listing the index names on a table, taking the table name as its parameter.
+        """
+        return "SELECT DISTINCT index_name FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s"
+
+    def explain(self, query):
+        """
+        Returns:
+            str: The statement asking for a query's plan.
+        """
+        return f"EXPLAIN {query}"
+
+    def scan_kind(self, columns, row):
+        """
+        Classify one row of EXPLAIN output.
+
+        Args:
+            columns (list): EXPLAIN column names.
+            row (tuple): One EXPLAIN row.
+
+        Returns:
+            str: "full scan" if every row of a table is read, "index scan" if a whole index is read,
+                 otherwise "lookup".
+        """
+        access = dict(zip(columns, row)).get("type")
+        if access == "ALL":
+            return "full scan"
+        if access == "index":
+            return "index scan"
+        return "lookup"
+
+
+class SQLiteCursor:
+    """
+    Wraps a sqlite3 cursor so it accepts the %s placeholders used throughout database.py.
+    """
+
+    def __init__(self, cursor, translate):
+        self._cursor = cursor
+        self._translate = translate
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._translate(query), params)
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(self._translate(query), seq_of_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class SQLiteConnection:
+    """
+    Wraps a sqlite3 connection with the small part of the mysql.connector connection API that database.py uses.
+    """
+
+    def __init__(self, connection, translate):
+        self._connection = connection
+        self._translate = translate
+        self._open = True
+
+    def cursor(self, buffered=None, prepared=None):
+        # SQLite steps through results lazily already and keeps compiled statements in its statement
+        # cache, so buffered and prepared are accepted and ignored
+        return SQLiteCursor(self._connection.cursor(), self._translate)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._open = False
+        self._connection.close()
+
+    def is_connected(self):
+        return self._open
+
+
+class SQLiteBackend:
+    """
+    Embedded SQLite backend. The database file is created, switched to WAL mode and given its table and
+    indexes on first use. A path of ":memory:" keeps the database in memory, shared by all pooled connections.
+    """
+
+    name = "sqlite"
+    networked = False
+    Error = sqlite3.Error
+    # Reads inside one transaction see the same snapshot of a WAL database
+    snapshot_statement = "BEGIN"
+
+    def __init__(self, path="partyplanner.db", table_name="party_info"):
+        """
+        Args:
+            path (str): Database file, or ":memory:" for an in-memory database.
+            table_name (str): Name of the guest table.
+        """
+        self.path = path
+        self.table_name = table_name
+        self._translated = {}
+        self._prepared = False
+        self._lock = threading.Lock()
+        self._keeper = None
+
+        if path == ":memory:":
+            # A named shared-cache memory database lives as long as one connection to it is open
+            self._target = f"file:partyplanner_{id(self)}?mode=memory&cache=shared"
+            self._keeper = sqlite3.connect(self._target, uri=True, check_same_thread=False)
+        else:
+            self._target = path
+
+    def _translate(self, query):
+        """
+        Convert %s placeholders to SQLite's ?, remembering each converted query.
+        """
+        translated = self._translated.get(query)
+        if translated is None:
+            translated = query.replace("%s", "?")
+            self._translated[query] = translated
+        return translated
+
+    def connect(self, **settings):
+        """
+        Open a connection to the SQLite database. Host and credential settings are ignored.
+
+        Returns:
+            SQLiteConnection: The connection. Raises Error on failure.
+        """
+        # cached_statements keeps the app's handful of queries compiled for reuse
+        connection = sqlite3.connect(self._target, uri=self._keeper is not None, check_same_thread=False,
+                                     timeout=10, cached_statements=256)
+        with self._lock:
+            if not self._prepared:
+                self._prepare(connection)
+                self._prepared = True
+        return SQLiteConnection(connection, self._translate)
+
+    def _prepare(self, connection):
+        """
+        Turn on WAL mode and create the guest table and its indexes if they don't exist yet.
+        """
+        if self._keeper is None:
+            connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.table_statements(self.table_name) + self.index_statements(self.table_name):
+            connection.execute(statement)
+        connection.commit()
+
+    def is_connected(self, connection):
+        """
+        Returns:
+            bool: True if the connection is still usable.
+        """
+        return connection.is_connected()
+
+    def table_statements(self, table_name):
+        """
+        Returns:
+            list: Statements creating the guest table. SQLite has no ENUM, so categories are checked instead.
+        """
+        member_types = ", ".join("'" + value.replace("'", "''") + "'" for value in MEMBER_TYPES)
+        menu_items = ", ".join("'" + value.replace("'", "''") + "'" for value in FOOD_OPTIONS)
+        return [
+            f"CREATE TABLE IF NOT EXISTS {table_name} ("
+            f"party_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            f"f_name TEXT NOT NULL, "
+            f"l_name TEXT NOT NULL, "
+            f"member_type TEXT NOT NULL CHECK (member_type IN ({member_types})), "
+            f"amt_paid REAL NOT NULL DEFAULT 0, "
+            f"menu_item TEXT NOT NULL CHECK (menu_item IN ({menu_items})))"
+        ]
+
+    def column_type_statements(self, table_name):
+        """
+        Returns:
+            list: Nothing; SQLite tables are created with their final column types.
+        """
+        return []
+
+    def index_statements(self, table_name, existing=()):
+        """
+        Returns:
+            list: Statements dropping RETIRED_INDEXES and creating GUEST_INDEXES if they don't exist.
+        """
+        return ([f"DROP INDEX IF EXISTS idx_{table_name}_{suffix}" for suffix in RETIRED_INDEXES] +
+                [f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{suffix} ON {table_name} ({columns})"
+                 for suffix, columns in GUEST_INDEXES if f"idx_{table_name}_{suffix}" not in existing])
+
+    def index_names_query(self):
+        """
+        Returns:
+            str: Query listing the index names on a table, taking the table name as its parameter.
+        """
+        return "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s"
+
+    def explain(self, query):
+        """
+        Returns:
+            str: The statement asking for a query's plan.
+        """
+        return f"EXPLAIN QUERY PLAN {query}"
+
+    def scan_kind(self, columns, row):
+        """
+        Classify one row of EXPLAIN QUERY PLAN output.
+
+        Args:
+            columns (list): EXPLAIN QUERY PLAN column names.
+            row (tuple): One plan row; its last column describes the step.
+
+        Returns:
+            str: "full scan" if every row of a table is read, "index scan" if a whole index is read,
+                 otherwise "lookup".
+        """
+        detail = str(row[-1])
+        if not detail.startswith("SCAN"):
+            return "lookup"
+        return "index scan" if "INDEX" in detail else "full scan"
+
+
+def create_backend(name, **options):
+    """
+    Create a backend by name.
+
+    Args:
+        name (str): "mysql" or "sqlite".
+        options: Backend settings, e.g. path for SQLite.
+
+    Returns:
+        The backend object.
+    """
+    if name == "mysql":
+        return MySQLBackend()
+    if name == "sqlite":
+        return SQLiteBackend(**options)
+    raise ValueError(f"Unknown database backend {name!r}")
@@ -0,0 +1,299 @@
+# benchmark.py
+#!/usr/env/bin python3
+
+"""
+Benchmarks the guest operations and reports against a synthetic guest population.
+
+By default the benchmark runs against an in-memory SQLite database so it needs no server; pass
+--backend mysql to measure the configured MySQL server instead (the table is written to, so don't
+point it at a live event). Results are printed and written as JSON so runs can be compared:
+
+    python benchmark.py --rows 100000 --output results.json
+    python benchmark.py --rows 100000 --compare results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import analytics
+import database
+import guest_management
+import reports
+import snapshots
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+               "Maria", "Luis", "Wei", "Aisha", "Kenji", "Priya", "Omar", "Olga", "Diego", "Fatima"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+              "Lee", "Perez", "Thompson", "White", "Harris", "Nguyen", "Patel", "Kim", "Chen", "Okafor"]
+
+# (member type, share of attendees, typical fee)
+MEMBER_TYPE_MIX = [
+    ("Guest", 0.45, 40.0),
+    ("Member", 0.40, 25.0),
+    ("Master of Ceremonies", 0.005, 0.0),
+    ("Keynote Speaker", 0.005, 0.0),
+    ("Kitchen Staff", 0.04, 0.0),
+    ("Waiter", 0.07, 0.0),
+    ("Usher", 0.03, 0.0),
+]
+# (menu item, share of attendees)
+MENU_MIX = [("BEEF", 0.25), ("CHICKEN", 0.30), ("FISH", 0.15), ("PORK", 0.10), ("PASTA", 0.12), ("VEGAN", 0.08)]
+# Share of paying attendees who haven't paid yet
+UNPAID_SHARE = 0.1
+
+
+def generate_guests(count, seed=168):
+    """
+    Generate a synthetic guest population with a realistic member type, menu and fee mix.
+
+    Args:
+        count (int): Number of guests to generate.
+        seed (int): Random seed, so runs are repeatable.
+
+    Yields:
+        tuple: Tuple containing guest information (f_name, l_name, member_type, amt_paid, menu_item).
+    """
+    rng = random.Random(seed)
+    types = [entry[0] for entry in MEMBER_TYPE_MIX]
+    type_weights = [entry[1] for entry in MEMBER_TYPE_MIX]
+    fees = {entry[0]: entry[2] for entry in MEMBER_TYPE_MIX}
+    menu_items = [entry[0] for entry in MENU_MIX]
+    menu_weights = [entry[1] for entry in MENU_MIX]
+
+    for _ in range(count):
+        member_type = rng.choices(types, type_weights)[0]
+        fee = fees[member_type]
+        if fee and rng.random() < UNPAID_SHARE:
+            fee = 0.0
+        yield (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), member_type, fee, rng.choices(menu_items, menu_weights)[0])
+
+
+def percentile(sorted_samples, fraction):
+    """
+    Args:
+        sorted_samples (list): Samples in ascending order.
+        fraction (float): Percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The sample at that percentile (nearest rank).
+    """
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+def measure(name, operation, calls, items_per_call=1, reset=None):
+    """
+    Time an operation, recording per-call latency and the peak memory it allocates.
+
+    The peak memory comes from one extra, untimed call (call number `calls`) made before the timed ones,
+    since tracing allocations slows Python down enough to distort the timings.
+
+    Args:
+        name (str): Name of the operation, used as the result key.
+        operation (callable): Called with the call number (0..calls).
+        calls (int): Number of times to time it.
+        items_per_call (int): Number of rows each call handles, for throughput.
+        reset (callable): Undoes the extra call's effects before the timed calls, e.g. by emptying the table.
+
+    Returns:
+        dict: calls, rows_per_second, p50_ms, p99_ms, mean_ms, total_s and peak_memory_kb.
+    """
+    samples = []
+    # The database functions print a line per call, which would swamp the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        operation(calls)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if reset is not None:
+            reset()
+
+        started = time.perf_counter()
+        for call in range(calls):
+            call_started = time.perf_counter()
+            operation(call)
+            samples.append(time.perf_counter() - call_started)
+        total = time.perf_counter() - started
+
+    samples.sort()
+    result = {
+        "calls": calls,
+        "rows_per_second": round(calls * items_per_call / total, 1) if total else 0.0,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(total / calls * 1000, 3) if calls else 0.0,
+        "total_s": round(total, 3),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+    print(f"{name:<22} {result['rows_per_second']:>12.1f} rows/s  p50 {result['p50_ms']:>9.3f} ms  "
+          f"p99 {result['p99_ms']:>9.3f} ms  peak {result['peak_memory_kb']:>10.1f} KB")
+    return result
+
+
+# Run in a fresh interpreter to time a cold start of the planner: imports, then building and drawing the
+# main window. It exits without waiting for the background work the window starts.
+STARTUP_SCRIPT = """
+import os
+import tkinter as tk
+import partyplanner_gui
+root = tk.Tk()
+partyplanner_gui.PartyPlannerGUI(root)
+root.update()
+root.destroy()
+os._exit(0)
+"""
+
+
+def measure_startup(runs=5, backend="sqlite", sqlite_path=":memory:"):
+    """
+    Time cold starts of the planner, each in a new Python process, so import-time work such as driver
+    loading or locale setup, and building the main window, shows up as latency.
+
+    Args:
+        runs (int): Number of processes to start.
+        backend (str): Backend the planner is started with.
+        sqlite_path (str): SQLite file the planner is started with.
+
+    Returns:
+        dict: The same fields as measure(), with one call per process, or None if the window couldn't be
+              created (e.g. there is no display).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        # Keeps the replica and journal the planner opens out of the working directory
+        environment = dict(os.environ, PARTYPLANNER_BACKEND=backend, PARTYPLANNER_SQLITE_PATH=sqlite_path,
+                           PARTYPLANNER_REPLICA=os.path.join(directory, "replica.db"),
+                           PARTYPLANNER_JOURNAL=os.path.join(directory, "journal.db"))
+        command = [sys.executable, "-c", STARTUP_SCRIPT]
+        try:
+            return measure("startup", lambda _: subprocess.run(command, check=True, env=environment, stdout=subprocess.DEVNULL,
+                                                               stderr=subprocess.PIPE), runs)
+        except subprocess.CalledProcessError as e:
+            reason = e.stderr.decode(errors="replace").strip().splitlines()
+            print(f"Skipping startup: the planner window could not be created ({reason[-1] if reason else e})")
+            return None
+
+
+def run_benchmarks(rows, calls=200, batch_size=None, seed=168):
+    """
+    Load a synthetic population and time every guest operation and report against it.
+
+    Args:
+        rows (int): Size of the guest population.
+        calls (int): Number of calls for the single-row operations.
+        batch_size (int): Batch size for the bulk load, defaults to database.BATCH_SIZE.
+        seed (int): Random seed for the population.
+
+    Returns:
+        dict: Results keyed by operation name.
+    """
+    results = {}
+
+    results["add_guests_bulk"] = measure("add_guests_bulk", lambda _: database.add_guests(generate_guests(rows, seed), batch_size), 1, rows,
+                                         reset=lambda: database.run_statements([f"DELETE FROM {database.TABLE_NAME}"]))
+
+    new_guests = list(generate_guests(calls + 1, seed + 1))
+    results["add_guest"] = measure("add_guest", lambda call: database.add_guest(new_guests[call]), calls)
+
+    results["list_guests_page"] = measure("list_guests_page", lambda _: database.query_guests(limit=database.PAGE_SIZE, order_by="l_name"),
+                                          calls, database.PAGE_SIZE)
+    results["list_guests_full"] = measure("list_guests_full", lambda _: database.list_guests(), 3, rows)
+    results["iter_guests_full"] = measure("iter_guests_full", lambda _: sum(1 for _ in database.iter_guests()), 3, rows)
+
+    ids = [row[0] for row in database.query_guests(limit=calls * 2)]
+    rng = random.Random(seed)
+    results["get_guest"] = measure("get_guest", lambda call: database.get_guest_details(ids[call % len(ids)]), calls)
+    results["get_guests_page"] = measure("get_guests_page", lambda call: database.get_guests(ids[:database.PAGE_SIZE]),
+                                         calls, min(len(ids), database.PAGE_SIZE))
+    results["modify_guest"] = measure("modify_guest",
+                                      lambda call: database.modify_guest(("UPDATE", ids[call % len(ids)], None, None, None, rng.choice([0.0, 25.0, 40.0]), None)),
+                                      calls)
+    results["delete_guest"] = measure("delete_guest", lambda call: database.delete_guest(ids[-(call + 1)]), min(calls, len(ids) - 1))
+
+    results["attendee_report"] = measure("attendee_report", lambda _: reports.generate_report("attendee"), 3, rows)
+    # The menu report's totals go through the guest cache, which would answer every call after the first
+    results["menu_report"] = measure("menu_report", lambda _: (guest_management.cache.clear(), reports.generate_report("menu")), 3, rows)
+    if analytics.available():
+        results["finance_report"] = measure("finance_report", lambda _: reports.generate_report("finance"), 3, rows)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "guests" + snapshots.SUFFIX)
+        results["snapshot_save"] = measure("snapshot_save", lambda _: snapshots.save(path), 3, rows)
+        results["snapshot_load"] = measure("snapshot_load", lambda _: snapshots.load(path).close(), 3, rows)
+        with snapshots.load(path) as snapshot:
+            results["snapshot_menu_report"] = measure("snapshot_menu_report", lambda _: reports.generate_report("menu", snapshot), 3, rows)
+
+    return results
+
+
+def compare(results, previous):
+    """
+    Print how each operation's throughput and p99 latency changed since a previous run.
+
+    Args:
+        results (dict): Results of this run.
+        previous (dict): Results of the earlier run.
+    """
+    print("\nChange since previous run:")
+    for name, result in results.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        throughput = (result["rows_per_second"] / before["rows_per_second"] - 1) * 100 if before["rows_per_second"] else 0.0
+        latency = (result["p99_ms"] / before["p99_ms"] - 1) * 100 if before["p99_ms"] else 0.0
+        print(f"{name:<22} throughput {throughput:+7.1f}%  p99 latency {latency:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark party planner guest operations and reports.")
+    parser.add_argument("--rows", type=int, default=10000, help="size of the synthetic guest population")
+    parser.add_argument("--calls", type=int, default=200, help="calls per single-row operation")
+    parser.add_argument("--batch-size", type=int, default=None, help="batch size for the bulk load")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite", help="database to run against")
+    parser.add_argument("--sqlite-path", default=":memory:", help="SQLite file to use, in memory by default")
+    parser.add_argument("--startup-runs", type=int, default=5, help="cold starts to time, 0 to skip")
+    parser.add_argument("--seed", type=int, default=168, help="random seed for the synthetic population")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare against results saved by an earlier run")
+    args = parser.parse_args()
+
+    database.use_backend(args.backend, args.sqlite_path)
+    print(f"Benchmarking {args.rows} guests on {args.backend}\n")
+    results = run_benchmarks(args.rows, args.calls, args.batch_size, args.seed)
+    if args.startup_runs:
+        startup = measure_startup(args.startup_runs, args.backend, args.sqlite_path)
+        if startup is not None:
+            results["startup"] = startup
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(results, json.load(file)["results"])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "backend": args.backend,
+                "rows": args.rows,
+                "python": platform.python_version(),
+                "pool": database.pool_stats(),
+                "results": results,
+            }, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#connection_pool.py
+#!/usr/env/bin python3
+
+"""
+This module keeps a small pool of open database connections so that repeat operations can reuse an
+existing connection instead of paying for a new handshake (and a failed local attempt) every time.
+
+Connections are checked for health when they are handed out, connections that have been sitting idle
+for too long are closed, and hit/miss/wait counters are kept so the pool can be benchmarked.
+"""
+import threading
+import time
+from collections import deque
+
+
+def _is_connected(connection):
+    """
+    Default health check used on checkout.
+
+    Args:
+        connection: A database connection object.
+
+    Returns:
+        bool: True if the connection is still usable, False otherwise.
+    """
+    try:
+        return connection.is_connected()
+    except Exception:
+        return False
+
+
+def _rollback(connection):
+    """
+    Default reset used when a connection is returned, so no open transaction leaks to the next user.
+
+    Args:
+        connection: A database connection object.
+    """
+    connection.rollback()
+
+
+def _close_quietly(connection):
+    """
+    Close a connection, ignoring any error raised by a connection that is already dead.
+
+    Args:
+        connection: A database connection object.
+    """
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of reusable database connections.
+    """
+
+    def __init__(self, connect, size=5, max_idle=300, timeout=10, health_check=_is_connected, reset=_rollback):
+        """
+        Initialize the pool. No connections are opened until they are first needed.
+
+        Args:
+            connect (callable): Function returning a new connection, or None if no connection could be made.
+            size (int): Maximum number of connections open at once (idle plus checked out).
+            max_idle (float): Seconds an idle connection is kept before it is closed.
+            timeout (float): Seconds acquire() waits for a free connection when the pool is exhausted.
+            health_check (callable): Function returning True if a pooled connection is still usable.
+            reset (callable): Function called on a connection when it is returned to the pool.
+        """
+        self.connect = connect
+        self.size = size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.health_check = health_check
+        self.reset = reset
+
+        self._idle = deque()
+        self._in_use = 0
+        self._lock = threading.Condition()
+        # Bumped by drain(); connections opened before the current generation are closed instead of reused
+        self._generation = 0
+        self._checked_out = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+        self.failed_checks = 0
+
+    def acquire(self, timeout=None):
+        """
+        Check out a connection, reusing an idle one when possible.
+
+        Args:
+            timeout (float): Seconds to wait for a free connection. Defaults to the pool timeout.
+
+        Returns:
+            connection: A healthy connection object if successful, otherwise None.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        deadline = time.monotonic() + timeout
+
+        with self._lock:
+            self._evict_idle_locked()
+            waited = False
+
+            while True:
+                while self._idle:
+                    connection, _, generation = self._idle.pop()
+                    if generation != self._generation:
+                        _close_quietly(connection)
+                        continue
+                    if self.health_check(connection):
+                        self._in_use += 1
+                        self.hits += 1
+                        self._checked_out[id(connection)] = generation
+                        return connection
+                    self.failed_checks += 1
+                    _close_quietly(connection)
+
+                if self._in_use < self.size:
+                    # Reserve the slot before connecting so other threads can't overfill the pool
+                    self._in_use += 1
+                    self.misses += 1
+                    generation = self._generation
+                    break
+
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("Timed out waiting for a free database connection.")
+                    return None
+                self._lock.wait(remaining)
+
+        # Connect outside the lock, a slow handshake shouldn't block releases
+        connection = None
+        try:
+            connection = self.connect()
+        finally:
+            with self._lock:
+                if connection is None:
+                    self._in_use -= 1
+                    self._lock.notify()
+                else:
+                    self._checked_out[id(connection)] = generation
+        return connection
+
+    def release(self, connection, discard=False):
+        """
+        Return a checked-out connection to the pool.
+
+        Args:
+            connection: The connection returned by acquire().
+            discard (bool): Close the connection instead of keeping it for reuse.
+        """
+        if connection is None:
+            return
+
+        if not discard:
+            try:
+                self.reset(connection)
+            except Exception:
+                discard = True
+
+        with self._lock:
+            self._in_use -= 1
+            generation = self._checked_out.pop(id(connection), self._generation)
+            if discard or generation != self._generation:
+                _close_quietly(connection)
+            else:
+                self._idle.append((connection, time.monotonic(), generation))
+            self._lock.notify()
+
+    def evict_idle(self):
+        """
+        Close every idle connection that has been unused for longer than max_idle.
+
+        Returns:
+            int: Number of connections closed.
+        """
+        with self._lock:
+            return self._evict_idle_locked()
+
+    def _evict_idle_locked(self):
+        # Oldest connections sit at the left end of the deque
+        cutoff = time.monotonic() - self.max_idle
+        evicted = 0
+        while self._idle and self._idle[0][1] < cutoff:
+            connection, _, _ = self._idle.popleft()
+            _close_quietly(connection)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def close_all(self):
+        """
+        Close every idle connection now, and checked-out connections when they are released.
+        """
+        with self._lock:
+            self._generation += 1
+            while self._idle:
+                connection, _, _ = self._idle.popleft()
+                _close_quietly(connection)
+
+    def drain(self):
+        """
+        Retire every open connection without closing any now: idle ones are closed when acquire() comes
+        across them, and checked-out ones when they are released, so replacements are opened only as they
+        are needed.
+        """
+        with self._lock:
+            self._generation += 1
+
+    def stats(self):
+        """
+        Report the pool counters.
+
+        Returns:
+            dict: Counters for hits, misses, waits, evictions, failed health checks, and current usage.
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "evictions": self.evictions,
+                "failed_checks": self.failed_checks,
+            }
+
+    def reset_stats(self):
+        """
+        Zero the hit/miss/wait counters, e.g. before a benchmark run.
+        """
+        with self._lock:
+            self.hits = self.misses = self.waits = self.evictions = self.failed_checks = 0
@@ -1,82 +1,526 @@
 #database.py
 #!/usr/env/bin python3
 
-'''
-mysql-connector-python module is required to communicate with the MySQL database.
-Test to see if mysql-connector-python is present and if not, offer to install it.
-'''
-try:
-    import mysql.connector
-except ImportError:
-    install = input("Required module 'mysql-connector-python' is missing. Install it now? (y/n)")
-
-    if install.lower == 'y':
-        print("Installing mysql-connector-python using pip...")
-        #Run subprocess for pip to install mysql-connector-python
-        import subprocess
-        subprocess.check_call(["pip", "install", "mysql-connector-python"])
-    else:
-        print("Unable to proceed. Required module is not present and will not be installed. Exiting program.")
-        exit()
-
 """
 This module attempts to search for a MySQL server instance on the local machine. If this fails, it will connect to a remote MySQL server to handle data processing.
+Alternatively it can store data in an embedded SQLite database, which needs no server (see backends.py).
 
 Variables: 
+        BACKEND     - The storage backend to use, "mysql" or "sqlite" (can be set with the PARTYPLANNER_BACKEND environment variable)
+        SQLITE_PATH - The SQLite database file, or ":memory:" (can be set with the PARTYPLANNER_SQLITE_PATH environment variable)
         LOCAL_HOST  - The address of the local MySQL Server Instance to test
         REMOTE_HOST - The address (Domain or IP) of the remote MySQL Server Instance to test
+        HOSTS       - The MySQL servers to choose from, as "host" or "host:port" (can be set as a comma-separated list with the
+                      PARTYPLANNER_HOSTS environment variable, defaults to LOCAL_HOST then REMOTE_HOST; see host_manager.py)
+        READ_HOSTS  - MySQL read replicas that list, search and report reads are sent to, so they don't load the server taking
+                      check-in writes (can be set as a comma-separated list with the PARTYPLANNER_READ_HOSTS environment
+                      variable; empty sends every read to HOSTS)
+        REPLICA_RECHECK - After this station writes, its reads go to HOSTS until a read replica has caught up with the
+                      write (so it never reads a replica missing its own changes); the number of seconds between
+                      checks of a replica found behind
         USER        - The username to use when connecting to the MySQL Server Instance
         PASSWORD    - The password to use when connecting to the MySQL Server Instance
         DATABASE    - The name of the MySQL schema (database) used by this program
         TABLE_NAME  - The name of the MySQL table used by this program
+        CHANGE_TABLE - The name of the append-only change log table filled by triggers on TABLE_NAME (see live_sync.py)
+        POSITION_TABLE - The name of the table recording how far each station has read CHANGE_TABLE, so it can be pruned
+        REQUEST_TABLE - The name of the table recording the idempotency keys of journaled additions already applied (see write_behind.py)
+        SUMMARY_TABLE - The name of the per member type and menu item totals table kept by triggers on TABLE_NAME (see summaries.py)
+        POOL_SIZE   - The maximum number of pooled connections kept open at once
+        POOL_MAX_IDLE - The number of seconds an unused pooled connection is kept before it is closed
+        POOL_TIMEOUT  - The number of seconds to wait for a free pooled connection
+        BATCH_SIZE  - The number of rows sent per INSERT batch (and committed per transaction) by add_guests
+        PAGE_SIZE   - The default number of rows returned per page by query_guests
+        FETCH_SIZE  - The number of rows pulled from the server at a time by iter_guests
+        LOOKUP_SIZES - The id list lengths get_guests prepares statements for; shorter lists are padded to the next size
 
 The default values provided 
 """
+import os
+import time
+import weakref
+from itertools import islice
+import host_manager
+import instrumentation
+from instrumentation import TimedCursor, instrumented
+from backends import create_backend
+from connection_pool import ConnectionPool
+
 # Define global variables for the connector
+BACKEND = os.environ.get("PARTYPLANNER_BACKEND", "mysql")
+SQLITE_PATH = os.environ.get("PARTYPLANNER_SQLITE_PATH", "partyplanner.db")
 LOCAL_HOST = "localhost"
 REMOTE_HOST = "lollis-home.ddns.net"
+HOSTS = [address.strip() for address in os.environ.get("PARTYPLANNER_HOSTS", "").split(",") if address.strip()] or [LOCAL_HOST, REMOTE_HOST]
+READ_HOSTS = [address.strip() for address in os.environ.get("PARTYPLANNER_READ_HOSTS", "").split(",") if address.strip()]
+REPLICA_RECHECK = 1.0
 USER = "CPT168"
 PASSWORD = "Password12#$"
 DATABASE = "cpt168"
 TABLE_NAME = "party_info"
+CHANGE_TABLE = "party_info_changes"
+POSITION_TABLE = "party_info_positions"
+SUMMARY_TABLE = "party_info_summary"
+REQUEST_TABLE = "party_info_requests"
+POOL_SIZE = 5
+POOL_MAX_IDLE = 300
+POOL_TIMEOUT = 10
+BATCH_SIZE = 500
+PAGE_SIZE = 100
+FETCH_SIZE = 1000
+LOOKUP_SIZES = (1, 10, 100)
 
-def connect_to_database():
-    """
-    connect_to_database()
+# Column layout of every guest row returned by this module
+GUEST_COLUMNS = ("party_id", "f_name", "l_name", "member_type", "amt_paid", "menu_item")
+SELECT_COLUMNS = ", ".join(GUEST_COLUMNS)
 
-    Connects to the MySQL database.
+def _create_backend(name):
+    if name == "sqlite":
+        return create_backend(name, path=SQLITE_PATH, table_name=TABLE_NAME)
+    return create_backend(name)
 
-    Returns:
-        connection: MySQL database connection object if successful, otherwise None.
+_backend = _create_backend(BACKEND)
+
+def _create_hosts(addresses):
+    labels = {LOCAL_HOST: "local", REMOTE_HOST: "remote"}
+    return host_manager.HostManager([host_manager.Host(address, labels.get(address)) for address in addresses])
+
+_hosts = _create_hosts(HOSTS)
+_read_hosts = _create_hosts(READ_HOSTS)
+
+# The hosts that last accepted a connection, used to label timings
+_last_good_host = None
+_last_read_host = None
+
+# The change log position of this station's last write; reads go to the primary until a replica has reached it
+_write_position = 0
+# Positions read replica connections were last seen to have reached
+_replica_positions = weakref.WeakKeyDictionary()
+# time.monotonic() before which reads skip the replicas, after one was found behind
+_replica_behind_until = float("-inf")
+
+def _connect_to_host(hosts, role):
     """
-    try:
-        # Try connecting to local MySQL instance
-        connection = mysql.connector.connect(
-            host=LOCAL_HOST,
-            user=USER,
-            password=PASSWORD,
-            database=DATABASE
-        )
-        print("Connected to local MySQL instance")
-        return connection
+    Try the candidate hosts of a HostManager in order.
 
-    except mysql.connector.Error as err:
-        print("Connection to local MySQL instance failed:", err)
-        # Fallback to remote connection in a new try block
+    Returns:
+        tuple: (connection, Host), or (None, None) if every host failed.
+    """
+    for host in hosts.candidates():
+        if not hosts.begin_attempt(host):
+            # Another connection is already trying this half-open host
+            continue
+        label = host.label
+        started = time.perf_counter()
         try:
-            connection = mysql.connector.connect(
-                host=REMOTE_HOST,
+            connection = _backend.connect(
+                host=host.host,
                 user=USER,
                 password=PASSWORD,
-                database=DATABASE
+                database=DATABASE,
+                port=host.port,
+                timeout=host_manager.CONNECT_TIMEOUT
             )
-            print("Connected to remote MySQL instance (lollis-home.ddns.net)")
-            return connection
+            print(f"Connected to {label} MySQL {role} ({host.address})")
+            instrumentation.observe(f"connect.{label}", (time.perf_counter() - started) * 1000)
+            hosts.record_success(host)
+            return connection, host
 
-        except mysql.connector.Error as err:
-            print("Connection to remote MySQL instance failed:", err)
+        except _backend.Error as err:
+            print(f"Connection to {label} MySQL {role} failed:", err)
+            instrumentation.observe(f"connect_failed.{label}", (time.perf_counter() - started) * 1000)
+            instrumentation.count(f"connect_failures.{label}")
+            hosts.record_failure(host, err)
+
+    return None, None
+
+def connect_to_database():
+    """
+    connect_to_database()
+
+    Connects to the database. For MySQL, the fastest healthy host in HOSTS is tried first and hosts whose
+    circuit breaker is open are skipped (see host_manager.py); each attempt gives up after
+    host_manager.CONNECT_TIMEOUT seconds.
+
+    Returns:
+        connection: Database connection object if successful, otherwise None.
+    """
+    global _last_good_host
+
+    if not _backend.networked:
+        started = time.perf_counter()
+        try:
+            return _backend.connect()
+        except _backend.Error as err:
+            print(f"Connection to {_backend.name} database failed:", err)
+            instrumentation.count(f"connect_failures.{_backend.name}")
             return None
+        finally:
+            instrumentation.observe(f"connect.{_backend.name}", (time.perf_counter() - started) * 1000)
+
+    if not _hosts.candidates():
+        print("No MySQL instance is reachable.")
+        return None
+
+    connection, _last_good_host = _connect_to_host(_hosts, "instance")
+    return connection
+
+def connect_to_read_replica():
+    """
+    connect_to_read_replica()
+
+    Connects to the fastest healthy host in READ_HOSTS.
+
+    Returns:
+        connection: MySQL database connection object if successful, otherwise None (the caller then reads from HOSTS).
+    """
+    global _last_read_host
+
+    connection, _last_read_host = _connect_to_host(_read_hosts, "read replica")
+    return connection
+
+_pool = ConnectionPool(connect_to_database, size=POOL_SIZE, max_idle=POOL_MAX_IDLE, timeout=POOL_TIMEOUT,
+                       health_check=lambda connection: _backend.is_connected(connection))
+# Waits only briefly for a read connection, reads fall back to the primary pool instead
+_read_pool = ConnectionPool(connect_to_read_replica, size=POOL_SIZE, max_idle=POOL_MAX_IDLE, timeout=1,
+                            health_check=lambda connection: _backend.is_connected(connection))
+# Connections checked out of _read_pool, so release_connection returns them there
+_read_connections = weakref.WeakSet()
+
+def _preferred_host_changed(host):
+    # Pooled connections may be to a slower or failing host; they are replaced as they are next used or
+    # released, and new ones go to the preferred host
+    _pool.drain()
+
+def _preferred_read_host_changed(host):
+    _read_pool.drain()
+
+_hosts.subscribe(_preferred_host_changed)
+_read_hosts.subscribe(_preferred_read_host_changed)
+
+def use_hosts(addresses):
+    """
+    use_hosts
+
+    Replaces the MySQL host list, e.g. to point at stand-in servers on other ports. Pooled connections are
+    closed, and background probes carry on against the new hosts if they were running.
+
+    Args:
+        addresses (list): "host" or "host:port" strings, in order of preference until probes have measured them.
+    """
+    global HOSTS, _hosts, _last_good_host
+
+    probing = _hosts.probing()
+    _hosts.stop()
+    HOSTS = list(addresses)
+    _hosts = _create_hosts(HOSTS)
+    _hosts.subscribe(_preferred_host_changed)
+    _pool.close_all()
+    _last_good_host = None
+    if probing:
+        _hosts.start()
+
+def use_read_hosts(addresses):
+    """
+    use_read_hosts
+
+    Replaces the read replica list. Pooled read connections are closed.
+
+    Args:
+        addresses (list): "host" or "host:port" strings; empty sends every read to HOSTS.
+    """
+    global READ_HOSTS, _read_hosts, _last_read_host
+
+    probing = _read_hosts.probing()
+    _read_hosts.stop()
+    READ_HOSTS = list(addresses)
+    _read_hosts = _create_hosts(READ_HOSTS)
+    _read_hosts.subscribe(_preferred_read_host_changed)
+    _read_pool.close_all()
+    _last_read_host = None
+    if probing and READ_HOSTS:
+        _read_hosts.start()
+
+def start_host_probes():
+    """
+    start_host_probes
+
+    Starts measuring every MySQL host and read replica in the background so connections go to the fastest
+    healthy one. Does nothing for embedded backends.
+    """
+    if _backend.networked:
+        _hosts.start()
+        if READ_HOSTS:
+            _read_hosts.start()
+
+def stop_host_probes():
+    """
+    stop_host_probes
+
+    Stops the background host probes.
+    """
+    _hosts.stop()
+    _read_hosts.stop()
+
+def host_status():
+    """
+    host_status
+
+    Returns:
+        list: For each MySQL host and read replica, a dict with its "role" ("primary" or "read"), "address",
+              "label", breaker "state", smoothed "latency" in milliseconds (None until probed), consecutive
+              "failures" and "last_error".
+    """
+    return ([dict(status, role="primary") for status in _hosts.status()] +
+            [dict(status, role="read") for status in _read_hosts.status()])
+
+def use_backend(name, sqlite_path=None):
+    """
+    use_backend
+
+    Switches the storage backend. Pooled connections to the old backend are closed.
+
+    Args:
+        name (str): "mysql" or "sqlite".
+        sqlite_path (str): SQLite database file, or ":memory:". Defaults to SQLITE_PATH.
+    """
+    global BACKEND, SQLITE_PATH, _backend, _last_good_host, _last_read_host
+
+    if sqlite_path is not None:
+        SQLITE_PATH = sqlite_path
+    new_backend = _create_backend(name)
+
+    _pool.close_all()
+    _read_pool.close_all()
+    BACKEND = name
+    _backend = new_backend
+    _last_good_host = _last_read_host = None
+
+def get_backend():
+    """
+    get_backend
+
+    Returns:
+        The storage backend object in use (see backends.py).
+    """
+    return _backend
+
+def backend_name():
+    """
+    backend_name
+
+    Returns:
+        str: Name of the storage backend in use, "mysql" or "sqlite".
+    """
+    return _backend.name
+
+def configure_pool(size=None, max_idle=None, timeout=None):
+    """
+    configure_pool
+
+    Changes the connection pool settings, for the primary and read replica pools. Idle connections are closed so the
+    new settings apply to all connections.
+
+    Args:
+        size (int): Maximum number of connections open at once.
+        max_idle (float): Seconds an unused connection is kept before it is closed.
+        timeout (float): Seconds to wait for a free connection.
+    """
+    for pool in (_pool, _read_pool):
+        if size is not None:
+            pool.size = size
+        if max_idle is not None:
+            pool.max_idle = max_idle
+        if timeout is not None:
+            pool.timeout = timeout
+        pool.close_all()
+
+def _change_position(connection):
+    """
+    Returns:
+        int: The newest change_id a connection's server has, or None if it couldn't be read.
+    """
+    try:
+        cursor = TimedCursor(connection.cursor())
+        cursor.execute(f"SELECT COALESCE(MAX(change_id), 0) FROM {CHANGE_TABLE}")
+        return cursor.fetchone()[0]
+    except _backend.Error as err:
+        instrumentation.record_error(err)
+        return None
+
+def note_write(connection):
+    """
+    note_write
+
+    Records the change log position of a write this station just committed, so its reads go to the primary
+    until a read replica has caught up with it. Called after every commit made by this module.
+
+    Args:
+        connection: The primary connection the write was committed on.
+    """
+    global _write_position
+    if not _uses_read_hosts():
+        return
+    position = _change_position(connection)
+    if position is None:
+        # Unknown, so reads stay on the primary until a later write's position can be read
+        _write_position = float("inf")
+    elif _write_position == float("inf") or position > _write_position:
+        _write_position = position
+
+def _uses_read_hosts():
+    return _backend.networked and bool(READ_HOSTS)
+
+def _caught_up(connection):
+    """
+    Returns:
+        bool: True if a read replica connection has every change up to this station's last write.
+    """
+    global _replica_behind_until
+    if _replica_positions.get(connection, -1) >= _write_position:
+        return True
+    position = _change_position(connection)
+    if position is None or position < _write_position:
+        _replica_behind_until = time.monotonic() + REPLICA_RECHECK
+        return False
+    _replica_positions[connection] = position
+    return True
+
+def _acquire(read_only=False):
+    """
+    Check a connection out of the read replica pool for reads (when replicas are configured and the
+    replica has caught up with this station's own writes), otherwise out of the primary pool.
+
+    Returns:
+        tuple: (connection or None, label of the host it goes to).
+    """
+    if read_only and _uses_read_hosts() and time.monotonic() >= _replica_behind_until:
+        connection = _read_pool.acquire()
+        if connection is not None:
+            if _caught_up(connection):
+                _read_connections.add(connection)
+                return connection, _last_read_host.label if _last_read_host else None
+            _read_pool.release(connection)
+    return _pool.acquire(), _host_label()
+
+def get_connection(read_only=False):
+    """
+    get_connection
+
+    Checks a connection out of the pool, opening a new one only if no healthy idle connection is available.
+
+    The time spent is recorded as the "connect" phase of the current instrumented call.
+
+    Args:
+        read_only (bool): The caller only reads, so a read replica may serve it (see READ_HOSTS).
+
+    Returns:
+        connection: MySQL database connection object if successful, otherwise None.
+    """
+    started = time.perf_counter()
+    connection, label = _acquire(read_only)
+    instrumentation.record_phase("connect", time.perf_counter() - started, label)
+    return connection
+
+def _host_label():
+    """
+    Returns:
+        str: Which server connections currently go to: "local", "remote", or the embedded backend's name.
+    """
+    if not _backend.networked:
+        return _backend.name
+    if _last_good_host is None:
+        return None
+    return _last_good_host.label
+
+def release_connection(connection, discard=False):
+    """
+    release_connection
+
+    Returns a connection obtained from get_connection() to the pool it came from.
+
+    Args:
+        connection: The connection to return.
+        discard (bool): Close the connection instead of keeping it for reuse.
+    """
+    if connection is not None and connection in _read_connections:
+        _read_connections.discard(connection)
+        _read_pool.release(connection, discard)
+    else:
+        _pool.release(connection, discard)
+
+def pool_stats(read=False):
+    """
+    pool_stats
+
+    Args:
+        read (bool): Report the read replica pool instead of the primary pool.
+
+    Returns:
+        dict: Connection pool counters (hits, misses, waits, evictions, failed_checks, idle, in_use, size).
+    """
+    return (_read_pool if read else _pool).stats()
+
+def metrics():
+    """
+    metrics
+
+    Returns:
+        dict: Database call counters, latency histograms and recent slow calls (see instrumentation.snapshot).
+    """
+    return instrumentation.snapshot()
+
+def dump_metrics(file=None):
+    """
+    dump_metrics
+
+    Prints the database call metrics and pool counters, e.g. during an event to see where time goes.
+
+    Args:
+        file: Where to print, defaults to standard error.
+    """
+    instrumentation.dump(file)
+    stats = pool_stats()
+    print("\nPool: " + ", ".join(f"{name}={value}" for name, value in stats.items()), file=file)
+    if READ_HOSTS:
+        stats = pool_stats(read=True)
+        print("Read pool: " + ", ".join(f"{name}={value}" for name, value in stats.items()), file=file)
+
+def close_pool():
+    """
+    close_pool
+
+    Closes every idle pooled connection, e.g. when the program exits.
+    """
+    _pool.close_all()
+    _read_pool.close_all()
 
+def prewarm(count=1):
+    """
+    prewarm
+
+    Opens pooled connections ahead of time so the first real query doesn't wait for the driver import,
+    host search and login. Meant to run in the background while the main menu is shown.
+
+    Args:
+        count (int): Number of connections to open, at most POOL_SIZE.
+
+    Returns:
+        int: Number of connections now waiting in the pool.
+    """
+    connections = []
+    try:
+        for _ in range(min(count, _pool.size)):
+            connection = get_connection()
+            if not connection:
+                break
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            release_connection(connection)
+    return len(connections)
+
+@instrumented("add_guest")
 def add_guest(data):
     """
     add_guest
@@ -89,28 +533,217 @@ def add_guest(data):
     Returns:
         bool: True if the guest is added successfully, False otherwise.
     """
-    connection = connect_to_database()
+    connection = get_connection()
     if not connection:
         return False
 
     try:
-        cursor = connection.cursor()
+        cursor = TimedCursor(connection.cursor())
 
         insert_query = f"INSERT INTO {TABLE_NAME} (f_name, l_name, member_type, amt_paid, menu_item) VALUES (%s, %s, %s, %s, %s)"
         cursor.execute(insert_query, (data[0], data[1], data[2], data[3], data[4]))
 
         connection.commit()
+        note_write(connection)
         print("Guest added successfully.")
         return True
 
-    except mysql.connector.Error as err:
+    except _backend.Error as err:
         print("Error adding guest:", err)
+        instrumentation.record_error(err)
         return False
 
     finally:
-        if connection:
-            connection.close()
+        release_connection(connection)
+
+def check_guest_row(row):
+    """
+    check_guest_row
+
+    Checks that a row has the shape add_guest expects before it is sent to the server, e.g. before a guest
+    is queued for a later flush.
+
+    Args:
+        row (tuple): Tuple containing guest information (f_name, l_name, member_type, amt_paid, menu_item).
+
+    Returns:
+        str: A description of the problem, or None if the row looks valid.
+    """
+    if len(row) != 5:
+        return f"expected 5 fields, got {len(row)}"
+    if not (row[0] and row[1] and row[2] and row[4]):
+        return "first name, last name, member type and menu item are required"
+    try:
+        float(row[3] or 0)
+    except (TypeError, ValueError):
+        return f"amount paid is not a number: {row[3]!r}"
+    return None
+
+@instrumented("add_guests")
+def add_guests(rows, batch_size=None):
+    """
+    add_guests
+
+    Adds many guests to the database. Rows are sent in batches with executemany (which the connector
+    sends as a single multi-row INSERT) and each batch is committed as one transaction.
+    A bad row doesn't abort its batch: if the batch is rejected, its rows are retried one at a time
+    inside the same transaction so only the failing rows are skipped.
+
+    Args:
+        rows (iterable): Iterable of tuples (f_name, l_name, member_type, amt_paid, menu_item). It is
+                         consumed lazily, one batch at a time.
+        batch_size (int): Number of rows per batch. Defaults to BATCH_SIZE.
+
+    Returns:
+        tuple: (number of guests added, list of (row_number, error message) for rows that were skipped).
+               Row numbers start at 1.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    added = 0
+    errors = []
+
+    connection = get_connection()
+    if not connection:
+        return 0, [(0, "no database connection")]
+
+    insert_query = f"INSERT INTO {TABLE_NAME} (f_name, l_name, member_type, amt_paid, menu_item) VALUES (%s, %s, %s, %s, %s)"
+    numbered_rows = enumerate(rows, start=1)
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        while True:
+            chunk = list(islice(numbered_rows, batch_size))
+            if not chunk:
+                break
+
+            batch = []
+            for row_number, row in chunk:
+                row = tuple(row)
+                problem = check_guest_row(row)
+                if problem:
+                    errors.append((row_number, problem))
+                else:
+                    batch.append((row_number, (row[0], row[1], row[2], float(row[3] or 0), row[4])))
+
+            if not batch:
+                continue
+
+            try:
+                cursor.executemany(insert_query, [values for _, values in batch])
+                connection.commit()
+                note_write(connection)
+                added += len(batch)
+
+            except _backend.Error:
+                # Isolate the rows the server rejected, keeping the rest of the batch in one transaction
+                connection.rollback()
+                for row_number, values in batch:
+                    try:
+                        cursor.execute(insert_query, values)
+                        added += 1
+                    except _backend.Error as err:
+                        errors.append((row_number, str(err)))
+                connection.commit()
+                note_write(connection)
+
+        print(f"Added {added} guests ({len(errors)} skipped).")
+        return added, errors
+
+    except _backend.Error as err:
+        print("Error adding guests:", err)
+        instrumentation.record_error(err)
+        errors.append((0, str(err)))
+        return added, errors
+
+    finally:
+        release_connection(connection)
+
+@instrumented("add_guests_once")
+def add_guests_once(entries):
+    """
+    add_guests_once
+
+    Adds journaled guests, each tagged with an idempotency key. The key is stored in REQUEST_TABLE in the
+    same transaction as the guest, so sending an entry again after a lost acknowledgement or a crash
+    doesn't add the guest twice. Entries are sent as one batch; if the batch is rejected they are retried
+    one at a time so only the failing rows are reported.
+
+    Args:
+        entries (list): List of tuples (key, (f_name, l_name, member_type, amt_paid, menu_item)).
+
+    Returns:
+        tuple: (keys now applied, including ones applied earlier, list of (key, error message) for rows
+               the server rejected), or None if the database could not be reached.
+    """
+    if not entries:
+        return [], []
+
+    connection = get_connection()
+    if not connection:
+        return None
+
+    insert_query = f"INSERT INTO {TABLE_NAME} (f_name, l_name, member_type, amt_paid, menu_item) VALUES (%s, %s, %s, %s, %s)"
+    key_query = f"INSERT INTO {REQUEST_TABLE} (request_key) VALUES (%s)"
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        keys = [key for key, _ in entries]
+        cursor.execute(f"SELECT request_key FROM {REQUEST_TABLE} WHERE request_key IN ({', '.join(['%s'] * len(keys))})", tuple(keys))
+        applied = [row[0] for row in cursor.fetchall()]
+        done = set(applied)
+
+        errors = []
+        batch = []
+        for key, row in entries:
+            if key in done:
+                continue
+            problem = check_guest_row(row)
+            if problem:
+                errors.append((key, problem))
+            else:
+                batch.append((key, (row[0], row[1], row[2], float(row[3] or 0), row[4])))
+
+        if not batch:
+            return applied, errors
+
+        try:
+            cursor.executemany(key_query, [(key,) for key, _ in batch])
+            cursor.executemany(insert_query, [values for _, values in batch])
+            connection.commit()
+            note_write(connection)
+            applied.extend(key for key, _ in batch)
+
+        except _backend.Error:
+            # Isolate the rows the server rejected, keeping the rest in one transaction
+            connection.rollback()
+            for key, values in batch:
+                try:
+                    cursor.execute(key_query, (key,))
+                except _backend.Error as err:
+                    errors.append((key, str(err)))
+                    continue
+                try:
+                    cursor.execute(insert_query, values)
+                    applied.append(key)
+                except _backend.Error as err:
+                    cursor.execute(f"DELETE FROM {REQUEST_TABLE} WHERE request_key = %s", (key,))
+                    errors.append((key, str(err)))
+            connection.commit()
+            note_write(connection)
+
+        return applied, errors
+
+    except _backend.Error as err:
+        print("Error adding journaled guests:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
 
+@instrumented("modify_guest")
 def modify_guest(data):
     """
     modify_guest
@@ -123,12 +756,12 @@ def modify_guest(data):
     Returns:
         bool: True if the guest is modified successfully, False otherwise.
     """
-    connection = connect_to_database()
+    connection = get_connection()
     if not connection:
         return False
 
     try:
-        cursor = connection.cursor()
+        cursor = TimedCursor(connection.cursor())
 
         guest_id = data[1]
         update_fields = []
@@ -155,20 +788,22 @@ def modify_guest(data):
             data_for_update.append(guest_id)
             cursor.execute(update_query, tuple(data_for_update))
             connection.commit()
+            note_write(connection)
             print("Guest modified successfully.")
             return True
         else:
             print("No data provided to modify the guest.")
             return False
 
-    except mysql.connector.Error as err:
+    except _backend.Error as err:
         print("Error modifying guest:", err)
+        instrumentation.record_error(err)
         return False
 
     finally:
-        if connection:
-            connection.close()
+        release_connection(connection)
 
+@instrumented("delete_guest")
 def delete_guest(guest_id):
     """
     delete_guest
@@ -181,53 +816,910 @@ def delete_guest(guest_id):
     Returns:
         bool: True if the guest is deleted successfully, False otherwise.
     """
-    connection = connect_to_database()
+    connection = get_connection()
     if not connection:
         return False
 
     try:
-        cursor = connection.cursor()
+        cursor = TimedCursor(connection.cursor())
 
         delete_query = f"DELETE FROM {TABLE_NAME} WHERE party_id = %s"
         cursor.execute(delete_query, (guest_id,))
         connection.commit()
+        note_write(connection)
         print("Guest deleted successfully.")
         return True
 
-    except mysql.connector.Error as err:
+    except _backend.Error as err:
         print("Error deleting guest:", err)
+        instrumentation.record_error(err)
         return False
 
     finally:
-        if connection:
-            connection.close()
+        release_connection(connection)
+
+# Prepared cursors per pooled connection, one per statement text, so each statement is parsed once per connection
+_prepared_cursors = weakref.WeakKeyDictionary()
+
+def _prepared_cursor(connection, query):
+    """
+    Returns the connection's prepared-statement cursor for a statement, creating it on first use. A MySQL
+    prepared cursor only keeps the last statement it ran, so each statement text gets its own cursor and
+    alternating statements are never prepared again; SQLite reuses compiled statements through its
+    statement cache.
+    """
+    cursors = _prepared_cursors.setdefault(connection, {})
+    cursor = cursors.get(query)
+    if cursor is None:
+        cursor = cursors[query] = connection.cursor(prepared=True)
+    return cursor
+
+def _forget_prepared(connection, query):
+    # Drop a statement's cursor after an error, it is prepared again on next use
+    _prepared_cursors.get(connection, {}).pop(query, None)
+
+def _lookup_query(size):
+    return f"SELECT {SELECT_COLUMNS} FROM {TABLE_NAME} WHERE party_id IN ({', '.join(['%s'] * size)})"
+
+@instrumented("get_guests")
+def get_guests(guest_ids):
+    """
+    get_guests
+
+    Looks guests up by party_id through the primary key. Id lists are padded to one of LOOKUP_SIZES
+    (and longer lists split into chunks of the largest size) so only a few statement shapes are ever
+    prepared and each is reused.
+
+    Args:
+        guest_ids (iterable): IDs of the guests to fetch.
+
+    Returns:
+        dict: Guest rows (party_id, f_name, l_name, member_type, amt_paid, menu_item) keyed by party_id.
+              Guests that don't exist are left out. None if the query failed.
+    """
+    guest_ids = list(dict.fromkeys(guest_ids))
+    if not guest_ids:
+        return {}
+
+    connection = get_connection(read_only=True)
+    if not connection:
+        return None
+
+    query = None
+    try:
+        guests = {}
+        largest = LOOKUP_SIZES[-1]
+        for start in range(0, len(guest_ids), largest):
+            chunk = guest_ids[start:start + largest]
+            size = next(size for size in LOOKUP_SIZES if size >= len(chunk))
+            query = _lookup_query(size)
+            cursor = TimedCursor(_prepared_cursor(connection, query))
+            cursor.execute(query, tuple(chunk + chunk[-1:] * (size - len(chunk))))
+            for row in cursor.fetchall():
+                guests[row[0]] = tuple(row)
+        return guests
+
+    except _backend.Error as err:
+        print("Error fetching guests:", err)
+        instrumentation.record_error(err)
+        _forget_prepared(connection, query)
+        return None
+
+    finally:
+        release_connection(connection)
+
+def get_guest_details(guest_id):
+    """
+    get_guest_details
+
+    Fetches one guest with a single primary-key lookup.
+
+    Args:
+        guest_id (int): ID of the guest.
+
+    Returns:
+        tuple: Tuple containing guest information (party_id, f_name, l_name, member_type, amt_paid, menu_item),
+               or None if the guest doesn't exist or the query failed.
+    """
+    guests = get_guests([guest_id])
+    return guests.get(guest_id) if guests else None
+
+# Columns that update_guests may change
+UPDATABLE_COLUMNS = ("f_name", "l_name", "member_type", "amt_paid", "menu_item")
+
+def _batch_targets(guest_ids, member_type, menu_item, name_prefix):
+    """
+    Builds the WHERE clauses for a batch update or delete: one clause per chunk of at most BATCH_SIZE ids,
+    or a single clause for a predicate.
+
+    Returns:
+        list: List of (WHERE clause, parameters) tuples.
+    """
+    if guest_ids is not None:
+        guest_ids = list(dict.fromkeys(guest_ids))
+        targets = []
+        for start in range(0, len(guest_ids), BATCH_SIZE):
+            chunk = guest_ids[start:start + BATCH_SIZE]
+            targets.append((f"WHERE party_id IN ({', '.join(['%s'] * len(chunk))})", chunk))
+        return targets
+
+    conditions, params = _guest_filter(member_type, menu_item, name_prefix)
+    if not conditions:
+        # Never touch the whole table by accident
+        raise ValueError("A batch update or delete needs guest ids or at least one filter")
+    return [(f"WHERE {' AND '.join(conditions)}", params)]
+
+@instrumented("delete_guests")
+def delete_guests(guest_ids=None, member_type=None, menu_item=None, name_prefix=None):
+    """
+    delete_guests
+
+    Deletes several guests in one transaction, either by id (sent as IN (...) lists of up to BATCH_SIZE ids)
+    or by filter, e.g. every guest with a given member type.
+
+    Args:
+        guest_ids (iterable): IDs of the guests to delete, or None to delete by filter.
+        member_type (str): Delete guests of this member type.
+        menu_item (str): Delete guests with this menu item.
+        name_prefix (str): Delete guests whose first or last name starts with this text.
+
+    Returns:
+        int: Number of guests deleted, or None if the delete failed (nothing is deleted then).
+    """
+    targets = _batch_targets(guest_ids, member_type, menu_item, name_prefix)
+
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        deleted = 0
+        for where, params in targets:
+            cursor.execute(f"DELETE FROM {TABLE_NAME} {where}", tuple(params))
+            deleted += cursor.rowcount
+        connection.commit()
+        note_write(connection)
+        print(f"{deleted} guests deleted successfully.")
+        return deleted
+
+    except _backend.Error as err:
+        print("Error deleting guests:", err)
+        instrumentation.record_error(err)
+        connection.rollback()
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("update_guests")
+def update_guests(field, value, guest_ids=None, member_type=None, menu_item=None, name_prefix=None):
+    """
+    update_guests
+
+    Sets one field to the same value for several guests in one transaction, e.g. changing the menu item
+    for a whole table. Guests are picked by id or by filter, as for delete_guests.
+
+    Args:
+        field (str): The column to change, one of UPDATABLE_COLUMNS.
+        value: The new value.
+        guest_ids (iterable): IDs of the guests to change, or None to change by filter.
+        member_type (str): Change guests of this member type.
+        menu_item (str): Change guests with this menu item.
+        name_prefix (str): Change guests whose first or last name starts with this text.
+
+    Returns:
+        int: Number of guests changed, or None if the update failed (nothing is changed then).
+    """
+    if field not in UPDATABLE_COLUMNS:
+        raise ValueError(f"Cannot update guest field {field!r}")
+    targets = _batch_targets(guest_ids, member_type, menu_item, name_prefix)
+
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        updated = 0
+        for where, params in targets:
+            cursor.execute(f"UPDATE {TABLE_NAME} SET {field} = %s {where}", (value, *params))
+            updated += cursor.rowcount
+        connection.commit()
+        note_write(connection)
+        print(f"{updated} guests modified successfully.")
+        return updated
+
+    except _backend.Error as err:
+        print("Error modifying guests:", err)
+        instrumentation.record_error(err)
+        connection.rollback()
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("modify_guest_field")
+def modify_guest_field(guest_id, field, new_value):
+    """
+    modify_guest_field
+
+    Changes one field of one guest, found by primary key, with a reusable prepared statement.
+
+    Args:
+        guest_id (int): ID of the guest to modify.
+        field (str): The column to change, one of UPDATABLE_COLUMNS.
+        new_value: The new value.
+
+    Returns:
+        bool: True if the update ran, False otherwise.
+    """
+    if field not in UPDATABLE_COLUMNS:
+        raise ValueError(f"Cannot update guest field {field!r}")
+    if field == "amt_paid":
+        new_value = float(new_value or 0)
+
+    connection = get_connection()
+    if not connection:
+        return False
+
+    query = f"UPDATE {TABLE_NAME} SET {field} = %s WHERE party_id = %s"
+    try:
+        cursor = TimedCursor(_prepared_cursor(connection, query))
+
+        cursor.execute(query, (new_value, guest_id))
+        connection.commit()
+        note_write(connection)
+        print("Guest modified successfully.")
+        return True
+
+    except _backend.Error as err:
+        print("Error modifying guest:", err)
+        instrumentation.record_error(err)
+        _forget_prepared(connection, query)
+        connection.rollback()
+        return False
+
+    finally:
+        release_connection(connection)
+
+def _guest_filter(member_type=None, menu_item=None, name_prefix=None):
+    """
+    Builds the WHERE conditions shared by the guest queries.
+
+    Args:
+        member_type (str): Only include guests of this member type.
+        menu_item (str): Only include guests with this menu item.
+        name_prefix (str): Only include guests whose first or last name starts with this text.
+
+    Returns:
+        tuple: (list of SQL conditions, list of query parameters).
+    """
+    conditions = []
+    params = []
+
+    if member_type is not None:
+        conditions.append("member_type = %s")
+        params.append(member_type)
+    if menu_item is not None:
+        conditions.append("menu_item = %s")
+        params.append(menu_item)
+    if name_prefix:
+        # Escape LIKE wildcards so the prefix is matched literally
+        pattern = name_prefix.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+        conditions.append("(f_name LIKE %s ESCAPE '!' OR l_name LIKE %s ESCAPE '!')")
+        params.extend([pattern, pattern])
+
+    return conditions, params
+
+def _order_clause(order_by, descending):
+    """
+    Builds the ORDER BY clause for a guest query. party_id is always the final sort key so the order
+    is stable and can be used for keyset pagination.
+
+    Args:
+        order_by (str): Column to sort by, one of GUEST_COLUMNS.
+        descending (bool): Sort from highest to lowest.
+
+    Returns:
+        str: The ORDER BY clause.
+    """
+    if order_by not in GUEST_COLUMNS:
+        raise ValueError(f"Cannot sort guests by {order_by!r}")
+
+    direction = "DESC" if descending else "ASC"
+    if order_by == "party_id":
+        return f"ORDER BY party_id {direction}"
+    return f"ORDER BY {order_by} {direction}, party_id {direction}"
+
+@instrumented("query_guests")
+def query_guests(after=None, limit=None, member_type=None, menu_item=None, name_prefix=None, order_by="party_id", descending=False):
+    """
+    query_guests
+
+    Returns one page of guests using keyset pagination: pass the last row of a page as `after`
+    to get the next page. Only the requested page is read from the server.
+
+    Args:
+        after (tuple): Last guest row of the previous page, or None for the first page.
+        limit (int): Maximum number of rows to return. Defaults to PAGE_SIZE.
+        member_type (str): Only include guests of this member type.
+        menu_item (str): Only include guests with this menu item.
+        name_prefix (str): Only include guests whose first or last name starts with this text.
+        order_by (str): Column to sort by, one of GUEST_COLUMNS.
+        descending (bool): Sort from highest to lowest.
+
+    Returns:
+        list: List of tuples containing guest information (party_id, f_name, l_name, member_type, amt_paid, menu_item),
+              or None if the query failed.
+    """
+    order = _order_clause(order_by, descending)
+    conditions, params = _guest_filter(member_type, menu_item, name_prefix)
+
+    if after is not None:
+        comparison = "<" if descending else ">"
+        if order_by == "party_id":
+            conditions.append(f"party_id {comparison} %s")
+            params.append(after[0])
+        else:
+            conditions.append(f"({order_by}, party_id) {comparison} (%s, %s)")
+            params.extend([after[GUEST_COLUMNS.index(order_by)], after[0]])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    params.append(limit or PAGE_SIZE)
+
+    connection = get_connection(read_only=True)
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        select_query = f"SELECT {SELECT_COLUMNS} FROM {TABLE_NAME} {where} {order} LIMIT %s"
+        cursor.execute(select_query, tuple(params))
+
+        return cursor.fetchall()
+
+    except _backend.Error as err:
+        print("Error querying guests:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+def iter_guests(member_type=None, menu_item=None, name_prefix=None, order_by="party_id", descending=False, fetch_size=None, id_range=None):
+    """
+    iter_guests
+
+    Yields guests lazily from an unbuffered (server-side) cursor, FETCH_SIZE rows at a time, so the
+    whole table is never held in memory. The connection is held until the generator is exhausted or closed.
+
+    Args:
+        member_type (str): Only include guests of this member type.
+        menu_item (str): Only include guests with this menu item.
+        name_prefix (str): Only include guests whose first or last name starts with this text.
+        order_by (str): Column to sort by, one of GUEST_COLUMNS.
+        descending (bool): Sort from highest to lowest.
+        fetch_size (int): Number of rows pulled from the server at a time. Defaults to FETCH_SIZE.
+        id_range (tuple): (lowest, highest) party_id to include, e.g. one partition of a parallel report.
+
+    Yields:
+        tuple: Tuple containing guest information (party_id, f_name, l_name, member_type, amt_paid, menu_item).
+
+    Raises:
+        ConnectionError: If no database connection could be made.
+        Error: The backend's error if the query fails part way; rows already yielded are then not the
+               whole result, so callers must not treat them as complete.
+    """
+    order = _order_clause(order_by, descending)
+    conditions, params = _guest_filter(member_type, menu_item, name_prefix)
+    if id_range is not None:
+        conditions.append("party_id BETWEEN %s AND %s")
+        params.extend(id_range)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    fetch_size = fetch_size or FETCH_SIZE
+
+    # Recorded by hand: a decorator would only time creating the generator, not reading it
+    call = instrumentation.Call("iter_guests")
+    started = time.perf_counter()
+    connection, call.host = _acquire(read_only=True)
+    call.add_phase("connect", time.perf_counter() - started)
+    if not connection:
+        call.finish()
+        raise ConnectionError("no database connection")
+
+    finished = False
+    try:
+        cursor = TimedCursor(connection.cursor(buffered=False), call)
+
+        select_query = f"SELECT {SELECT_COLUMNS} FROM {TABLE_NAME} {where} {order}"
+        cursor.execute(select_query, tuple(params))
+
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+        finished = True
+
+    except _backend.Error as err:
+        # Raised rather than ending the stream, so a cut-off read is never taken for the whole table
+        instrumentation.record_error(err, call)
+        raise
+
+    finally:
+        # A half-read unbuffered result can't be reused, so drop the connection if we stopped early
+        release_connection(connection, discard=not finished)
+        call.finish()
+
+@instrumented("count_guests")
+def count_guests(member_type=None, menu_item=None, name_prefix=None):
+    """
+    count_guests
+
+    Counts the guests matching the given filters without fetching them.
+
+    Args:
+        member_type (str): Only count guests of this member type.
+        menu_item (str): Only count guests with this menu item.
+        name_prefix (str): Only count guests whose first or last name starts with this text.
+
+    Returns:
+        int: Number of matching guests, or None if the query failed.
+    """
+    conditions, params = _guest_filter(member_type, menu_item, name_prefix)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    connection = get_connection(read_only=True)
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE_NAME} {where}", tuple(params))
+        return cursor.fetchone()[0]
+
+    except _backend.Error as err:
+        print("Error counting guests:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+# Columns the aggregate queries may group by
+GROUP_COLUMNS = ("member_type", "menu_item")
+
+@instrumented("aggregate_guests")
+def aggregate_guests(group_by=(), member_type=None, menu_item=None, name_prefix=None):
+    """
+    aggregate_guests
+
+    Counts guests and sums their fees on the server, grouped by one or more columns, so only one row
+    per group is returned no matter how many guests there are.
+
+    Args:
+        group_by (tuple): Columns to group by, any of GROUP_COLUMNS, e.g. ("menu_item",) or
+                          ("menu_item", "member_type"). An empty tuple gives a single grand-total row.
+        member_type (str): Only include guests of this member type.
+        menu_item (str): Only include guests with this menu item.
+        name_prefix (str): Only include guests whose first or last name starts with this text.
+
+    Returns:
+        list: List of tuples (*group values, guest count, total amt_paid), ordered by the group columns,
+              or None if the query failed.
+    """
+    group_by = tuple(group_by)
+    for column in group_by:
+        if column not in GROUP_COLUMNS:
+            raise ValueError(f"Cannot group guests by {column!r}")
+
+    conditions, params = _guest_filter(member_type, menu_item, name_prefix)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    columns = ", ".join(group_by)
+
+    if group_by:
+        select_query = (f"SELECT {columns}, COUNT(*), COALESCE(SUM(amt_paid), 0) FROM {TABLE_NAME} {where} "
+                        f"GROUP BY {columns} ORDER BY {columns}")
+    else:
+        select_query = f"SELECT COUNT(*), COALESCE(SUM(amt_paid), 0) FROM {TABLE_NAME} {where}"
+
+    connection = get_connection(read_only=True)
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(select_query, tuple(params))
+        return [tuple(row[:-1]) + (float(row[-1]),) for row in cursor.fetchall()]
+
+    except _backend.Error as err:
+        print("Error aggregating guests:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("summary_aggregate")
+def summary_aggregate(group_by=()):
+    """
+    summary_aggregate
+
+    Reads guest counts and fee totals from the materialized summary table instead of the guest table.
+    The summary has one row per member type and menu item, so this costs the same for any number of guests.
+
+    Args:
+        group_by (tuple): Columns to group by, any of GROUP_COLUMNS. An empty tuple gives a single grand-total row.
+
+    Returns:
+        list: List of tuples (*group values, guest count, total amt_paid) like aggregate_guests,
+              or None if the query failed.
+    """
+    group_by = tuple(group_by)
+    for column in group_by:
+        if column not in GROUP_COLUMNS:
+            raise ValueError(f"Cannot group guests by {column!r}")
+
+    columns = ", ".join(group_by)
+    if group_by:
+        select_query = (f"SELECT {columns}, SUM(guest_count), COALESCE(SUM(fees), 0) FROM {SUMMARY_TABLE} "
+                        f"WHERE guest_count > 0 GROUP BY {columns} ORDER BY {columns}")
+    else:
+        select_query = f"SELECT COALESCE(SUM(guest_count), 0), COALESCE(SUM(fees), 0) FROM {SUMMARY_TABLE}"
+
+    connection = get_connection(read_only=True)
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(select_query)
+        return [tuple(row[:-2]) + (int(row[-2]), float(row[-1])) for row in cursor.fetchall()]
+
+    except _backend.Error as err:
+        print("Error reading guest summary:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+
+@instrumented("run_query")
+def run_query(query, params=()):
+    """
+    run_query
+
+    Runs a read-only query that isn't one of the guest queries above, e.g. for schema checks.
+
+    Args:
+        query (str): The SQL query, with %s placeholders.
+        params (tuple): Query parameters.
+
+    Returns:
+        tuple: (list of column names, list of rows), or None if the query failed.
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(query, tuple(params))
+        rows = cursor.fetchall()
+        columns = [column[0] for column in cursor.description or ()]
+        return columns, rows
+
+    except _backend.Error as err:
+        print("Error running query:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("run_statements")
+def run_statements(statements):
+    """
+    run_statements
+
+    Runs a list of statements (e.g. CREATE TABLE or CREATE TRIGGER) in order and commits them.
+
+    Args:
+        statements (list): SQL statements without parameters.
+
+    Returns:
+        bool: True if every statement ran successfully, False otherwise.
+    """
+    connection = get_connection()
+    if not connection:
+        return False
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        for statement in statements:
+            cursor.execute(statement)
+        connection.commit()
+        note_write(connection)
+        return True
+
+    except _backend.Error as err:
+        print("Error running statements:", err)
+        instrumentation.record_error(err)
+        return False
+
+    finally:
+        release_connection(connection)
+
+@instrumented("fetch_changes")
+def fetch_changes(after_id, limit=None):
+    """
+    fetch_changes
+
+    Reads the change log entries after a given change_id, joined to the current guest row, so a station
+    can apply other stations' edits without re-reading the table.
+
+    Args:
+        after_id (int): The last change_id already seen.
+        limit (int): Maximum number of changes to return. Defaults to PAGE_SIZE.
+
+    Returns:
+        list: List of tuples (change_id, party_id, op, guest row or None if the guest no longer exists),
+              or None if the query failed.
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        guest_columns = ", ".join(f"p.{column}" for column in GUEST_COLUMNS)
+        select_query = (f"SELECT c.change_id, c.party_id, c.op, {guest_columns} FROM {CHANGE_TABLE} c "
+                        f"LEFT JOIN {TABLE_NAME} p ON p.party_id = c.party_id "
+                        f"WHERE c.change_id > %s ORDER BY c.change_id LIMIT %s")
+        cursor.execute(select_query, (after_id, limit or PAGE_SIZE))
+
+        return [(row[0], row[1], row[2], tuple(row[3:]) if row[3] is not None else None) for row in cursor.fetchall()]
+
+    except _backend.Error as err:
+        print("Error reading changes:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("latest_change_id")
+def latest_change_id():
+    """
+    latest_change_id
+
+    Returns:
+        int: The newest change_id in the change log (0 if it is empty), or None if the query failed.
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(f"SELECT COALESCE(MAX(change_id), 0) FROM {CHANGE_TABLE}")
+        return cursor.fetchone()[0]
+
+    except _backend.Error as err:
+        print("Error reading changes:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("copy_guests")
+def copy_guests(recent=0):
+    """
+    copy_guests
+
+    Reads every guest together with the change log position they reflect, in one transaction on one
+    primary connection, so changes made while copying are exactly those after the returned change_id
+    and any not yet committed behind it.
+
+    Args:
+        recent (int): How many change_ids behind the newest to list the entries the copy already reflects.
+
+    Returns:
+        tuple: (newest change_id, list of the change_ids within recent of it that the copy reflects,
+               list of guest rows (party_id, f_name, l_name, member_type, amt_paid, menu_item)),
+               or None if the read failed (nothing partial is ever returned).
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(_backend.snapshot_statement)
+        cursor.execute(f"SELECT COALESCE(MAX(change_id), 0) FROM {CHANGE_TABLE}")
+        change_id = cursor.fetchone()[0]
+        cursor.execute(f"SELECT change_id FROM {CHANGE_TABLE} WHERE change_id > %s", (change_id - recent,))
+        reflected = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT {SELECT_COLUMNS} FROM {TABLE_NAME}")
+        rows = [tuple(row) for row in cursor.fetchall()]
+        return change_id, reflected, rows
+
+    except _backend.Error as err:
+        print("Error copying guests:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        # Ends the read transaction
+        try:
+            connection.rollback()
+        except _backend.Error:
+            pass
+        release_connection(connection)
+
+@instrumented("prune_changes")
+def prune_changes(before_id):
+    """
+    prune_changes
+
+    Deletes change log entries older than a given change_id, once every station has seen them.
+
+    Args:
+        before_id (int): Entries with a smaller change_id are deleted.
+
+    Returns:
+        int: Number of entries deleted, or None if the delete failed.
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(f"DELETE FROM {CHANGE_TABLE} WHERE change_id < %s", (before_id,))
+        connection.commit()
+        return cursor.rowcount
+
+    except _backend.Error as err:
+        print("Error pruning changes:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("acknowledge_changes")
+def acknowledge_changes(station, change_id, stale_before):
+    """
+    acknowledge_changes
+
+    Records how far a station has read the change log, and finds the oldest position any station still
+    reading it is at.
+
+    Args:
+        station (str): Name the station reports its position under.
+        change_id (int): The newest change_id the station has applied.
+        stale_before (float): time.time() before which a station's last report is too old to count,
+                              so a station that was switched off for good doesn't hold the log forever.
+
+    Returns:
+        int: The oldest change_id reported since stale_before, or None if the query failed.
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(f"REPLACE INTO {POSITION_TABLE} (station, change_id, acked_at) VALUES (%s, %s, %s)",
+                       (station, change_id, time.time()))
+        connection.commit()
+        cursor.execute(f"SELECT COALESCE(MIN(change_id), 0) FROM {POSITION_TABLE} WHERE acked_at >= %s", (stale_before,))
+        return cursor.fetchone()[0]
+
+    except _backend.Error as err:
+        print("Error recording change log position:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("oldest_change_id")
+def oldest_change_id():
+    """
+    oldest_change_id
+
+    Returns:
+        int: The oldest change_id still in the change log (0 if it is empty), or None if the query failed.
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = TimedCursor(connection.cursor())
+
+        cursor.execute(f"SELECT COALESCE(MIN(change_id), 0) FROM {CHANGE_TABLE}")
+        return cursor.fetchone()[0]
+
+    except _backend.Error as err:
+        print("Error reading changes:", err)
+        instrumentation.record_error(err)
+        return None
+
+    finally:
+        release_connection(connection)
+
+@instrumented("table_version")
+def table_version():
+    """
+    table_version
+
+    Reads a version of the guest table that changes whenever a guest is added, removed or changed: the
+    newest change_id in the change log, which every write moves on, read from its primary key index rather
+    than by scanning the guest table. Used by the guest cache to tell whether cached results are still
+    current. Always read on the primary: a lagging read replica would report a version the cache already
+    holds while the table has moved on.
+
+    Returns:
+        int: The newest change_id, or None if it couldn't be read, e.g. because the change log hasn't been
+             created yet (the cache then doesn't keep query results). Failures are counted, not printed.
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+
+    try:
+        return _change_position(connection)
+
+    finally:
+        release_connection(connection)
 
+@instrumented("list_guests")
 def list_guests():
     """
     list_guests
     
-    Lists all guests in the database.
+    Lists all guests in the database. This reads the whole table; prefer query_guests() for pages
+    or iter_guests() to stream rows.
 
     Returns:
         list: List of tuples containing guest information (party_id, f_name, l_name, member_type, amt_paid, menu_item).
     """
-    connection = connect_to_database()
+    connection = get_connection(read_only=True)
     if not connection:
         return None
 
     try:
-        cursor = connection.cursor()
+        cursor = TimedCursor(connection.cursor())
 
-        select_query = f"SELECT party_id, f_name, l_name, member_type, amt_paid, menu_item FROM {TABLE_NAME}"
+        select_query = f"SELECT {SELECT_COLUMNS} FROM {TABLE_NAME}"
         cursor.execute(select_query)
 
         guests = cursor.fetchall()
         return guests
 
-    except mysql.connector.Error as err:
+    except _backend.Error as err:
         print("Error listing guests:", err)
+        instrumentation.record_error(err)
         return None
 
     finally:
-        if connection:
-            connection.close()
+        release_connection(connection)
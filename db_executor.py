@@ -0,0 +1,106 @@
+# db_executor.py
+#!/usr/env/bin python3
+
+"""
+Runs database calls on background threads so the Tkinter main loop never waits on a connection or query.
+
+Tkinter widgets may only be touched from the main thread, so results are not delivered from the worker.
+Instead the main thread polls the pending call with widget.after() and runs the callback itself once the
+call is done. A call can be cancelled, e.g. when its window is closed, in which case its callback never runs.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of worker threads running database calls
+WORKERS = 4
+# Milliseconds between checks for a finished call
+POLL_MS = 50
+
+
+class BackgroundCall:
+    """
+    A database call running on a worker thread, whose callback will run on the Tk main thread.
+    """
+
+    def __init__(self, future, widget, callback, error_callback):
+        """
+        Args:
+            future (concurrent.futures.Future): The running call.
+            widget: Any Tk widget, used to schedule polling on the main thread.
+            callback (callable): Called with the call's return value when it finishes.
+            error_callback (callable): Called with the exception if the call raises.
+        """
+        self.future = future
+        self.widget = widget
+        self.callback = callback
+        self.error_callback = error_callback
+        self.cancelled = False
+        self.widget.after(POLL_MS, self._poll)
+
+    def cancel(self):
+        """
+        Stop waiting for the call. The call itself may still finish, but its callbacks will not run.
+        """
+        self.cancelled = True
+        self.future.cancel()
+
+    def done(self):
+        """
+        Returns:
+            bool: True if the call has finished or been cancelled.
+        """
+        return self.cancelled or self.future.done()
+
+    def _poll(self):
+        if self.cancelled:
+            return
+        if not self.future.done():
+            try:
+                self.widget.after(POLL_MS, self._poll)
+            except Exception:
+                # The widget was destroyed, nobody is left to hear the result
+                self.cancelled = True
+            return
+
+        error = self.future.exception()
+        if error is not None:
+            if self.error_callback:
+                self.error_callback(error)
+            else:
+                print("Background database call failed:", error)
+        elif self.callback:
+            self.callback(self.future.result())
+
+
+class BackgroundExecutor:
+    """
+    A thread pool for database calls whose results are handed back to the Tk main thread.
+    """
+
+    def __init__(self, workers=WORKERS):
+        """
+        Args:
+            workers (int): Number of worker threads.
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+
+    def submit(self, widget, function, *args, callback=None, error_callback=None, **kwargs):
+        """
+        Run function(*args, **kwargs) on a worker thread.
+
+        Args:
+            widget: Any Tk widget. Polling stops (and the callback is dropped) if it is destroyed.
+            function (callable): The blocking call to run.
+            callback (callable): Called on the main thread with the return value.
+            error_callback (callable): Called on the main thread with the exception if function raises.
+
+        Returns:
+            BackgroundCall: Handle that can be used to cancel the call.
+        """
+        future = self.pool.submit(function, *args, **kwargs)
+        return BackgroundCall(future, widget, callback, error_callback)
+
+    def shutdown(self):
+        """
+        Stop accepting calls and let the worker threads exit once their current call finishes.
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
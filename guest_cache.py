@@ -0,0 +1,249 @@
+# guest_cache.py
+#!/usr/env/bin python3
+
+"""
+An in-process cache of guest rows and query results, so reopening a window or report doesn't re-read
+the table when nothing has changed.
+
+Guest rows are kept by party_id in least-recently-used order, up to a fixed number of rows, and expire
+after a time-to-live. Query results (pages, counts, aggregates) are stored with the table version they
+were read at and are reused only while the version is unchanged. The version is the table's newest
+change log entry (see database.table_version) plus a counter bumped by this process's own writes, and it
+is only re-read from the server if it hasn't been checked in the last few seconds. If it can't be read,
+query results aren't cached until it can.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Maximum number of guest rows kept
+MAX_ROWS = 10000
+# Maximum number of query results kept
+MAX_QUERIES = 64
+# Seconds before a cached row or query result expires regardless of version
+TTL = 300
+# Seconds a table version read from the server is trusted before it is checked again
+REVALIDATE_AFTER = 2
+
+
+class GuestCache:
+    """
+    A bounded LRU/TTL cache of guest rows and versioned query results.
+    """
+
+    def __init__(self, version_loader, max_rows=MAX_ROWS, max_queries=MAX_QUERIES, ttl=TTL, revalidate_after=REVALIDATE_AFTER):
+        """
+        Args:
+            version_loader (callable): Returns a value that changes whenever the table changes, or None on failure.
+            max_rows (int): Maximum number of guest rows kept.
+            max_queries (int): Maximum number of query results kept.
+            ttl (float): Seconds before an entry expires.
+            revalidate_after (float): Seconds a version read from the server is trusted.
+        """
+        self.version_loader = version_loader
+        self.max_rows = max_rows
+        self.max_queries = max_queries
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+
+        self._rows = OrderedDict()
+        self._queries = OrderedDict()
+        self._lock = threading.RLock()
+        self._local_version = 0
+        self._server_version = None
+        # time.monotonic() of the last version read, None when it must be read again
+        self._checked_at = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version_checks = 0
+
+    def version(self):
+        """
+        Return the current table version, asking the server only if the last answer is too old.
+
+        Returns:
+            tuple: (server version, local write counter), or None if the server couldn't be asked.
+        """
+        with self._lock:
+            local_version = self._local_version
+            if self._checked_at is not None and time.monotonic() - self._checked_at <= self.revalidate_after:
+                # A failed read is trusted as long as a good one, so a missing change log isn't queried on every read
+                if self._server_version is None:
+                    return None
+                return (self._server_version, local_version)
+
+        # Read without holding the lock, so lookups and writes aren't held up by a server round trip
+        server_version = self.version_loader()
+        with self._lock:
+            self.version_checks += 1
+            # A write or clear while loading may not be reflected in the answer, so it isn't kept
+            if local_version == self._local_version:
+                self._server_version = server_version
+                self._checked_at = time.monotonic()
+        if server_version is None:
+            return None
+        return (server_version, local_version)
+
+    def stamp(self):
+        """
+        Returns:
+            int: The local write counter, to pass to put_rows() for rows read from the server afterwards.
+        """
+        with self._lock:
+            return self._local_version
+
+    def get_row(self, party_id):
+        """
+        Look up a guest row by party_id.
+
+        Args:
+            party_id (int): ID of the guest.
+
+        Returns:
+            tuple: The cached guest row, or None if it isn't cached or has expired.
+        """
+        with self._lock:
+            entry = self._rows.get(party_id)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._rows[party_id]
+                self.misses += 1
+                return None
+            self._rows.move_to_end(party_id)
+            self.hits += 1
+            return entry[0]
+
+    def put_rows(self, rows, stamp=None):
+        """
+        Store guest rows, evicting the least recently used rows if the cache is full.
+
+        Args:
+            rows (iterable): Guest rows (party_id, f_name, l_name, member_type, amt_paid, menu_item).
+            stamp (int): The stamp() taken before the rows were read. If a write or clear happened since,
+                         the rows may be stale and are not stored.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if stamp is not None and stamp != self._local_version:
+                return
+            for row in rows:
+                self._rows[row[0]] = (tuple(row), now)
+                self._rows.move_to_end(row[0])
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+                self.evictions += 1
+
+    def update_row(self, party_id, column_index, value):
+        """
+        Write a changed field through to a cached row, if the row is cached.
+
+        Args:
+            party_id (int): ID of the guest.
+            column_index (int): Position of the field in the guest row.
+            value: The new value.
+        """
+        with self._lock:
+            entry = self._rows.get(party_id)
+            if entry is not None:
+                row = list(entry[0])
+                row[column_index] = value
+                self._rows[party_id] = (tuple(row), entry[1])
+            self._changed()
+
+    def remove_row(self, party_id):
+        """
+        Drop a deleted guest from the cache.
+
+        Args:
+            party_id (int): ID of the guest.
+        """
+        with self._lock:
+            self._rows.pop(party_id, None)
+            self._changed()
+
+    def invalidate(self):
+        """
+        Mark every cached query result as stale, e.g. after a guest is added.
+        """
+        with self._lock:
+            self._changed()
+
+    def clear(self):
+        """
+        Drop everything, rows and query results.
+        """
+        with self._lock:
+            self._rows.clear()
+            self._changed()
+
+    def _changed(self):
+        # Our own write or a clear: results read before it are stale, and the server version is worth re-reading
+        self._local_version += 1
+        self._queries.clear()
+        self._server_version = None
+        self._checked_at = None
+
+    def query(self, key, loader, rows=False):
+        """
+        Return a cached query result if the table hasn't changed since it was read, otherwise run the query.
+
+        Args:
+            key (tuple): Hashable description of the query, e.g. ("list", filters...).
+            loader (callable): Runs the query. A None result is treated as a failure and not cached.
+            rows (bool): The result is a list of guest rows, which are also added to the row cache.
+
+        Returns:
+            The query result.
+        """
+        version = self.version()
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is not None and version is not None and entry[0] == version and time.monotonic() - entry[1] <= self.ttl:
+                self._queries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        result = loader()
+        if result is None or version is None:
+            return result
+
+        with self._lock:
+            # Don't store a result if one of our own writes, or a clear, happened while it was loading
+            if version[1] == self._local_version:
+                self._queries[key] = (version, time.monotonic(), result)
+                self._queries.move_to_end(key)
+                while len(self._queries) > self.max_queries:
+                    self._queries.popitem(last=False)
+                    self.evictions += 1
+                if rows:
+                    self.put_rows(result)
+        return result
+
+    def stats(self):
+        """
+        Report the cache counters.
+
+        Returns:
+            dict: hits, misses, hit_rate, evictions, version_checks and current sizes.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "version_checks": self.version_checks,
+                "rows": len(self._rows),
+                "queries": len(self._queries),
+            }
+
+    def reset_stats(self):
+        """
+        Zero the counters, e.g. before a benchmark run.
+        """
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.version_checks = 0
@@ -1,10 +1,107 @@
 #guest_management.py
 #!/usr/env/bin python3
+import csv
+import json
 import database
+import replica
+import summaries
+import write_behind
+from db_executor import BackgroundExecutor
+from guest_cache import GuestCache
+from guest_store import Guest
+
+# Column order used by add_guest, also the expected header of an import file
+GUEST_FIELDS = ("f_name", "l_name", "member_type", "amt_paid", "menu_item")
+
+# Shared by the GUI and reports; kept current by the write functions below
+cache = GuestCache(database.table_version)
+
+# The station's local replica (see start_replica); None when reads go to the server
+_replica = None
+
+def start_replica(path=None):
+    """
+    Open the station's local replica. Once it holds a copy of the guest table, list, count and total
+    reads are answered from it, and edits made while the server is unreachable are queued in it.
+    Call sync_replica() regularly to keep it current.
+
+    Args:
+        path (str): Replica file. Defaults to replica.REPLICA_PATH.
+
+    Returns:
+        replica.LocalReplica: The replica.
+    """
+    global _replica
+    if _replica is None:
+        _replica = replica.LocalReplica(path or replica.REPLICA_PATH)
+    return _replica
+
+def stop_replica():
+    """
+    Close the local replica; reads go back to the server.
+    """
+    global _replica
+    if _replica is not None:
+        _replica.close()
+        _replica = None
+
+def sync_replica():
+    """
+    Send edits made offline to the server and bring the replica up to date with the server's changes.
+
+    Returns:
+        list: List of (party_id, op, row) tuples pulled from the server, or None if the server could not
+              be reached or there is no replica.
+    """
+    if _replica is None:
+        return None
+    changes = _replica.sync()
+    if changes:
+        cache.invalidate()
+    return changes
+
+def replica_status():
+    """
+    Returns:
+        dict: "online" (whether the last sync reached the server), "pending" (edits waiting to be sent)
+              and "conflicts" (edits the server's copy won over). Empty if there is no replica.
+    """
+    if _replica is None:
+        return {}
+    return {"online": _replica.online, "pending": _replica.pending(), "conflicts": len(_replica.conflicts)}
+
+def _local_reads():
+    return _replica is not None and _replica.ready
+
+def _offline():
+    """
+    Returns:
+        bool: True if writes should go to the replica because the server is known to be unreachable.
+    """
+    return _local_reads() and not _replica.online
+
+def _server_unreachable():
+    """
+    Check, after a failed write, whether the server is down (rather than the write being rejected).
+
+    Returns:
+        bool: True if the write should be made to the replica instead.
+    """
+    if not _local_reads():
+        return False
+    if database.latest_change_id() is None:
+        _replica.online = False
+        return True
+    return False
+
+def _catch_up():
+    # Read back the station's own write so the replica shows it straight away
+    if _local_reads():
+        _replica.pull()
 
 def add_guest(data):
     """
-    Add a new guest to the database.
+    Add a new guest to the database, or to the local replica while the server is unreachable.
 
     Args:
         data (tuple): Tuple containing guest information (f_name, l_name, member_type, amt_paid, menu_item).
@@ -12,7 +109,155 @@ def add_guest(data):
     Returns:
         bool: True if the guest is added successfully, False otherwise.
     """
-    return database.add_guest(data)
+    if _offline():
+        _replica.add(data)
+        return True
+    success = database.add_guest(data)
+    if success:
+        cache.invalidate()
+        _catch_up()
+    elif _server_unreachable():
+        _replica.add(data)
+        return True
+    return success
+
+_journal = None
+_flusher = None
+
+def start_write_behind(path=None):
+    """
+    Open the local guest journal and start flushing it to the database in the background.
+    Entries left pending by an earlier run are sent too.
+
+    Args:
+        path (str): Journal file. Defaults to write_behind.JOURNAL_PATH.
+
+    Returns:
+        write_behind.Flusher: The running flusher.
+    """
+    global _journal, _flusher
+    if _flusher is None:
+        _journal = write_behind.GuestJournal(path or write_behind.JOURNAL_PATH)
+        _flusher = write_behind.Flusher(_journal)
+        _flusher.subscribe(lambda flushed, counts: flushed and cache.invalidate())
+    _flusher.start()
+    _flusher.wake()
+    return _flusher
+
+def stop_write_behind():
+    """
+    Stop the flusher after a last attempt to send pending entries, and close the journal.
+    """
+    global _journal, _flusher
+    if _flusher is not None:
+        _flusher.stop()
+        _journal.close()
+        _journal = _flusher = None
+
+def queue_guest(data, key=None):
+    """
+    Record a new guest in the local journal and return at once; the background flusher adds it to the
+    database shortly afterwards. Needs start_write_behind() to have been called.
+
+    Args:
+        data (tuple): Tuple containing guest information (f_name, l_name, member_type, amt_paid, menu_item).
+        key (str): Idempotency key, so submitting the same form twice adds the guest once.
+
+    Returns:
+        str: The entry's idempotency key, or None if the guest details are invalid.
+    """
+    problem = database.check_guest_row(tuple(data))
+    if problem:
+        print("Error queuing guest:", problem)
+        return None
+    key = _journal.append(data, key)
+    _flusher.wake()
+    return key
+
+def write_behind_status():
+    """
+    Returns:
+        dict: Number of "pending", "flushed" and "failed" journal entries, and the flusher's "last_error"
+              (None while the database is reachable). Empty if write-behind isn't running.
+    """
+    if _flusher is None:
+        return {}
+    status = _journal.counts()
+    status["last_error"] = _flusher.last_error
+    return status
+
+def add_guests(rows, batch_size=None):
+    """
+    Add many guests to the database in batched transactions.
+
+    Args:
+        rows (iterable): Iterable of tuples (f_name, l_name, member_type, amt_paid, menu_item).
+        batch_size (int): Number of rows per batch, defaults to database.BATCH_SIZE.
+
+    Returns:
+        tuple: (number of guests added, list of (row_number, error message) for skipped rows).
+    """
+    try:
+        return database.add_guests(rows, batch_size)
+    finally:
+        cache.invalidate()
+
+def read_guest_file(path, errors=None):
+    """
+    Stream guest rows from a CSV or JSONL file, one line at a time.
+
+    CSV files must have a header row naming the GUEST_FIELDS columns. JSONL files hold one JSON object
+    per line with the same keys, or one JSON array in GUEST_FIELDS order. The file type is picked from
+    the extension (.jsonl/.ndjson, anything else is read as CSV).
+
+    Args:
+        path (str): Path of the file to read.
+        errors (list): Optional list that (line_number, error message) tuples are appended to for
+                       lines that can't be parsed. Those lines are skipped.
+
+    Yields:
+        tuple: Tuple containing guest information (f_name, l_name, member_type, amt_paid, menu_item).
+    """
+    if errors is None:
+        errors = []
+
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if isinstance(record, dict):
+                        yield tuple(record.get(field) for field in GUEST_FIELDS)
+                    else:
+                        yield tuple(record)
+                except (ValueError, TypeError) as err:
+                    errors.append((line_number, f"invalid JSON: {err}"))
+        else:
+            reader = csv.DictReader(file)
+            missing = [field for field in GUEST_FIELDS if field not in (reader.fieldnames or [])]
+            if missing:
+                errors.append((1, f"missing columns: {', '.join(missing)}"))
+                return
+            for record in reader:
+                yield tuple(record[field] for field in GUEST_FIELDS)
+
+def import_guests_from_file(path, batch_size=None):
+    """
+    Import guests from a CSV or JSONL file without holding the whole file in memory.
+
+    Args:
+        path (str): Path of the file to import.
+        batch_size (int): Number of rows per batch, defaults to database.BATCH_SIZE.
+
+    Returns:
+        tuple: (number of guests added, list of (number, error message) for skipped rows). Parse errors
+               are numbered by file line, database errors by data row.
+    """
+    parse_errors = []
+    added, errors = add_guests(read_guest_file(path, parse_errors), batch_size)
+    return added, parse_errors + errors
 
 def modify_guest(guest_id, field, new_value):
     """
@@ -26,7 +271,17 @@ def modify_guest(guest_id, field, new_value):
     Returns:
         bool: True if the guest is modified successfully, False otherwise.
     """
-    return database.modify_guest_field(guest_id, field, new_value)
+    if field == "amt_paid":
+        new_value = float(new_value or 0)
+    if _offline():
+        return _replica.update([guest_id], field, new_value) > 0
+    success = database.modify_guest_field(guest_id, field, new_value)
+    if success:
+        cache.update_row(guest_id, database.GUEST_COLUMNS.index(field), new_value)
+        _catch_up()
+    elif _server_unreachable():
+        return _replica.update([guest_id], field, new_value) > 0
+    return success
 
 def delete_guest(guest_id):
     """
@@ -38,16 +293,244 @@ def delete_guest(guest_id):
     Returns:
         bool: True if the guest is deleted successfully, False otherwise.
     """
-    return database.delete_guest(guest_id)
+    if _offline():
+        return _replica.delete([guest_id]) > 0
+    success = database.delete_guest(guest_id)
+    if success:
+        cache.remove_row(guest_id)
+        _catch_up()
+    elif _server_unreachable():
+        return _replica.delete([guest_id]) > 0
+    return success
 
-def list_guests():
+def delete_guests(guest_ids=None, member_type=None, menu_item=None, name_prefix=None):
     """
-    List all guests in the database.
+    Delete several guests in one transaction, by id or by filter.
+
+    Args:
+        guest_ids (iterable): IDs of the guests to delete, or None to delete by filter.
+        member_type (str): Delete guests of this member type.
+        menu_item (str): Delete guests with this menu item.
+        name_prefix (str): Delete guests whose first or last name starts with this text.
+
+    Returns:
+        int: Number of guests deleted, or None if the delete failed.
+    """
+    if guest_ids is not None:
+        guest_ids = list(guest_ids)
+    if _offline():
+        return _replica.delete(_replica_ids(guest_ids, member_type, menu_item, name_prefix))
+    deleted = database.delete_guests(guest_ids, member_type, menu_item, name_prefix)
+    if deleted is not None:
+        if guest_ids is not None:
+            for guest_id in guest_ids:
+                cache.remove_row(guest_id)
+        else:
+            cache.clear()
+        _catch_up()
+    elif _server_unreachable():
+        return _replica.delete(_replica_ids(guest_ids, member_type, menu_item, name_prefix))
+    return deleted
+
+def update_guests(field, value, guest_ids=None, member_type=None, menu_item=None, name_prefix=None):
+    """
+    Set one field to the same value for several guests in one transaction, by id or by filter.
+
+    Args:
+        field (str): The field to change, e.g. "menu_item".
+        value: The new value.
+        guest_ids (iterable): IDs of the guests to change, or None to change by filter.
+        member_type (str): Change guests of this member type.
+        menu_item (str): Change guests with this menu item.
+        name_prefix (str): Change guests whose first or last name starts with this text.
+
+    Returns:
+        int: Number of guests changed, or None if the update failed.
+    """
+    if guest_ids is not None:
+        guest_ids = list(guest_ids)
+    if _offline():
+        return _replica.update(_replica_ids(guest_ids, member_type, menu_item, name_prefix), field, value)
+    updated = database.update_guests(field, value, guest_ids, member_type, menu_item, name_prefix)
+    if updated is not None:
+        if guest_ids is not None:
+            for guest_id in guest_ids:
+                cache.update_row(guest_id, database.GUEST_COLUMNS.index(field), value)
+        else:
+            cache.clear()
+        _catch_up()
+    elif _server_unreachable():
+        return _replica.update(_replica_ids(guest_ids, member_type, menu_item, name_prefix), field, value)
+    return updated
+
+def _replica_ids(guest_ids, member_type, menu_item, name_prefix):
+    # The replica's guests picked by id or by filter, as database._batch_targets picks them on the server
+    if guest_ids is not None:
+        return guest_ids
+    return [row[0] for row in _replica.matching(member_type, menu_item, name_prefix)]
+
+def list_guests(after=None, limit=None, member_type=None, menu_item=None, name_prefix=None, order_by="party_id", descending=False):
+    """
+    List one page of guests in the database, optionally filtered and sorted.
+
+    Args:
+        after (tuple): Last guest row of the previous page, or None for the first page.
+        limit (int): Maximum number of rows to return, defaults to database.PAGE_SIZE.
+        member_type (str): Only include guests of this member type.
+        menu_item (str): Only include guests with this menu item.
+        name_prefix (str): Only include guests whose first or last name starts with this text.
+        order_by (str): Column to sort by, e.g. "party_id" or "l_name".
+        descending (bool): Sort from highest to lowest.
 
     Returns:
         list: List of tuples containing guest information (party_id, f_name, l_name, member_type, amt_paid, menu_item).
     """
-    return database.list_guests()
+    if _local_reads():
+        return _replica.query(after, limit, member_type, menu_item, name_prefix, order_by, descending)
+    key = ("list", _event(), after, limit, member_type, menu_item, name_prefix, order_by, descending)
+    return cache.query(key, lambda: database.query_guests(after, limit, member_type, menu_item, name_prefix, order_by, descending), rows=True)
+
+def iter_guests(member_type=None, menu_item=None, name_prefix=None, order_by="party_id", descending=False, id_range=None):
+    """
+    Stream every matching guest from the local replica, or from the database without loading them all at once.
+
+    Args:
+        member_type (str): Only include guests of this member type.
+        menu_item (str): Only include guests with this menu item.
+        name_prefix (str): Only include guests whose first or last name starts with this text.
+        order_by (str): Column to sort by, e.g. "party_id" or "l_name".
+        descending (bool): Sort from highest to lowest.
+        id_range (tuple): (lowest, highest) party_id to include.
+
+    Yields:
+        tuple: Tuple containing guest information (party_id, f_name, l_name, member_type, amt_paid, menu_item).
+               Raises the database error if a read from the server fails part way.
+    """
+    if _local_reads():
+        rows = _replica.matching(member_type, menu_item, name_prefix, order_by, descending)
+        if id_range is not None:
+            rows = [row for row in rows if id_range[0] <= row[0] <= id_range[1]]
+        return iter(rows)
+    return database.iter_guests(member_type, menu_item, name_prefix, order_by, descending, id_range=id_range)
+
+def count_guests(member_type=None, menu_item=None, name_prefix=None):
+    """
+    Count the guests matching the given filters.
+
+    Returns:
+        int: Number of matching guests, or None if the query failed.
+    """
+    if _local_reads():
+        return _replica.count(member_type, menu_item, name_prefix)
+    key = ("count", _event(), member_type, menu_item, name_prefix)
+    return cache.query(key, lambda: database.count_guests(member_type, menu_item, name_prefix))
+
+def aggregate_guests(group_by=(), member_type=None, menu_item=None, name_prefix=None):
+    """
+    Count guests and total their fees per group, e.g. per menu item.
+
+    Args:
+        group_by (tuple): Columns to group by, any of database.GROUP_COLUMNS.
+        member_type (str): Only include guests of this member type.
+        menu_item (str): Only include guests with this menu item.
+        name_prefix (str): Only include guests whose first or last name starts with this text.
+
+    Returns:
+        list: List of tuples (*group values, guest count, total amt_paid), or None if the query failed.
+    """
+    if _local_reads():
+        return _replica.aggregate(group_by, member_type, menu_item, name_prefix)
+    key = ("aggregate", _event(), tuple(group_by), member_type, menu_item, name_prefix)
+    if member_type is None and menu_item is None and name_prefix is None:
+        # Unfiltered totals come from the materialized summary
+        return cache.query(key, lambda: summaries.aggregate(group_by))
+    return cache.query(key, lambda: database.aggregate_guests(group_by, member_type, menu_item, name_prefix))
+
+def _event():
+    # Which event's guest table is in use, part of every cached query's key so results never cross events
+    if database.backend_name() == "sqlite":
+        return ("sqlite", database.SQLITE_PATH)
+    return (database.backend_name(), database.DATABASE)
+
+def use_backend(name, sqlite_path=None):
+    """
+    Switch the storage backend ("mysql" or "sqlite") and drop everything cached from the old one.
+
+    Args:
+        name (str): "mysql" or "sqlite".
+        sqlite_path (str): SQLite database file, or ":memory:".
+    """
+    database.use_backend(name, sqlite_path)
+    cache.clear()
+    summaries.ready = False
+
+def apply_changes(changes):
+    """
+    Bring the guest cache up to date with changes made by other stations (see live_sync.ChangeFeed).
+
+    Args:
+        changes (list): List of (party_id, op, row) tuples; row is None for deleted guests.
+    """
+    for party_id, op, row in changes:
+        if row is None:
+            cache.remove_row(party_id)
+        else:
+            cache.put_rows([row])
+    if changes:
+        cache.invalidate()
+
+def cache_stats():
+    """
+    Report guest cache counters, including the hit rate.
+
+    Returns:
+        dict: hits, misses, hit_rate, evictions, version_checks and current sizes.
+    """
+    return cache.stats()
+
+def get_guests(guest_ids):
+    """
+    Fetch guests by id as typed records. Guests held in the local replica or the row cache cost nothing;
+    the rest are read with one primary-key lookup and cached.
+
+    Args:
+        guest_ids (iterable): IDs of the guests.
+
+    Returns:
+        dict: guest_store.Guest records keyed by party_id, leaving out guests that don't exist,
+              or None if the lookup failed.
+    """
+    rows = {}
+    missing = []
+    for guest_id in guest_ids:
+        row = _replica.get(guest_id) if _local_reads() else cache.get_row(guest_id)
+        if row is not None:
+            rows[guest_id] = row
+        elif not _local_reads():
+            missing.append(guest_id)
+
+    if missing:
+        stamp = cache.stamp()
+        fetched = database.get_guests(missing)
+        if fetched is None:
+            return None
+        cache.put_rows(fetched.values(), stamp)
+        rows.update(fetched)
+
+    return {guest_id: Guest.from_row(row) for guest_id, row in rows.items()}
+
+def get_guest(guest_id):
+    """
+    Fetch one guest as a typed record (see get_guests).
+
+    Args:
+        guest_id (int): ID of the guest.
+
+    Returns:
+        guest_store.Guest: The guest, or None if it doesn't exist or the lookup failed.
+    """
+    guests = get_guests([guest_id])
+    return guests.get(guest_id) if guests else None
 
 def get_guest_details(guest_id):
     """
@@ -57,6 +540,28 @@ def get_guest_details(guest_id):
         guest_id (int): ID of the guest.
 
     Returns:
-        tuple: Tuple containing guest information (party_id, f_name, l_name, member_type, amt_paid, menu_item).
+        tuple: Tuple containing guest information (party_id, f_name, l_name, member_type, amt_paid, menu_item),
+               or None if the guest doesn't exist.
+    """
+    guest = get_guest(guest_id)
+    return guest.as_row() if guest is not None else None
+
+_executor = None
+
+def call_async(widget, function, *args, callback=None, error_callback=None, **kwargs):
+    """
+    Run one of this module's functions on a background thread so the GUI stays responsive.
+
+    Args:
+        widget: Any Tk widget. The callback is dropped if it is destroyed before the call finishes.
+        function (callable): The function to run, e.g. list_guests or add_guest.
+        callback (callable): Called on the Tk main thread with the function's return value.
+        error_callback (callable): Called on the Tk main thread with the exception if the function raises.
+
+    Returns:
+        db_executor.BackgroundCall: Handle that can be used to cancel the call.
     """
-    return database.get_guest_details(guest_id)
+    global _executor
+    if _executor is None:
+        _executor = BackgroundExecutor()
+    return _executor.submit(widget, function, *args, callback=callback, error_callback=error_callback, **kwargs)
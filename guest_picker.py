@@ -0,0 +1,276 @@
+# guest_picker.py
+#!/usr/env/bin python3
+
+"""
+A searchable guest list for the delete and modify windows.
+
+Only the guests that have been scrolled into view are loaded: the list starts with one page and fetches
+the next page from the database as the user scrolls near the bottom. Typing in the search box filters
+immediately against an in-memory index of the guests loaded so far, then asks the database for the first
+page of matching names and merges it in. The list widget only ever holds the first rows of the matches,
+growing as the user scrolls, and is updated in place rather than refilled.
+"""
+import bisect
+import heapq
+import tkinter as tk
+from tkinter import ttk
+
+import guest_management
+
+# Number of guests fetched per page
+PAGE_SIZE = 50
+# Milliseconds to wait after a keystroke before searching the database
+SEARCH_DELAY_MS = 150
+# Load the next page once the bottom of the list is within this fraction of the view
+LOAD_MORE_AT = 0.9
+# Number of matching guests added to the list widget at a time
+SHOW_STEP = 200
+
+
+class NameIndex:
+    """
+    An in-memory index of guest names supporting prefix search on first or last name, the same rule the
+    database applies to name_prefix, so filtering what is loaded agrees with the pages loaded later.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self._prefixes = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, party_id, f_name, l_name):
+        """
+        Index a guest. Re-adding a guest that is already indexed does nothing.
+
+        Args:
+            party_id (int): ID of the guest.
+            f_name (str): First name.
+            l_name (str): Last name.
+        """
+        if party_id in self.names:
+            return
+        self.names[party_id] = {f_name.lower(), l_name.lower()}
+        for key in self.names[party_id]:
+            bisect.insort(self._prefixes, (key, party_id))
+
+    def remove(self, party_id):
+        """
+        Drop a guest from the index.
+
+        Args:
+            party_id (int): ID of the guest.
+        """
+        for key in self.names.pop(party_id, ()):
+            index = bisect.bisect_left(self._prefixes, (key, party_id))
+            del self._prefixes[index]
+
+    def search(self, text):
+        """
+        Find guests whose first or last name starts with the text, ignoring case.
+
+        Args:
+            text (str): The search text.
+
+        Returns:
+            set: Matching party_ids.
+        """
+        text = text.lower().strip()
+        if not text:
+            return set(self.names)
+
+        matches = set()
+        start = bisect.bisect_left(self._prefixes, (text,))
+        for key, party_id in self._prefixes[start:]:
+            if not key.startswith(text):
+                break
+            matches.add(party_id)
+        return matches
+
+
+class GuestPicker(ttk.Frame):
+    """
+    A search box above a lazily loaded, scrollable guest list.
+    """
+
+    def __init__(self, master, run_in_background, selectmode="browse", height=12):
+        """
+        Args:
+            master: The parent widget.
+            run_in_background (callable): Runs a function off the main thread, called as
+                run_in_background(function, *args, callback=..., **kwargs).
+            selectmode (str): "browse" for a single guest, "extended" to allow selecting several.
+            height (int): Number of visible rows.
+        """
+        super().__init__(master)
+        self.run_in_background = run_in_background
+
+        self.rows = {}
+        self.index = NameIndex()
+        self.search_text = ""
+        self.last_row = None
+        self.exhausted = False
+        self.loading = False
+        self.search_job = None
+        # How many matches the list widget may hold, and whether matches were left out of it
+        self.show_limit = SHOW_STEP
+        self.more_matches = False
+        # Values of the rows in the list widget, by item id
+        self.shown = {}
+
+        self.search_var = tk.StringVar()
+        ttk.Label(self, text="Search:").grid(row=0, column=0, sticky=tk.W)
+        search_entry = ttk.Entry(self, textvariable=self.search_var)
+        search_entry.grid(row=0, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=2)
+        self.search_var.trace_add("write", lambda *args: self._search_changed())
+
+        self.tree = ttk.Treeview(self, columns=("id", "name"), show="headings", selectmode=selectmode, height=height)
+        self.tree.heading("id", text="ID")
+        self.tree.heading("name", text="Name")
+        self.tree.column("id", width=60, anchor=tk.E)
+        self.tree.column("name", width=220)
+        self.tree.grid(row=1, column=0, columnspan=2, sticky=(tk.N, tk.S, tk.W, tk.E))
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.scrollbar.grid(row=1, column=2, sticky=(tk.N, tk.S))
+        self.tree.configure(yscrollcommand=self._scrolled)
+
+        self.load_page()
+
+    def selected_ids(self):
+        """
+        Returns:
+            list: party_ids of the selected guests.
+        """
+        return [int(item) for item in self.tree.selection()]
+
+    def remove_guests(self, party_ids):
+        """
+        Take guests out of the list, e.g. after they are deleted.
+
+        Args:
+            party_ids (iterable): IDs of the guests to remove.
+        """
+        for party_id in party_ids:
+            self.rows.pop(party_id, None)
+            self.index.remove(party_id)
+            if self.shown.pop(str(party_id), None) is not None:
+                self.tree.delete(str(party_id))
+
+    def apply_changes(self, changes):
+        """
+        Show other stations' changes without reloading: deleted guests are removed, changed guests are
+        updated, and new guests are added if they match the search.
+
+        Args:
+            changes (list): List of (party_id, op, row) tuples; row is None for deleted guests.
+        """
+        for party_id, op, row in changes:
+            if row is None:
+                self.remove_guests([party_id])
+                continue
+            self.rows[party_id] = row
+            self.index.remove(party_id)
+            self.index.add(party_id, row[1], row[2])
+        self._show_matches()
+
+    def load_page(self):
+        """
+        Fetch the next page of guests matching the current search, unless one is already loading.
+        """
+        if self.loading or self.exhausted:
+            return
+        self.loading = True
+        search_text = self.search_text
+
+        def loaded(guests):
+            if search_text != self.search_text or not self.winfo_exists():
+                # The search changed while this page was loading, a new load has already started
+                return
+            self.loading = False
+            if guests is None:
+                # The read failed; scrolling tries the page again
+                return
+            if len(guests) < PAGE_SIZE:
+                self.exhausted = True
+            if guests:
+                self.last_row = guests[-1]
+            self._add_rows(guests)
+
+        def failed(error):
+            if search_text == self.search_text:
+                self.loading = False
+
+        self.run_in_background(guest_management.list_guests, after=self.last_row, limit=PAGE_SIZE,
+                               name_prefix=search_text or None, order_by="l_name", callback=loaded,
+                               error_callback=failed)
+
+    def _add_rows(self, guests):
+        for guest in guests:
+            if guest[0] in self.rows:
+                continue
+            self.rows[guest[0]] = guest
+            self.index.add(guest[0], guest[1], guest[2])
+        self._show_matches()
+
+    def _show_matches(self):
+        """
+        Show the first show_limit loaded guests that match the search text, sorted by last then first name.
+        Rows already in the list are kept (with their selection) and only moved or changed if they need to be.
+        """
+        matches = self.index.search(self.search_text)
+        ordered = heapq.nsmallest(self.show_limit, (self.rows[party_id] for party_id in matches),
+                                  key=lambda guest: (guest[2], guest[1], guest[0]))
+        self.more_matches = len(matches) > len(ordered)
+
+        wanted = {str(guest[0]) for guest in ordered}
+        stale = [item for item in self.tree.get_children() if item not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            for item in stale:
+                del self.shown[item]
+        current = list(self.tree.get_children())
+
+        for position, guest in enumerate(ordered):
+            item = str(guest[0])
+            values = (guest[0], f"{guest[1]} {guest[2]}")
+            if position < len(current) and current[position] == item:
+                if self.shown.get(item) != values:
+                    self.tree.item(item, values=values)
+            elif item in self.shown:
+                current.remove(item)
+                current.insert(position, item)
+                self.tree.move(item, "", position)
+                self.tree.item(item, values=values)
+            else:
+                current.insert(position, item)
+                self.tree.insert("", position, iid=item, values=values)
+            self.shown[item] = values
+
+    def _search_changed(self):
+        # Filter what is already loaded right away, then ask the database once typing pauses
+        self.search_text = self.search_var.get().strip()
+        self.show_limit = SHOW_STEP
+        self._show_matches()
+
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY_MS, self._search_database)
+
+    def _search_database(self):
+        self.search_job = None
+        self.last_row = None
+        self.exhausted = False
+        self.loading = False
+        self.load_page()
+
+    def _scrolled(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) < LOAD_MORE_AT:
+            return
+        if self.more_matches:
+            self.show_limit += SHOW_STEP
+            self._show_matches()
+        else:
+            self.load_page()
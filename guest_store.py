@@ -0,0 +1,259 @@
+# guest_store.py
+#!/usr/env/bin python3
+
+"""
+Compact in-memory representations of guests.
+
+    Guest        - One guest as a small typed record (using __slots__), in place of a 6-tuple indexed by position
+    GuestColumns - Many guests stored column by column: ids and fees in typed arrays, member types and menu items
+                   as one-byte codes into MEMBER_TYPES and FOOD_OPTIONS, and names interned. A snapshot of a
+                   large event takes a fraction of the memory of a list of tuples, and totals and counts are
+                   single passes over flat arrays.
+"""
+import sys
+from array import array
+from collections import Counter
+from itertools import repeat
+
+import database
+from member_types import MEMBER_TYPES
+from menu_choices import FOOD_OPTIONS
+
+
+class Guest:
+    """
+    A guest record with named fields.
+    """
+
+    __slots__ = ("party_id", "f_name", "l_name", "member_type", "amt_paid", "menu_item")
+
+    def __init__(self, party_id, f_name, l_name, member_type, amt_paid, menu_item):
+        self.party_id = party_id
+        self.f_name = f_name
+        self.l_name = l_name
+        self.member_type = member_type
+        self.amt_paid = amt_paid
+        self.menu_item = menu_item
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Args:
+            row (tuple): Guest row (party_id, f_name, l_name, member_type, amt_paid, menu_item).
+
+        Returns:
+            Guest: The guest.
+        """
+        return cls(row[0], row[1], row[2], row[3], float(row[4]), row[5])
+
+    def as_row(self):
+        """
+        Returns:
+            tuple: Guest row (party_id, f_name, l_name, member_type, amt_paid, menu_item).
+        """
+        return (self.party_id, self.f_name, self.l_name, self.member_type, self.amt_paid, self.menu_item)
+
+    @property
+    def name(self):
+        return f"{self.f_name} {self.l_name}"
+
+    def __eq__(self, other):
+        return isinstance(other, Guest) and self.as_row() == other.as_row()
+
+    def __repr__(self):
+        return f"Guest{self.as_row()!r}"
+
+
+class Categories:
+    """
+    Maps category strings to small integer codes. Starts with a known list and adds unexpected values
+    to the end, so codes for the known values never change.
+    """
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value):
+        """
+        Returns:
+            int: The code for a value, assigning a new one if it hasn't been seen.
+        """
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class GuestColumns:
+    """
+    A column-oriented guest store.
+    """
+
+    def __init__(self, rows=()):
+        """
+        Args:
+            rows (iterable): Guest rows (party_id, f_name, l_name, member_type, amt_paid, menu_item) to load.
+        """
+        self.member_types = Categories(MEMBER_TYPES)
+        self.menu_items = Categories(FOOD_OPTIONS)
+
+        self.party_ids = array("q")
+        self.f_names = []
+        self.l_names = []
+        self.member_type_codes = array("B")
+        self.amt_paid = array("d")
+        self.menu_item_codes = array("B")
+
+        self.extend(rows)
+
+    @classmethod
+    def from_database(cls, **filters):
+        """
+        Stream guests from the database straight into a store, without building a list of rows first.
+
+        Args:
+            filters: Filters accepted by database.iter_guests, e.g. member_type="Member".
+
+        Returns:
+            GuestColumns: The loaded store. Raises the database error if the read fails part way.
+        """
+        return cls(database.iter_guests(**filters))
+
+    def append(self, row):
+        """
+        Args:
+            row (tuple): Guest row (party_id, f_name, l_name, member_type, amt_paid, menu_item).
+        """
+        self.party_ids.append(row[0])
+        self.f_names.append(sys.intern(row[1]))
+        self.l_names.append(sys.intern(row[2]))
+        self.member_type_codes.append(self.member_types.code(row[3]))
+        self.amt_paid.append(float(row[4]))
+        self.menu_item_codes.append(self.menu_items.code(row[5]))
+
+    def extend(self, rows):
+        """
+        Args:
+            rows (iterable): Guest rows to add.
+        """
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return len(self.party_ids)
+
+    def row(self, index):
+        """
+        Returns:
+            tuple: The guest at a position as a row (party_id, f_name, l_name, member_type, amt_paid, menu_item).
+        """
+        return (self.party_ids[index], self.f_names[index], self.l_names[index],
+                self.member_types.values[self.member_type_codes[index]], self.amt_paid[index],
+                self.menu_items.values[self.menu_item_codes[index]])
+
+    def __getitem__(self, index):
+        return Guest(*self.row(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def rows(self):
+        """
+        Yields:
+            tuple: Every guest as a row, in store order.
+        """
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def total_fees(self):
+        """
+        Returns:
+            float: Sum of amt_paid over every guest.
+        """
+        return sum(self.amt_paid)
+
+    def count_by_member_type(self):
+        """
+        Returns:
+            dict: Number of guests per member type, for every known type (zero if none).
+        """
+        counts = Counter(self.member_type_codes)
+        return {value: counts.get(code, 0) for code, value in enumerate(self.member_types.values)}
+
+    def count_by_menu_item(self):
+        """
+        Returns:
+            dict: Number of guests per menu item, for every known item (zero if none).
+        """
+        counts = Counter(self.menu_item_codes)
+        return {value: counts.get(code, 0) for code, value in enumerate(self.menu_items.values)}
+
+    def fees_by_member_type(self):
+        """
+        Returns:
+            dict: Sum of amt_paid per member type.
+        """
+        totals = [0.0] * len(self.member_types)
+        for code, fee in zip(self.member_type_codes, self.amt_paid):
+            totals[code] += fee
+        return dict(zip(self.member_types.values, totals))
+
+    def menu_by_member_type(self):
+        """
+        Returns:
+            dict: For each member type, a dict of guest counts per menu item.
+        """
+        width = len(self.menu_items)
+        counts = Counter(type_code * width + menu_code
+                         for type_code, menu_code in zip(self.member_type_codes, self.menu_item_codes))
+        return {
+            type_: {item: counts.get(type_code * width + menu_code, 0) for menu_code, item in enumerate(self.menu_items.values)}
+            for type_code, type_ in enumerate(self.member_types.values)
+        }
+
+    def aggregate(self, group_by=()):
+        """
+        Guest counts and fee totals per group, in the same form as database.aggregate_guests.
+
+        Args:
+            group_by (tuple): Columns to group by, any of database.GROUP_COLUMNS.
+
+        Returns:
+            list: List of tuples (*group values, guest count, total amt_paid), ordered by the group columns.
+        """
+        columns = {"member_type": (self.member_type_codes, self.member_types.values),
+                   "menu_item": (self.menu_item_codes, self.menu_items.values)}
+        for column in group_by:
+            if column not in columns:
+                raise ValueError(f"Cannot group guests by {column!r}")
+
+        # Group on the codes, and only turn the few distinct groups back into strings
+        totals = {}
+        keys = zip(*(columns[column][0] for column in group_by)) if group_by else repeat((), len(self))
+        for key, fee in zip(keys, self.amt_paid):
+            count, fees = totals.get(key, (0, 0.0))
+            totals[key] = (count + 1, fees + fee)
+        if not group_by:
+            return [totals.get((), (0, 0.0))]
+
+        groups = {tuple(columns[column][1][code] for column, code in zip(group_by, key)): value
+                  for key, value in totals.items()}
+        return [group + groups[group] for group in sorted(groups)]
+
+    def memory_bytes(self):
+        """
+        Estimate the memory held by the store, counting each distinct interned name once.
+
+        Returns:
+            int: Approximate size in bytes.
+        """
+        size = sum(sys.getsizeof(column) for column in (self.party_ids, self.member_type_codes, self.amt_paid,
+                                                        self.menu_item_codes, self.f_names, self.l_names))
+        names = {id(name): name for name in self.f_names + self.l_names}
+        return size + sum(sys.getsizeof(name) for name in names.values())
@@ -0,0 +1,307 @@
+# host_manager.py
+#!/usr/env/bin python3
+
+"""
+Chooses which MySQL server new connections go to.
+
+Every configured host is probed in the background with a plain TCP connect, which measures its round
+trip without logging in. Connections go to the fastest healthy host, and stay with it until another
+host is faster by SWITCH_GAP milliseconds and SWITCH_RATIO of its latency, so probe jitter between two
+similar hosts doesn't move connections back and forth. A host that fails FAILURE_THRESHOLD times in a
+row (probes or real connects) has its circuit breaker opened and is skipped entirely, so no operation
+waits on a server that is down; after BREAKER_COOLDOWN seconds, or as soon as a probe reaches it again,
+it gets one trial connection (half-open) before it is trusted again. Other connections skip the host
+while the trial is running.
+
+Hosts are written "host" or "host:port", so stand-in servers on one machine can be told apart by port.
+
+Variables:
+        DEFAULT_PORT      - The port used when a host doesn't name one
+        CONNECT_TIMEOUT   - Seconds a connection attempt or probe may take before the host counts as failed
+        PROBE_INTERVAL    - Seconds between background probes of every host
+        FAILURE_THRESHOLD - Consecutive failures that open a host's circuit breaker
+        BREAKER_COOLDOWN  - Seconds an open breaker skips its host before a trial connection is allowed
+        LATENCY_WEIGHT    - Weight of the newest probe in a host's smoothed latency
+        SWITCH_GAP        - Milliseconds another host must be faster by before it replaces the preferred host
+        SWITCH_RATIO      - Fraction of the preferred host's latency another host must be at or under to replace it
+"""
+import socket
+import threading
+import time
+
+DEFAULT_PORT = 3306
+CONNECT_TIMEOUT = 2.0
+PROBE_INTERVAL = 5.0
+FAILURE_THRESHOLD = 3
+BREAKER_COOLDOWN = 30.0
+LATENCY_WEIGHT = 0.3
+SWITCH_GAP = 5.0
+SWITCH_RATIO = 0.8
+
+
+def parse_host(address, default_port=DEFAULT_PORT):
+    """
+    Args:
+        address (str): "host" or "host:port".
+
+    Returns:
+        tuple: (host, port).
+    """
+    host, separator, port = address.strip().rpartition(":")
+    if not separator or not port.isdigit():
+        return address.strip(), default_port
+    return host, int(port)
+
+
+def tcp_probe(host, port, timeout=CONNECT_TIMEOUT):
+    """
+    Time a TCP connect to a server, without logging in.
+
+    Returns:
+        float: Round trip in milliseconds. Raises OSError if the server can't be reached in time.
+    """
+    started = time.perf_counter()
+    with socket.create_connection((host, port), timeout=timeout):
+        return (time.perf_counter() - started) * 1000
+
+
+class Host:
+    """
+    One server and what is known about its health.
+    """
+
+    def __init__(self, address, label=None):
+        """
+        Args:
+            address (str): "host" or "host:port".
+            label (str): Name used in messages and timings. Defaults to the address.
+        """
+        self.address = address
+        self.host, self.port = parse_host(address)
+        self.label = label or address
+        # Smoothed probe round trip in milliseconds, None until measured
+        self.latency = None
+        self.failures = 0
+        # time.monotonic() when the breaker opened, None while closed
+        self.opened_at = None
+        self.last_error = None
+        # time.monotonic() when a half-open trial connection started, None when none is running
+        self.trial_started = None
+
+    @property
+    def state(self):
+        """
+        Returns:
+            str: "closed" (healthy), "open" (skipped) or "half-open" (one trial connection allowed).
+        """
+        if self.opened_at is None:
+            return "half-open" if self.failures >= FAILURE_THRESHOLD else "closed"
+        if time.monotonic() - self.opened_at >= BREAKER_COOLDOWN:
+            return "half-open"
+        return "open"
+
+    def __repr__(self):
+        latency = "?" if self.latency is None else f"{self.latency:.1f} ms"
+        return f"Host({self.address!r}, {self.state}, {latency})"
+
+
+class HostManager:
+    """
+    Tracks the health and latency of a list of hosts and orders them for connecting.
+    """
+
+    def __init__(self, hosts, probe=tcp_probe, interval=PROBE_INTERVAL, timeout=CONNECT_TIMEOUT):
+        """
+        Args:
+            hosts (list): Host objects or "host[:port]" strings, in order of preference when nothing
+                          has been measured yet.
+            probe (callable): Function (host, port, timeout) returning a round trip in milliseconds and
+                              raising OSError on failure.
+            interval (float): Seconds between background probes.
+            timeout (float): Seconds a probe may take.
+        """
+        self.hosts = [host if isinstance(host, Host) else Host(host) for host in hosts]
+        self.probe = probe
+        self.interval = interval
+        self.timeout = timeout
+        self.subscribers = []
+        self._best = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """
+        Register a function to hear when the preferred host changes.
+
+        Args:
+            callback (callable): Called with the new preferred Host (or None if every host is down).
+        """
+        self.subscribers.append(callback)
+
+    def candidates(self):
+        """
+        Returns:
+            list: Hosts worth trying, best first: healthy hosts by latency (unmeasured ones after measured
+                  ones, in configured order), then half-open hosts. The preferred host stays first unless
+                  another is clearly faster. Hosts with an open breaker are left out, and so are half-open
+                  hosts while their trial connection is running.
+        """
+        with self._lock:
+            now = time.monotonic()
+            ranked = []
+            for order, host in enumerate(self.hosts):
+                state = host.state
+                if state == "open":
+                    continue
+                if state == "half-open" and host.trial_started is not None and now - host.trial_started < self.timeout:
+                    continue
+                ranked.append((state != "closed", host.failures > 0, host.latency is None,
+                               host.latency or 0.0, order, host))
+            hosts = [entry[-1] for entry in sorted(ranked)]
+            preferred = self._best
+            if preferred in hosts and hosts[0] is not preferred and not self._clearly_better(hosts[0], preferred):
+                hosts.remove(preferred)
+                hosts.insert(0, preferred)
+        return hosts
+
+    @staticmethod
+    def _clearly_better(challenger, preferred):
+        # Health always wins; latency only by SWITCH_GAP and SWITCH_RATIO
+        if preferred.state != "closed" or preferred.failures > 0:
+            return challenger.state == "closed" and challenger.failures == 0
+        if challenger.latency is None:
+            return False
+        if preferred.latency is None:
+            return True
+        return (preferred.latency - challenger.latency >= SWITCH_GAP and
+                challenger.latency <= preferred.latency * SWITCH_RATIO)
+
+    def begin_attempt(self, host):
+        """
+        Claim a connection attempt to a host. A half-open host allows only one trial connection at a time.
+
+        Args:
+            host (Host): The host about to be connected to.
+
+        Returns:
+            bool: True if the attempt may go ahead, False if another trial to the host is already running.
+        """
+        with self._lock:
+            if host.state != "half-open":
+                return True
+            if host.trial_started is not None and time.monotonic() - host.trial_started < self.timeout:
+                return False
+            host.trial_started = time.monotonic()
+            return True
+
+    def best(self):
+        """
+        Returns:
+            Host: The host new connections should go to, or None if every breaker is open.
+        """
+        candidates = self.candidates()
+        return candidates[0] if candidates else None
+
+    def record_success(self, host, latency=None):
+        """
+        Note that a host answered, closing its breaker.
+
+        Args:
+            host (Host): The host.
+            latency (float): A round trip in milliseconds to fold into its smoothed latency.
+        """
+        with self._lock:
+            host.failures = 0
+            host.opened_at = None
+            host.last_error = None
+            host.trial_started = None
+            if latency is not None:
+                host.latency = latency if host.latency is None else (
+                    LATENCY_WEIGHT * latency + (1 - LATENCY_WEIGHT) * host.latency)
+        self._check_best()
+
+    def record_failure(self, host, error):
+        """
+        Note that a host failed, opening its breaker after FAILURE_THRESHOLD failures in a row.
+
+        Args:
+            host (Host): The host.
+            error: What went wrong, kept for status displays.
+        """
+        with self._lock:
+            host.failures += 1
+            host.last_error = str(error)
+            host.trial_started = None
+            if host.failures >= FAILURE_THRESHOLD:
+                if host.opened_at is None:
+                    print(f"Database host {host.label} is unreachable, skipping it for {BREAKER_COOLDOWN:.0f} seconds.")
+                # Restart the cooldown, including after a failed half-open trial
+                host.opened_at = time.monotonic()
+        self._check_best()
+
+    def probe_all(self):
+        """
+        Probe every host once, including ones with an open breaker (a successful probe lets them
+        have a trial connection straight away).
+        """
+        for host in list(self.hosts):
+            try:
+                latency = self.probe(host.host, host.port, self.timeout)
+            except OSError as e:
+                self.record_failure(host, e)
+                continue
+            if host.opened_at is not None:
+                # Reachable again: half-open, so one failed connect reopens the breaker
+                with self._lock:
+                    host.opened_at = None
+                    host.failures = FAILURE_THRESHOLD
+                    host.latency = latency
+                self._check_best()
+            else:
+                self.record_success(host, latency)
+
+    def _check_best(self):
+        best = self.best()
+        if best is not self._best:
+            self._best = best
+            for callback in self.subscribers:
+                callback(best)
+
+    def start(self):
+        """
+        Start probing in the background, if it isn't already.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="database-host-probes", daemon=True)
+            self._thread.start()
+
+    def probing(self):
+        """
+        Returns:
+            bool: True while background probes are running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the background probes.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_all()
+            self._stop.wait(self.interval)
+
+    def status(self):
+        """
+        Returns:
+            list: For each host, a dict with its "address", "label", "state", "latency", "failures" and "last_error".
+        """
+        with self._lock:
+            return [{"address": host.address, "label": host.label, "state": host.state, "latency": host.latency,
+                     "failures": host.failures, "last_error": host.last_error} for host in self.hosts]
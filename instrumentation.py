@@ -0,0 +1,385 @@
+# instrumentation.py
+#!/usr/env/bin python3
+
+"""
+In-process timing for database calls.
+
+Every database call is recorded as a Call: how long it spent getting a connection, running its query,
+and fetching rows, which host served it, how many rows it returned, and whether it failed. Finished
+calls feed counters and latency histograms that can be read with snapshot() or printed with dump().
+Calls slower than SLOW_QUERY_MS are kept in a slow query log, and also appended to SLOW_QUERY_LOG if set.
+
+During an event, run `kill -USR1 <pid>` to print the current numbers (see install_dump_signal).
+"""
+import functools
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Calls taking longer than this many milliseconds go into the slow query log
+SLOW_QUERY_MS = float(os.environ.get("PARTYPLANNER_SLOW_QUERY_MS", 200))
+# File the slow query log is also appended to, or None to keep it in memory only
+SLOW_QUERY_LOG = os.environ.get("PARTYPLANNER_SLOW_QUERY_LOG")
+# Number of slow calls kept in memory
+SLOW_QUERY_KEEP = 100
+# Upper bounds, in milliseconds, of the histogram buckets
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf"))
+
+
+class Histogram:
+    """
+    A fixed-bucket latency histogram.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        """
+        Args:
+            ms (float): A latency in milliseconds.
+        """
+        for index, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[index] += 1
+                break
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """
+        Estimate a percentile as the upper bound of the bucket it falls in.
+
+        Args:
+            fraction (float): Percentile as a fraction, e.g. 0.99.
+
+        Returns:
+            float: The estimated latency in milliseconds.
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= target:
+                return min(BUCKETS_MS[index], self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        """
+        Returns:
+            dict: count, mean_ms, p50_ms, p99_ms and max_ms.
+        """
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+_local = threading.local()
+
+
+def count(name, amount=1):
+    """
+    Add to a counter.
+
+    Args:
+        name (str): Counter name.
+        amount (int): Amount to add.
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name, ms):
+    """
+    Add a latency to a histogram.
+
+    Args:
+        name (str): Histogram name.
+        ms (float): Latency in milliseconds.
+    """
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(ms)
+
+
+class Call:
+    """
+    Timing record for one database call.
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name (str): The operation, e.g. "add_guest".
+        """
+        self.name = name
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.rows = 0
+        self.host = None
+        self.error = None
+
+    def add_phase(self, phase, seconds):
+        """
+        Add time spent in one phase of the call ("connect", "query" or "fetch").
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def finish(self):
+        """
+        Record the finished call in the counters, histograms and slow query log.
+        """
+        total_ms = (time.perf_counter() - self.started) * 1000
+
+        count(f"calls.{self.name}")
+        count(f"rows.{self.name}", self.rows)
+        if self.error is not None:
+            count(f"errors.{self.name}")
+        if self.host:
+            count(f"host.{self.host}")
+
+        observe(f"{self.name}.total", total_ms)
+        for phase, seconds in self.phases.items():
+            observe(f"{self.name}.{phase}", seconds * 1000)
+
+        if total_ms >= SLOW_QUERY_MS:
+            _log_slow_call(self, total_ms)
+
+
+def _log_slow_call(call, total_ms):
+    entry = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "operation": call.name,
+        "total_ms": round(total_ms, 3),
+        "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in call.phases.items()},
+        "rows": call.rows,
+        "host": call.host,
+        "error": str(call.error) if call.error is not None else None,
+    }
+    with _lock:
+        _slow_queries.append(entry)
+
+    if SLOW_QUERY_LOG:
+        try:
+            with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as file:
+                file.write(f"{entry['time']} {entry['operation']} {entry['total_ms']}ms rows={entry['rows']} "
+                           f"host={entry['host']} phases={entry['phases_ms']} error={entry['error']}\n")
+        except OSError as err:
+            print("Unable to write slow query log:", err)
+
+
+def current_call():
+    """
+    Returns:
+        Call: The call running on this thread, or None.
+    """
+    return getattr(_local, "call", None)
+
+
+class timed:
+    """
+    Context manager that records a database call. While it is active, current_call() returns its Call.
+
+        with instrumentation.timed("add_guest") as call:
+            ...
+    """
+
+    def __init__(self, name):
+        self.call = Call(name)
+        self.outer = None
+
+    def __enter__(self):
+        self.outer = current_call()
+        _local.call = self.call
+        return self.call
+
+    def __exit__(self, exc_type, exc, traceback):
+        _local.call = self.outer
+        if exc is not None and self.call.error is None:
+            self.call.error = exc
+        self.call.finish()
+        return False
+
+
+def instrumented(name):
+    """
+    Decorator that records every call of a function with timed(name).
+
+    Args:
+        name (str): The operation name.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_error(error, call=None):
+    """
+    Mark a call as failed. Used where the database functions catch and report an error themselves.
+
+    Args:
+        error (Exception): The error.
+        call (Call): The call that failed, defaults to the current call.
+    """
+    call = call or current_call()
+    if call is not None:
+        call.error = error
+
+
+def record_phase(phase, seconds, host=None):
+    """
+    Add time to a phase of the current call, if there is one.
+
+    Args:
+        phase (str): "connect", "query" or "fetch".
+        seconds (float): Time spent.
+        host (str): The host that served the call, if known.
+    """
+    call = current_call()
+    if call is not None:
+        call.add_phase(phase, seconds)
+        if host:
+            call.host = host
+
+
+class TimedCursor:
+    """
+    Wraps a database cursor, adding time spent in execute to the "query" phase and time spent fetching
+    to the "fetch" phase of a call, and counting the rows fetched.
+    """
+
+    def __init__(self, cursor, call=None):
+        """
+        Args:
+            cursor: The cursor to wrap.
+            call (Call): The call to record into, defaults to the current call.
+        """
+        self._cursor = cursor
+        self._call = call or current_call()
+
+    def _time(self, phase, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._call is not None:
+                self._call.add_phase(phase, time.perf_counter() - started)
+
+    def execute(self, query, params=()):
+        return self._time("query", self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_of_params):
+        return self._time("query", self._cursor.executemany, query, seq_of_params)
+
+    def fetchone(self):
+        row = self._time("fetch", self._cursor.fetchone)
+        if row is not None and self._call is not None:
+            self._call.rows += 1
+        return row
+
+    def fetchmany(self, size):
+        rows = self._time("fetch", self._cursor.fetchmany, size)
+        if self._call is not None:
+            self._call.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._time("fetch", self._cursor.fetchall)
+        if self._call is not None:
+            self._call.rows += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def snapshot():
+    """
+    Returns:
+        dict: "counters", "histograms" (summaries) and "slow_queries".
+    """
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {name: histogram.summary() for name, histogram in _histograms.items()},
+            "slow_queries": list(_slow_queries),
+        }
+
+
+def reset():
+    """
+    Clear every counter, histogram and the in-memory slow query log.
+    """
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _slow_queries.clear()
+
+
+def dump(file=None):
+    """
+    Print the current counters, histograms and slow calls.
+
+    Args:
+        file: Where to print, defaults to standard error.
+    """
+    file = file or sys.stderr
+    data = snapshot()
+
+    print("** Database Metrics **", file=file)
+    for name in sorted(data["counters"]):
+        print(f"{name:<40} {data['counters'][name]}", file=file)
+
+    print(f"\n{'Latency (ms)':<40} {'count':>8} {'mean':>10} {'p50':>10} {'p99':>10} {'max':>10}", file=file)
+    for name in sorted(data["histograms"]):
+        summary = data["histograms"][name]
+        print(f"{name:<40} {summary['count']:>8} {summary['mean_ms']:>10.3f} {summary['p50_ms']:>10.3f} "
+              f"{summary['p99_ms']:>10.3f} {summary['max_ms']:>10.3f}", file=file)
+
+    if data["slow_queries"]:
+        print(f"\nSlow calls (>= {SLOW_QUERY_MS:g} ms):", file=file)
+        for entry in data["slow_queries"]:
+            print(f"{entry['time']} {entry['operation']} {entry['total_ms']}ms rows={entry['rows']} "
+                  f"host={entry['host']} error={entry['error']}", file=file)
+    file.flush()
+
+
+def install_dump_signal(signal_number=None):
+    """
+    Print the metrics whenever the process receives a signal (SIGUSR1 by default). Does nothing on
+    platforms without that signal, such as Windows.
+
+    Args:
+        signal_number (int): The signal to listen for.
+    """
+    if signal_number is None:
+        signal_number = getattr(signal, "SIGUSR1", None)
+    if signal_number is None:
+        return
+    # The handler runs on the main thread, possibly while it holds _lock in count() or observe(), so the
+    # dump runs on its own thread and waits for the lock there instead of deadlocking
+    signal.signal(signal_number, lambda signum, frame: threading.Thread(target=dump, name="metrics-dump", daemon=True).start())
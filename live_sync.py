@@ -0,0 +1,267 @@
+# live_sync.py
+#!/usr/env/bin python3
+
+"""
+Keeps several planner stations that share one guest table up to date with each other.
+
+Triggers on the guest table append an entry to an append-only change log (database.CHANGE_TABLE) for every
+insert, update and delete, whichever station made it. Each station remembers the last change_id it has
+seen and polls for newer entries; a poll is a single indexed range read that returns only what changed,
+joined to the current guest rows, so stations apply deltas instead of re-reading the table.
+
+A change_id is handed out when a write starts but only becomes visible when it commits, so a slow
+transaction can commit an entry behind ones a station has already read. Every read therefore starts
+GAP_WINDOW ids behind the newest change seen, skipping the ids already applied. An entry that commits
+more than GAP_WINDOW ids late is missed, until the station next copies the whole table.
+
+Stations report their position every ACKNOWLEDGE_EVERY seconds, and entries every station has read
+(less the re-read window) are deleted, so the log stays small. A station that hasn't reported for
+POSITION_RETENTION seconds no longer holds the log back; if it returns to find entries it needed
+deleted, it is told to start over (see ChangePosition.behind).
+"""
+import os
+import socket
+import threading
+import time
+
+import database
+
+# Milliseconds between polls in the GUI
+POLL_MS = 1000
+# Maximum number of change log entries read per poll
+POLL_LIMIT = 500
+# Number of change_ids re-read behind the newest one seen, to pick up entries that committed late
+GAP_WINDOW = 200
+# Seconds between reports of a station's position, which also prune the change log
+ACKNOWLEDGE_EVERY = 60
+# Seconds after which a station that stopped reporting its position no longer holds back pruning
+POSITION_RETENTION = 7 * 24 * 3600
+
+
+def change_log_statements():
+    """
+    Build the statements that create the change log table and its triggers for the backend in use.
+
+    Returns:
+        list: SQL statements, safe to run more than once.
+    """
+    table = database.TABLE_NAME
+    changes = database.CHANGE_TABLE
+    triggers = [("ai", "INSERT", "NEW", "insert"), ("au", "UPDATE", "NEW", "update"), ("ad", "DELETE", "OLD", "delete")]
+
+    if database.backend_name() == "sqlite":
+        statements = [
+            f"CREATE TABLE IF NOT EXISTS {changes} ("
+            f"change_id INTEGER PRIMARY KEY AUTOINCREMENT, party_id INTEGER NOT NULL, op TEXT NOT NULL, "
+            f"changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)",
+        ]
+        for suffix, event, row, op in triggers:
+            statements.append(f"DROP TRIGGER IF EXISTS {table}_{suffix}")
+            statements.append(f"CREATE TRIGGER {table}_{suffix} AFTER {event} ON {table} "
+                              f"BEGIN INSERT INTO {changes} (party_id, op) VALUES ({row}.party_id, '{op}'); END")
+        return statements
+
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {changes} ("
+        f"change_id BIGINT AUTO_INCREMENT PRIMARY KEY, party_id INT NOT NULL, "
+        f"op ENUM('insert', 'update', 'delete') NOT NULL, "
+        f"changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)",
+    ]
+    for suffix, event, row, op in triggers:
+        statements.append(f"DROP TRIGGER IF EXISTS {table}_{suffix}")
+        statements.append(f"CREATE TRIGGER {table}_{suffix} AFTER {event} ON {table} FOR EACH ROW "
+                          f"INSERT INTO {changes} (party_id, op) VALUES ({row}.party_id, '{op}')")
+    return statements
+
+
+def position_table_statements():
+    """
+    Build the statement that creates the table of station positions in the change log.
+
+    Returns:
+        list: SQL statements, safe to run more than once.
+    """
+    return [
+        f"CREATE TABLE IF NOT EXISTS {database.POSITION_TABLE} ("
+        f"station VARCHAR(100) NOT NULL PRIMARY KEY, change_id BIGINT NOT NULL, acked_at DOUBLE NOT NULL)",
+    ]
+
+
+def station_name(kind):
+    """
+    Returns:
+        str: A name for a reader of the change log that is unique to this process.
+    """
+    return f"{kind}:{socket.gethostname()}:{os.getpid()}"
+
+
+class ChangePosition:
+    """
+    How far one station has read the change log: the newest change_id applied, plus the ids applied
+    within GAP_WINDOW of it so entries that commit late can be picked up without applying others twice.
+    """
+
+    def __init__(self, station, last_id, window=GAP_WINDOW):
+        """
+        Args:
+            station (str): Name the position is reported under.
+            last_id (int): The newest change_id already applied. Committed ids just before it are read
+                           again once, which is harmless since every entry carries the guest's current row;
+                           pass their ids to reset() to avoid it.
+            window (int): Number of change_ids re-read behind last_id.
+        """
+        self.station = station
+        self.last_id = last_id
+        self.window = window
+        # Set when entries this station hadn't read were pruned, so it must copy the table again
+        self.behind = False
+        self._applied = set()
+        self._after = None
+        self._acknowledged_at = None
+
+    def read(self, limit):
+        """
+        Read the next page of entries that haven't been applied yet. Call repeatedly while it says
+        there may be more; the next round starts from the re-read window again.
+
+        Args:
+            limit (int): Maximum number of entries read.
+
+        Returns:
+            tuple: (list of new (change_id, party_id, op, row) entries, True if there may be more),
+                   or None if the read failed.
+        """
+        if self._after is None:
+            self._after = max(self.last_id - self.window, 0)
+        entries = database.fetch_changes(self._after, limit)
+        if entries is None:
+            self._after = None
+            return None
+
+        fresh = [entry for entry in entries if entry[0] not in self._applied]
+        for entry in fresh:
+            self._applied.add(entry[0])
+            self.last_id = max(self.last_id, entry[0])
+        more = len(entries) == limit
+        if more:
+            self._after = entries[-1][0]
+        else:
+            self._after = None
+            self._applied = {change_id for change_id in self._applied if change_id > self.last_id - self.window}
+        return fresh, more
+
+    def acknowledge(self, force=False):
+        """
+        Report this station's position, at most every ACKNOWLEDGE_EVERY seconds, and delete the change
+        log entries every station has read. Also notices if entries this station still needed were
+        deleted while it was away, setting behind.
+
+        Args:
+            force (bool): Report even if the last report was recent.
+        """
+        now = time.monotonic()
+        if not force and self._acknowledged_at is not None and now - self._acknowledged_at < ACKNOWLEDGE_EVERY:
+            return
+        self._acknowledged_at = now
+
+        oldest = database.oldest_change_id()
+        if oldest is not None and oldest > self.last_id + 1:
+            self.behind = True
+            return
+        needed = database.acknowledge_changes(self.station, self.last_id, time.time() - POSITION_RETENTION)
+        if needed:
+            # Entries inside everyone's re-read window are kept
+            database.prune_changes(needed - self.window)
+
+    def reset(self, last_id, applied=()):
+        """
+        Start again from a fresh copy of the table.
+
+        Args:
+            last_id (int): The newest change_id the copy reflects.
+            applied (iterable): The change_ids within the re-read window that the copy reflects, so
+                                only entries that commit later are read again.
+        """
+        self.last_id = last_id
+        self.behind = False
+        self._applied = set(applied)
+        self._after = None
+        self.acknowledge(force=True)
+
+
+class ChangeFeed:
+    """
+    Reads new change log entries since the last poll and hands them to subscribers.
+    """
+
+    def __init__(self, start_id=None, limit=POLL_LIMIT, station=None):
+        """
+        Args:
+            start_id (int): The last change_id already seen. Defaults to the newest change, so only
+                            changes made from now on are delivered.
+            limit (int): Maximum number of entries read per poll.
+            station (str): Name the feed's position is reported under. Defaults to one for this process.
+        """
+        self.station = station or station_name("feed")
+        self.position = None if start_id is None else ChangePosition(self.station, start_id)
+        self.limit = limit
+        self.subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """
+        Register a function to receive changes.
+
+        Args:
+            callback (callable): Called with a list of (party_id, op, row) tuples, where op is "insert",
+                                 "update" or "delete" and row is the current guest row (None once deleted).
+        """
+        self.subscribers.append(callback)
+
+    def poll(self):
+        """
+        Read every change since the last poll. Several changes to one guest are merged into one, and
+        subscribers are called with the result. Safe to call from a background thread; subscribers
+        are then called on that thread.
+
+        Returns:
+            list: List of (party_id, op, row) tuples, empty if nothing changed or the read failed.
+        """
+        with self._lock:
+            if self.position is None:
+                start_id = database.latest_change_id()
+                recent = database.fetch_changes(max((start_id or 0) - GAP_WINDOW, 0), GAP_WINDOW)
+                if start_id is not None and recent is not None:
+                    # Entries already committed are old news; only later ones, including late commits, are delivered
+                    self.position = ChangePosition(self.station, start_id)
+                    self.position.reset(start_id, [entry[0] for entry in recent if entry[0] <= start_id])
+                return []
+
+            merged = {}
+            while True:
+                page = self.position.read(self.limit)
+                if page is None:
+                    break
+                entries, more = page
+                for change_id, party_id, op, row in entries:
+                    # The joined row is the guest as it is now, so the newest entry per guest wins
+                    if row is None:
+                        op = "delete"
+                    elif merged.get(party_id, (None, "update"))[1] == "insert":
+                        op = "insert"
+                    merged.pop(party_id, None)
+                    merged[party_id] = (party_id, op, row)
+                if not more:
+                    self.position.acknowledge()
+                    break
+            if self.position.behind:
+                # The cache checks the table version anyway, so it's enough to carry on from the newest change
+                start_id = database.latest_change_id()
+                if start_id is not None:
+                    self.position.reset(start_id)
+
+        changes = list(merged.values())
+        if changes:
+            for callback in self.subscribers:
+                callback(changes)
+        return changes
@@ -1,6 +1,22 @@
 #member_types.py
 #!/usr/env/bin python3
 
+# Every member type a guest can have
+MEMBER_TYPES = [
+    "Guest",
+    "Member",
+    "Master of Ceremonies",
+    "Keynote Speaker",
+    "Kitchen Staff",
+    "Waiter",
+    "Usher"
+]
+
+# Member types expected to pay a fee
+PAYING_TYPES = ("Guest", "Member")
+# Member types counted as event staff in reports
+STAFF_TYPES = ("Master of Ceremonies", "Keynote Speaker", "Usher", "Kitchen Staff")
+
 def select_member_type():
     """
     Presents a menu for selecting a member type.
@@ -8,15 +24,7 @@ def select_member_type():
     Returns:
         str: Selected member type.
     """
-    member_types = [
-        "Guest",
-        "Member",
-        "Master of Ceremonies",
-        "Keynote Speaker",
-        "Kitchen Staff",
-        "Waiter",
-        "Usher"
-    ]
+    member_types = MEMBER_TYPES
 
     print("\n** Member Types **\n")
     for i, member_type in enumerate(member_types):
@@ -24,10 +32,10 @@ def select_member_type():
 
     while True:
         try:
-            choice = int(input("Enter your choice (1-7): "))
+            choice = int(input(f"Enter your choice (1-{len(member_types)}): "))
             if 1 <= choice <= len(member_types):
                 return member_types[choice - 1]  # Return the selected member type
             else:
-                print("Invalid choice. Please enter a number between 1 and 7.")
+                print(f"Invalid choice. Please enter a number between 1 and {len(member_types)}.")
         except ValueError:
             print("Invalid input. Please enter a number.")
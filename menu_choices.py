@@ -1,6 +1,9 @@
 #menu_choices.py
 #!/usr/env/bin python3
 
+# Every food item on the menu
+FOOD_OPTIONS = ("BEEF", "CHICKEN", "FISH", "PORK", "PASTA", "VEGAN")
+
 def select_menu_item():
     """
     Presents a menu and allows the user to select a food item.
@@ -8,7 +11,7 @@ def select_menu_item():
     Returns:
         str: The selected food item name.
     """
-    food_options = ("BEEF", "CHICKEN", "FISH", "PORK", "PASTA", "VEGAN")
+    food_options = FOOD_OPTIONS
 
     print("\n** Food Menu **\n")
     for i, option in enumerate(food_options):
@@ -16,11 +19,11 @@ def select_menu_item():
 
     while True:
         try:
-            choice = int(input("Enter your choice (1-6): "))
+            choice = int(input(f"Enter your choice (1-{len(food_options)}): "))
             if 1 <= choice <= len(food_options):
                 return food_options[choice - 1]  # Return the selected food item name
             else:
-                print("Invalid choice. Please enter a number between 1 and 6.")
+                print(f"Invalid choice. Please enter a number between 1 and {len(food_options)}.")
         except ValueError:
             print("Invalid input. Please enter a number.")
 
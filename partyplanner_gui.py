@@ -2,28 +2,151 @@
 # !/usr/env/bin python3
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkinter.filedialog import asksaveasfilename
-import csv
+import database
 import guest_management
+import instrumentation
+import live_sync
+from guest_picker import GuestPicker
 import menu_choices
+from member_types import MEMBER_TYPES
+import replica
+import schema
+import summaries
+import write_behind
+
+# Milliseconds between refreshes of the queued additions count in the add window
+JOURNAL_STATUS_MS = 1000
+
+# Modify window options and the guest fields they change
+MODIFY_FIELDS = {
+    "First Name": "f_name",
+    "Last Name": "l_name",
+    "Guest Type": "member_type",
+    "Amount Paid": "amt_paid",
+    "Menu Item": "menu_item",
+}
 
 class PartyPlannerGUI:
     """
     A GUI application for managing guests and generating reports for a party planner system.
     """
 
-    def __init__(self, root):
+    def __init__(self, root, live=True):
         """
         Initialize the PartyPlannerGUI application.
 
         Args:
             root (tk.Tk): The root Tkinter window.
+            live (bool): Keep open guest lists current with changes made at other stations.
         """
         self.root = root
         self.root.title("Party Planner")
         self.current_window = None
+        self.pending_calls = []
+        # Guests the reports window reads instead of the database, after a snapshot is opened
+        self.report_store = None
+        # `kill -USR1 <pid>` prints database timings while the planner is running
+        instrumentation.install_dump_signal()
         self.create_main_menu()
 
+        self.change_feed = None
+        if live and not replica.ENABLED:
+            # With a local replica, its sync brings in other stations' changes instead
+            self.change_feed = live_sync.ChangeFeed()
+            self.change_feed.subscribe(guest_management.apply_changes)
+
+        # Connect and create or upgrade the guest table (and the change log live sync reads) once the
+        # main menu is on screen, so start-up never waits on the database
+        self.root.after_idle(self.start_background_work)
+
+    def start_background_work(self):
+        """
+        Start measuring the database hosts, open a pooled connection and run the schema migrations in the
+        background, and start flushing queued guest additions.
+        """
+        if write_behind.ENABLED:
+            guest_management.start_write_behind()
+        if replica.ENABLED:
+            guest_management.start_replica()
+        database.start_host_probes()
+        guest_management.call_async(self.root, database.prewarm)
+        guest_management.call_async(self.root, schema.migrate, callback=self.schema_ready)
+
+    def schema_ready(self, migrated):
+        """
+        Start live sync and summary checks once the schema migrations have run.
+
+        Args:
+            migrated (bool): Result of schema.migrate.
+        """
+        if not migrated and replica.ENABLED:
+            # Probably offline: keep working from the replica and try again shortly
+            self.show_replica_status()
+            self.root.after(replica.SYNC_MS, lambda: guest_management.call_async(self.root, schema.migrate, callback=self.schema_ready))
+            return
+        if not migrated:
+            messagebox.showwarning("Warning", "The guest table could not be created or upgraded.")
+        else:
+            self.root.after(summaries.RECONCILE_MS, self.reconcile_summary)
+        if self.change_feed is not None:
+            self.poll_changes()
+        if replica.ENABLED:
+            self.sync_replica()
+
+    def reconcile_summary(self):
+        """
+        Check the materialized guest summary for drift in the background, then schedule the next check.
+        """
+        def checked(result=None):
+            self.root.after(summaries.RECONCILE_MS, self.reconcile_summary)
+
+        guest_management.call_async(self.root, summaries.reconcile, callback=checked, error_callback=checked)
+
+    def poll_changes(self):
+        """
+        Ask for changes made at other stations in the background, then schedule the next poll.
+        """
+        def received(changes):
+            self.show_changes(changes)
+            self.root.after(live_sync.POLL_MS, self.poll_changes)
+
+        guest_management.call_async(self.root, self.change_feed.poll, callback=received,
+                                    error_callback=lambda error: self.root.after(live_sync.POLL_MS, self.poll_changes))
+
+    def sync_replica(self):
+        """
+        Sync the local replica with the server in the background, then schedule the next sync.
+        """
+        def synced(changes):
+            self.show_changes(changes)
+            self.show_replica_status()
+            self.root.after(replica.SYNC_MS, self.sync_replica)
+
+        guest_management.call_async(self.root, guest_management.sync_replica, callback=synced,
+                                    error_callback=lambda error: self.root.after(replica.SYNC_MS, self.sync_replica))
+
+    def show_changes(self, changes):
+        """
+        Update the open guest lists with changes made at other stations.
+
+        Args:
+            changes (list): List of (party_id, op, row) tuples, or None.
+        """
+        for picker in ("guest_picker", "modify_guest_picker"):
+            widget = getattr(self, picker, None)
+            if changes and widget is not None and widget.winfo_exists():
+                widget.apply_changes(changes)
+
+    def show_replica_status(self):
+        """
+        Show in the title bar when the planner is working offline and how many edits are waiting to be sent.
+        """
+        status = guest_management.replica_status()
+        if status.get("online", True):
+            self.root.title("Party Planner")
+        else:
+            self.root.title(f"Party Planner (offline, {status['pending']} edits waiting)")
+
     def create_main_menu(self):
         """
         Create the main menu interface with buttons for Add Guest, Delete Guest, Modify Guest, and Reports.
@@ -40,12 +163,51 @@ class PartyPlannerGUI:
 
     def close_current_window(self):
         """
-        Close the currently open window if it exists.
+        Close the currently open window if it exists, cancelling any database calls it is still waiting on.
         """
+        for call in self.pending_calls:
+            call.cancel()
+        self.pending_calls = []
+
         if self.current_window is not None and self.current_window.winfo_exists():
             self.current_window.destroy()
         self.current_window = None
 
+    def run_in_background(self, function, *args, callback=None, error_callback=None, **kwargs):
+        """
+        Run a guest_management call on a background thread, showing a busy indicator in the current window
+        until it finishes. The call is cancelled if the window is closed first.
+
+        Args:
+            function (callable): The guest_management function to call.
+            callback (callable): Called on the main thread with the function's return value.
+            error_callback (callable): Called on the main thread with the exception, after it is shown, if the function raises.
+        """
+        window = self.current_window
+        progress = ttk.Progressbar(window, mode="indeterminate", length=120)
+        progress.grid(row=99, column=0, columnspan=4, pady=5)
+        progress.start(10)
+
+        def finished(call):
+            if call in self.pending_calls:
+                self.pending_calls.remove(call)
+            if progress.winfo_exists():
+                progress.destroy()
+
+        def on_done(result):
+            finished(call)
+            if callback:
+                callback(result)
+
+        def on_error(error):
+            finished(call)
+            messagebox.showerror("Error", f"Database error: {error}")
+            if error_callback:
+                error_callback(error)
+
+        call = guest_management.call_async(window, function, *args, callback=on_done, error_callback=on_error, **kwargs)
+        self.pending_calls.append(call)
+
     def add_guest_window(self):
         """
         Open a new window to add a guest with fields for first name, last name, guest type, amount paid, and Menu Item.
@@ -63,7 +225,7 @@ class PartyPlannerGUI:
         self.last_name_entry.grid(row=1, column=1, padx=5, pady=5)
 
         ttk.Label(self.current_window, text="Guest Type:").grid(row=2, column=0, padx=5, pady=5)
-        self.guest_type_combobox = ttk.Combobox(self.current_window, values=["Guest", "Member", "Master of Ceremonies", "Keynote Speaker", "Kitchen Staff", "Waiter", "Usher"])
+        self.guest_type_combobox = ttk.Combobox(self.current_window, values=MEMBER_TYPES)
         self.guest_type_combobox.grid(row=2, column=1, padx=5, pady=5)
 
         ttk.Label(self.current_window, text="Amount Paid:").grid(row=3, column=0, padx=5, pady=5)
@@ -71,11 +233,36 @@ class PartyPlannerGUI:
         self.amount_paid_entry.grid(row=3, column=1, padx=5, pady=5)
 
         ttk.Label(self.current_window, text="Menu Item:").grid(row=4, column=0, padx=5, pady=5)
-        self.menu_choice_combobox = ttk.Combobox(self.current_window, values=["BEEF", "CHICKEN", "FISH", "PORK", "PASTA", "VEGAN"])
+        self.menu_choice_combobox = ttk.Combobox(self.current_window, values=menu_choices.FOOD_OPTIONS)
         self.menu_choice_combobox.grid(row=4, column=1, padx=5, pady=5)
 
         ttk.Button(self.current_window, text="Add Guest", command=self.add_guest).grid(row=5, column=0, columnspan=2, pady=10)
 
+        if write_behind.ENABLED:
+            self.journal_status = ttk.Label(self.current_window, text="")
+            self.journal_status.grid(row=6, column=0, columnspan=2, padx=5, pady=5)
+            self.refresh_journal_status()
+
+    def refresh_journal_status(self):
+        """
+        Keep the queued guest counts current while the add window is open.
+        """
+        if self.journal_status.winfo_exists():
+            self.show_journal_status()
+            self.journal_status.after(JOURNAL_STATUS_MS, self.refresh_journal_status)
+
+    def show_journal_status(self):
+        """
+        Show how many queued guests are still waiting to be saved.
+        """
+        status = guest_management.write_behind_status()
+        text = f"Waiting to save: {status.get('pending', 0)}    Saved: {status.get('flushed', 0)}"
+        if status.get("failed"):
+            text += f"    Failed: {status['failed']}"
+        if status.get("last_error") and status.get("pending"):
+            text += "    (database unreachable, retrying)"
+        self.journal_status.configure(text=text)
+
     def add_guest(self):
         """
         Validate input, prepare data, and pass to guest_management to add a new guest.
@@ -101,9 +288,24 @@ class PartyPlannerGUI:
 
         # Prepare data and pass to guest_management
         data_to_add = (first_name, last_name, guest_type, amt_paid, menu_choice)
-        success = guest_management.add_guest(data_to_add)
+        if write_behind.ENABLED:
+            # Saved to the local journal straight away; the database catches up in the background
+            if guest_management.queue_guest(data_to_add) is None:
+                messagebox.showerror("Error", "Failed to add guest.")
+                return
+            for entry in (self.first_name_entry, self.last_name_entry, self.amount_paid_entry):
+                entry.delete(0, tk.END)
+            self.show_journal_status()
+            return
+        self.run_in_background(guest_management.add_guest, data_to_add, callback=self.guest_added)
+
+    def guest_added(self, success):
+        """
+        Display success or error message once an add has finished.
 
-        # Display success or error message
+        Args:
+            success (bool): Result of guest_management.add_guest.
+        """
         if success:
             messagebox.showinfo("Success", "Guest added successfully.")
         else:
@@ -111,77 +313,278 @@ class PartyPlannerGUI:
 
     def delete_guest_window(self):
         """
-        Open a new window to select and delete a guest.
+        Open a new window to select and delete one or more guests.
         """
         self.close_current_window()
         self.current_window = tk.Toplevel(self.root)
         self.current_window.title("Delete Guest")
 
-        ttk.Label(self.current_window, text="Select Guest to Delete:").grid(row=0, column=0, padx=5, pady=5)
-
-        guests = guest_management.list_guests()
-        guest_list = [f"{guest[0]}: {guest[1]} {guest[2]}" for guest in guests]
+        ttk.Label(self.current_window, text="Select Guests to Delete:").grid(row=0, column=0, padx=5, pady=5)
 
-        self.guest_combobox = ttk.Combobox(self.current_window, values=guest_list)
-        self.guest_combobox.grid(row=0, column=1, padx=5, pady=5)
+        self.guest_picker = GuestPicker(self.current_window, self.run_in_background, selectmode="extended")
+        self.guest_picker.grid(row=0, column=1, padx=5, pady=5)
 
         ttk.Button(self.current_window, text="Delete Guest", command=self.delete_guest).grid(row=1, column=0, columnspan=2, pady=10)
 
     def delete_guest(self):
         """
-        Delete the selected guest from the database.
+        Delete the selected guests from the database in one transaction.
         Display success or error message based on the operation result.
         """
-        selected_guest = self.guest_combobox.get()
-        if not selected_guest:
+        guest_ids = self.guest_picker.selected_ids()
+        if not guest_ids:
             messagebox.showerror("Error", "Please select a guest to delete.")
             return
 
-        guest_id = int(selected_guest.split(":")[0])
+        if len(guest_ids) == 1:
+            self.run_in_background(guest_management.delete_guest, guest_ids[0],
+                                   callback=lambda success: self.guest_deleted(guest_ids, 1 if success else None))
+        elif messagebox.askyesno("Confirm", f"Delete {len(guest_ids)} guests?"):
+            self.run_in_background(guest_management.delete_guests, guest_ids,
+                                   callback=lambda deleted: self.guest_deleted(guest_ids, deleted))
 
-        success = guest_management.delete_guest(guest_id)
-        if success:
-            messagebox.showinfo("Success", "Guest deleted successfully.")
+    def guest_deleted(self, guest_ids, deleted):
+        """
+        Display success or error message once a delete has finished.
+
+        Args:
+            guest_ids (list): IDs of the guests that were deleted.
+            deleted (int): Number of guests deleted, or None if the delete failed.
+        """
+        if deleted is not None:
+            self.guest_picker.remove_guests(guest_ids)
+            if len(guest_ids) == 1:
+                messagebox.showinfo("Success", "Guest deleted successfully.")
+            else:
+                messagebox.showinfo("Success", f"{deleted} guests deleted successfully.")
         else:
             messagebox.showerror("Error", "Failed to delete guest.")
 
     def modify_guest_window(self):
         """
-        Open a new window to select a guest and the field to modify.
+        Open a new window to select one or more guests and the field to modify.
         """
         self.close_current_window()
         self.current_window = tk.Toplevel(self.root)
         self.current_window.title("Modify Guest")
 
-        ttk.Label(self.current_window, text="Select Guest to Modify:").grid(row=0, column=0, padx=5, pady=5)
-
-        guests = guest_management.list_guests()
-        guest_list = [f"{guest[0]}: {guest[1]} {guest[2]}" for guest in guests]
+        ttk.Label(self.current_window, text="Select Guests to Modify:").grid(row=0, column=0, padx=5, pady=5)
 
-        self.modify_guest_combobox = ttk.Combobox(self.current_window, values=guest_list)
-        self.modify_guest_combobox.grid(row=0, column=1, padx=5, pady=5)
+        self.modify_guest_picker = GuestPicker(self.current_window, self.run_in_background, selectmode="extended")
+        self.modify_guest_picker.grid(row=0, column=1, padx=5, pady=5)
 
         ttk.Button(self.current_window, text="Select", command=self.show_modify_options).grid(row=1, column=0, columnspan=2, pady=10)
 
     def show_modify_options(self):
         """
-        Open a new window to select the field to modify for the selected guest.
+        Open a new window to select the field to modify for the selected guests.
         """
-        selected_guest = self.modify_guest_combobox.get()
-        if not selected_guest:
+        self.modify_guest_ids = self.modify_guest_picker.selected_ids()
+        if not self.modify_guest_ids:
             messagebox.showerror("Error", "Please select a guest to modify.")
             return
 
-        guest_id = int(selected_guest.split(":")[0])
-
         self.close_current_window()
         self.current_window = tk.Toplevel(self.root)
         self.current_window.title("Modify Guest Options")
 
         ttk.Label(self.current_window, text="Select Item to Modify:").grid(row=0, column=0, padx=5, pady=5)
 
-        options = ["First Name", "Last Name", "Guest Type", "Amount Paid", "Menu Item"]
+        options = list(MODIFY_FIELDS)
         self.modify_option_combobox = ttk.Combobox(self.current_window, values=options)
         self.modify_option_combobox.grid(row=0, column=1, padx=5, pady=5)
 
         ttk.Button(self.current_window, text="Next", command=self.show_modify_input).grid(row=1, column=0, columnspan=2, pady=10)
+
+    def show_modify_input(self):
+        """
+        Open a new window to enter the new value for the selected field.
+        """
+        option = self.modify_option_combobox.get()
+        if option not in MODIFY_FIELDS:
+            messagebox.showerror("Error", "Please select an item to modify.")
+            return
+        self.modify_field = MODIFY_FIELDS[option]
+
+        self.close_current_window()
+        self.current_window = tk.Toplevel(self.root)
+        count = len(self.modify_guest_ids)
+        self.current_window.title("Modify Guest" if count == 1 else f"Modify {count} Guests")
+
+        ttk.Label(self.current_window, text=f"New {option}:").grid(row=0, column=0, padx=5, pady=5)
+
+        if self.modify_field == "member_type":
+            self.modify_value_entry = ttk.Combobox(self.current_window, values=MEMBER_TYPES)
+        elif self.modify_field == "menu_item":
+            self.modify_value_entry = ttk.Combobox(self.current_window, values=menu_choices.FOOD_OPTIONS)
+        else:
+            self.modify_value_entry = ttk.Entry(self.current_window)
+        self.modify_value_entry.grid(row=0, column=1, padx=5, pady=5)
+
+        ttk.Button(self.current_window, text="Save", command=self.modify_guest).grid(row=1, column=0, columnspan=2, pady=10)
+
+        if count == 1:
+            # Start from the guest's current value
+            self.run_in_background(guest_management.get_guest, self.modify_guest_ids[0], callback=self.show_current_value)
+
+    def show_current_value(self, guest):
+        """
+        Fill the modify entry with the guest's current value for the field being changed.
+
+        Args:
+            guest (guest_store.Guest): The guest, or None if it couldn't be loaded.
+        """
+        if guest is None or self.modify_value_entry.get():
+            return
+        value = getattr(guest, self.modify_field)
+        self.modify_value_entry.insert(0, f"{value:.2f}" if self.modify_field == "amt_paid" else value)
+
+    def modify_guest(self):
+        """
+        Validate the new value and apply it to every selected guest in one transaction.
+        Display success or error message based on the operation result.
+        """
+        value = self.modify_value_entry.get().strip()
+
+        if self.modify_field == "amt_paid":
+            try:
+                value = float(value) if value else 0.0
+            except ValueError:
+                messagebox.showerror("Error", "Amount Paid must be a valid number.")
+                return
+        elif not value:
+            messagebox.showerror("Error", "Please enter a new value.")
+            return
+
+        if len(self.modify_guest_ids) == 1:
+            self.run_in_background(guest_management.modify_guest, self.modify_guest_ids[0], self.modify_field, value,
+                                   callback=lambda success: self.guest_modified(1 if success else None))
+            return
+        self.run_in_background(guest_management.update_guests, self.modify_field, value, self.modify_guest_ids,
+                               callback=self.guest_modified)
+
+    def guest_modified(self, modified):
+        """
+        Display success or error message once a modification has finished.
+
+        Args:
+            modified (int): Number of guests changed, or None if the update failed.
+        """
+        if modified is None:
+            messagebox.showerror("Error", "Failed to modify guest.")
+        elif len(self.modify_guest_ids) == 1:
+            messagebox.showinfo("Success", "Guest modified successfully.")
+        else:
+            messagebox.showinfo("Success", f"{modified} guests modified successfully.")
+
+    def reports_window(self):
+        """
+        Open a new window to view the attendee, menu, menu by member type, and finance reports, export the attendee list,
+        or save and open guest list snapshots.
+        """
+        self.close_current_window()
+        self.current_window = tk.Toplevel(self.root)
+        self.current_window.title("Reports")
+        self.report_store = None
+
+        buttons = ttk.Frame(self.current_window)
+        buttons.grid(row=0, column=0, columnspan=2, pady=5)
+        ttk.Button(buttons, text="Attendee Report", command=self.show_attendee_report).grid(row=0, column=0, padx=5)
+        ttk.Button(buttons, text="Menu Report", command=lambda: self.show_report("menu")).grid(row=0, column=1, padx=5)
+        ttk.Button(buttons, text="Menu by Type", command=lambda: self.show_report("menu_by_type")).grid(row=0, column=2, padx=5)
+        ttk.Button(buttons, text="Finance", command=lambda: self.show_report("finance")).grid(row=0, column=3, padx=5)
+        ttk.Button(buttons, text="Export Attendees", command=self.export_attendee_report).grid(row=0, column=4, padx=5)
+        ttk.Button(buttons, text="Save Snapshot", command=self.save_snapshot).grid(row=1, column=0, padx=5, pady=(5, 0))
+        ttk.Button(buttons, text="Open Snapshot", command=self.open_snapshot).grid(row=1, column=1, padx=5, pady=(5, 0))
+
+        self.report_text = tk.Text(self.current_window, width=90, height=30, font=("Courier", 10))
+        self.report_text.grid(row=1, column=0, padx=5, pady=5)
+        scrollbar = ttk.Scrollbar(self.current_window, orient=tk.VERTICAL, command=self.report_text.yview)
+        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.report_text.configure(yscrollcommand=scrollbar.set)
+
+    def show_report(self, report_type):
+        """
+        Display a report in the reports window.
+
+        Args:
+            report_type (str): The report to generate, as accepted by reports.generate_report.
+        """
+        def show(text):
+            self.report_text.delete("1.0", tk.END)
+            self.report_text.insert(tk.END, text)
+
+        import reports
+        self.run_in_background(reports.generate_report, report_type, self.report_store, callback=show)
+
+    def show_attendee_report(self):
+        """
+        Stream the attendee report into the reports window, so the first rows appear before the whole list is read.
+        """
+        import reports
+        from report_sinks import WidgetSink
+        self.run_in_background(reports.stream_attendee_report, WidgetSink(self.report_text), self.report_store)
+
+    def export_attendee_report(self):
+        """
+        Ask for a file name and export the attendee report as CSV, HTML, or text depending on its extension.
+        """
+        import reports
+        from tkinter.filedialog import asksaveasfilename
+        path = asksaveasfilename(
+            parent=self.current_window,
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("HTML files", "*.html"), ("Text files", "*.txt")]
+        )
+        if not path:
+            return
+
+        def exported(totals):
+            messagebox.showinfo("Export Complete", f"Exported {totals['attendees']} attendees to {path}.")
+
+        self.run_in_background(reports.export_attendee_report, path, self.report_store, callback=exported)
+
+    def save_snapshot(self):
+        """
+        Ask for a file name and save the current guest list as a snapshot, in the binary snapshot format or as CSV
+        depending on its extension.
+        """
+        import snapshots
+        from tkinter.filedialog import asksaveasfilename
+        path = asksaveasfilename(
+            parent=self.current_window,
+            defaultextension=snapshots.SUFFIX,
+            filetypes=[("Guest snapshots", f"*{snapshots.SUFFIX}"), ("CSV files", "*.csv")]
+        )
+        if not path:
+            return
+
+        def saved(count):
+            messagebox.showinfo("Snapshot Saved", f"Saved {count} guests to {path}.")
+
+        self.run_in_background(snapshots.save, path, callback=saved)
+
+    def open_snapshot(self):
+        """
+        Ask for a snapshot file and show reports for the guests in it instead of the database, until the
+        reports window is closed.
+        """
+        import os
+        import snapshots
+        from tkinter.filedialog import askopenfilename
+        path = askopenfilename(
+            parent=self.current_window,
+            filetypes=[("Guest snapshots", f"*{snapshots.SUFFIX}"), ("CSV files", "*.csv")]
+        )
+        if not path:
+            return
+
+        def opened(store):
+            if store is None:
+                messagebox.showerror("Error", f"Could not read the snapshot {path}.")
+                return
+            self.report_store = store
+            self.current_window.title(f"Reports - {os.path.basename(path)}")
+            self.show_attendee_report()
+
+        self.run_in_background(snapshots.load, path, callback=opened)
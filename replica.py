@@ -0,0 +1,509 @@
+# replica.py
+#!/usr/env/bin python3
+
+"""
+An offline-first local copy of the guest table for each station.
+
+The replica holds every guest in memory, backed by a local SQLite file so it survives restarts, and
+answers the app's list, count and total reads without a round trip to the server. It is kept current
+with deltas read from the change log (see live_sync.py) rather than by re-reading the table, and reports
+how far it has read so entries every station has applied can be pruned.
+
+If the server can't be reached, edits are made to the replica and recorded in an outbox. When the
+server is back, sync() sends the outbox, oldest first, resolving conflicts field by field: a local
+change is applied if the server still has the value the edit started from; otherwise the server's value
+wins and the conflict is recorded. Guests added offline get a temporary negative party_id until the
+server assigns a real one.
+
+Variables:
+        REPLICA_PATH - The replica file (can be set with the PARTYPLANNER_REPLICA environment variable)
+        ENABLED      - Whether the GUI keeps a replica (set PARTYPLANNER_OFFLINE=off to always read the server)
+        SYNC_MS      - Milliseconds between syncs in the GUI
+        PULL_LIMIT   - The number of change log entries read per request while pulling
+"""
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+import database
+import live_sync
+
+REPLICA_PATH = os.environ.get("PARTYPLANNER_REPLICA", "partyplanner_replica.db")
+ENABLED = os.environ.get("PARTYPLANNER_OFFLINE", "on") != "off"
+SYNC_MS = 2000
+PULL_LIMIT = 1000
+
+_INSERT_ROW = "INSERT OR REPLACE INTO guests (party_id, f_name, l_name, member_type, amt_paid, menu_item) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def _normalize(row):
+    # The MySQL driver returns fees as Decimal; the replica keeps floats like the SQLite backend
+    return (row[0], row[1], row[2], row[3], float(row[4]), row[5])
+
+
+class LocalReplica:
+    """
+    A station's local copy of the guest table, with an outbox of edits made while offline.
+    """
+
+    def __init__(self, path=REPLICA_PATH):
+        """
+        Args:
+            path (str): Replica file, or ":memory:" for a replica that doesn't survive restarts.
+        """
+        self.path = path
+        self.rows = {}
+        self.last_change_id = None
+        # Assumed reachable until a sync or write finds otherwise, so edits go to the server from the start
+        self.online = True
+        self.conflicts = []
+        self._lock = threading.RLock()
+        self._sync_lock = threading.RLock()
+        self._sorted = {}
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS guests (party_id INTEGER PRIMARY KEY, f_name TEXT, l_name TEXT, "
+            "member_type TEXT, amt_paid REAL, menu_item TEXT);"
+            "CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT, entry TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);")
+
+        for row in self._connection.execute("SELECT party_id, f_name, l_name, member_type, amt_paid, menu_item FROM guests"):
+            self.rows[row[0]] = row
+        value = self._connection.execute("SELECT value FROM meta WHERE name = 'last_change_id'").fetchone()
+        if value is not None:
+            self.last_change_id = int(value[0])
+        # The replica file keeps its name in the change log positions across restarts
+        station = self._connection.execute("SELECT value FROM meta WHERE name = 'station'").fetchone()
+        if station is None:
+            station = (f"replica:{uuid.uuid4()}",)
+            self._connection.execute("INSERT INTO meta (name, value) VALUES ('station', ?)", station)
+            self._connection.commit()
+        self.position = live_sync.ChangePosition(station[0], self.last_change_id or 0)
+
+    @property
+    def ready(self):
+        """
+        True once the replica holds a full copy of the guest table.
+        """
+        return self.last_change_id is not None
+
+    # Keeping the copy current
+
+    def refresh(self):
+        """
+        Replace the replica with a full copy of the guest table. The copy is only swapped in once it has
+        been read completely, so a failed read leaves the replica as it was.
+
+        Returns:
+            bool: True if successful, False if the server could not be reached.
+        """
+        # The rows and change_id come from one transaction on the primary, the one pulls read the change log from
+        copy = database.copy_guests(self.position.window)
+        if copy is None:
+            self.online = False
+            return False
+
+        change_id, reflected, rows = copy
+        rows = {row[0]: _normalize(row) for row in rows}
+        with self._lock:
+            pending = {party_id: row for party_id, row in self.rows.items() if party_id < 0}
+            self.rows = {**rows, **pending}
+            self._sorted.clear()
+            self._connection.execute("DELETE FROM guests")
+            self._connection.executemany(_INSERT_ROW, self.rows.values())
+            self._set_change_id(change_id)
+            self._connection.commit()
+        self.position.reset(change_id, reflected)
+        self.online = True
+        return True
+
+    def pull(self):
+        """
+        Apply the changes made on the server since the last pull. If changes the replica hadn't read were
+        pruned from the change log while it was away, it takes a full copy instead.
+
+        Returns:
+            list: List of (party_id, op, row) tuples applied (empty after a full copy), or None if the
+                  server could not be reached.
+        """
+        applied = []
+        with self._sync_lock:
+            while True:
+                page = self.position.read(PULL_LIMIT)
+                if page is None:
+                    self.online = False
+                    return None
+                entries, more = page
+                with self._lock:
+                    for change_id, party_id, op, row in entries:
+                        self._store(party_id, _normalize(row) if row is not None else None)
+                        applied.append((party_id, op if row is not None else "delete", row))
+                    self._set_change_id(self.position.last_id)
+                    self._connection.commit()
+                if not more:
+                    break
+            self.position.acknowledge()
+            if self.position.behind:
+                return [] if self.refresh() else None
+        self.online = True
+        return applied
+
+    def push(self):
+        """
+        Send the outbox to the server, oldest edit first, resolving conflicts with what the server has now.
+
+        Returns:
+            int: Number of outbox entries sent, or None if the server could not be reached (the rest stay queued).
+        """
+        sent = 0
+        for seq, entry in self._outbox():
+            if not self._push_entry(entry):
+                self.online = False
+                return None
+            with self._lock:
+                self._connection.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+                self._connection.commit()
+            sent += 1
+        return sent
+
+    def sync(self):
+        """
+        Push local edits, then pull the server's changes. Starts with a full copy if the replica is empty.
+
+        Returns:
+            list: List of (party_id, op, row) tuples pulled from the server (empty after a full copy),
+                  or None if the server could not be reached.
+        """
+        with self._sync_lock:
+            if not self.ready:
+                return [] if self.refresh() and self.push() is not None else None
+            if self.push() is None:
+                return None
+            return self.pull()
+
+    def _failed(self, entry, action):
+        """
+        Decide what a failed server call for an outbox entry means. The database functions return None both
+        when the server is down and when it rejects the statement; a rejected entry is recorded as a conflict
+        and dropped, so it can't block the edits queued after it.
+
+        Returns:
+            bool: False if the server could not be reached (the entry stays queued), True if it was rejected.
+        """
+        if database.latest_change_id() is None:
+            return False
+        self._conflict(entry, f"server rejected the {action}")
+        return True
+
+    def _push_entry(self, entry):
+        """
+        Apply one outbox entry to the server.
+
+        Returns:
+            bool: False if the server could not be reached, True otherwise (including after a conflict).
+        """
+        op = entry["op"]
+
+        if op == "insert":
+            result = database.add_guests_once([(entry["key"], tuple(entry["row"]))])
+            if result is None and not self._failed(entry, "new guest"):
+                return False
+            if result is not None and result[1]:
+                self._conflict(entry, f"server rejected the guest: {result[1][0][1]}")
+            # The server's copy, with its real party_id, arrives with the next pull
+            with self._lock:
+                self._store(entry["party_id"], None)
+                self._connection.commit()
+            return True
+
+        result = database.run_query(f"SELECT {database.SELECT_COLUMNS} FROM {database.TABLE_NAME} WHERE party_id = %s",
+                                    (entry["party_id"],))
+        if result is None:
+            return self._failed(entry, "read of the guest")
+        current = _normalize(result[1][0]) if result[1] else None
+        base = tuple(entry["base"])
+
+        if op == "delete":
+            if current is None:
+                return True
+            if current != base:
+                self._conflict(entry, "guest was changed on the server, kept the server's copy")
+                return True
+            return database.delete_guests([entry["party_id"]]) is not None or self._failed(entry, "delete")
+
+        # Field-level merge: only the field edited offline is written, and only if nobody else changed it
+        column = database.GUEST_COLUMNS.index(entry["field"])
+        if current is None:
+            self._conflict(entry, "guest was deleted on the server")
+            return True
+        if current[column] not in (base[column], entry["value"]):
+            self._conflict(entry, f"{entry['field']} was changed on the server to {current[column]!r}, kept the server's value")
+            return True
+        return (database.update_guests(entry["field"], entry["value"], [entry["party_id"]]) is not None
+                or self._failed(entry, f"change to {entry['field']}"))
+
+    def _conflict(self, entry, reason):
+        print(f"Sync conflict for guest {entry.get('party_id')}: {reason}")
+        self.conflicts.append((entry, reason))
+
+    # Local edits
+
+    def add(self, row):
+        """
+        Add a guest locally and queue it for the server.
+
+        Args:
+            row (tuple): Tuple containing guest information (f_name, l_name, member_type, amt_paid, menu_item).
+
+        Returns:
+            int: The guest's temporary (negative) party_id.
+        """
+        with self._lock:
+            party_id = min(min(self.rows, default=0), 0) - 1
+            self._store(party_id, (party_id, row[0], row[1], row[2], float(row[3] or 0), row[4]))
+            self._queue({"op": "insert", "party_id": party_id, "key": str(uuid.uuid4()), "row": list(row)})
+            self._connection.commit()
+        return party_id
+
+    def update(self, party_ids, field, value, queue=True):
+        """
+        Change one field for several guests locally.
+
+        Args:
+            party_ids (iterable): IDs of the guests to change.
+            field (str): The column to change, one of database.UPDATABLE_COLUMNS.
+            value: The new value.
+            queue (bool): Also queue the edit for the server. False when the server already has it.
+
+        Returns:
+            int: Number of guests changed.
+        """
+        column = database.GUEST_COLUMNS.index(field)
+        if field == "amt_paid":
+            value = float(value)
+        updated = 0
+        with self._lock:
+            for party_id in party_ids:
+                row = self.rows.get(party_id)
+                if row is None:
+                    continue
+                if queue and party_id < 0:
+                    # Not on the server yet: change the queued insert instead
+                    self._amend_insert(party_id, column - 1, value)
+                elif queue:
+                    self._queue({"op": "update", "party_id": party_id, "field": field, "value": value, "base": list(row)})
+                self._store(party_id, row[:column] + (value,) + row[column + 1:])
+                updated += 1
+            self._connection.commit()
+        return updated
+
+    def delete(self, party_ids, queue=True):
+        """
+        Remove guests locally.
+
+        Args:
+            party_ids (iterable): IDs of the guests to remove.
+            queue (bool): Also queue the deletion for the server. False when the server already has it.
+
+        Returns:
+            int: Number of guests removed.
+        """
+        deleted = 0
+        with self._lock:
+            for party_id in party_ids:
+                row = self.rows.get(party_id)
+                if row is None:
+                    continue
+                if queue and party_id < 0:
+                    self._drop_insert(party_id)
+                elif queue:
+                    self._queue({"op": "delete", "party_id": party_id, "base": list(row)})
+                self._store(party_id, None)
+                deleted += 1
+            self._connection.commit()
+        return deleted
+
+    def pending(self):
+        """
+        Returns:
+            int: Number of edits waiting to be sent to the server.
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    # Reads
+
+    def get(self, party_id):
+        """
+        Returns:
+            tuple: The guest row (party_id, f_name, l_name, member_type, amt_paid, menu_item), or None.
+        """
+        return self.rows.get(party_id)
+
+    def query(self, after=None, limit=None, member_type=None, menu_item=None, name_prefix=None, order_by="party_id", descending=False):
+        """
+        One page of guests, with the same arguments and ordering as database.query_guests.
+
+        Returns:
+            list: List of guest rows.
+        """
+        keys, rows = self._order(order_by, descending)
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(keys, self._sort_key(after, order_by, descending))
+        limit = limit or database.PAGE_SIZE
+
+        page = []
+        for row in rows[start:]:
+            if self._matches(row, member_type, menu_item, name_prefix):
+                page.append(row)
+                if len(page) == limit:
+                    break
+        return page
+
+    def matching(self, member_type=None, menu_item=None, name_prefix=None, order_by="party_id", descending=False):
+        """
+        Returns:
+            list: Every guest row matching the filters, sorted as for query().
+        """
+        _, rows = self._order(order_by, descending)
+        return [row for row in rows if self._matches(row, member_type, menu_item, name_prefix)]
+
+    def count(self, member_type=None, menu_item=None, name_prefix=None):
+        """
+        Returns:
+            int: Number of guests matching the filters.
+        """
+        with self._lock:
+            rows = list(self.rows.values())
+        return sum(1 for row in rows if self._matches(row, member_type, menu_item, name_prefix))
+
+    def aggregate(self, group_by=(), member_type=None, menu_item=None, name_prefix=None):
+        """
+        Guest counts and fee totals per group, in the same form as database.aggregate_guests.
+
+        Returns:
+            list: List of tuples (*group values, guest count, total amt_paid), ordered by the group columns.
+        """
+        columns = [database.GUEST_COLUMNS.index(column) for column in group_by]
+        with self._lock:
+            rows = list(self.rows.values())
+        totals = {}
+        for row in rows:
+            if self._matches(row, member_type, menu_item, name_prefix):
+                group = tuple(row[column] for column in columns)
+                count, fees = totals.get(group, (0, 0.0))
+                totals[group] = (count + 1, fees + row[4])
+        if not group_by:
+            return [totals.get((), (0, 0.0))]
+        return [group + totals[group] for group in sorted(totals)]
+
+    @staticmethod
+    def _matches(row, member_type, menu_item, name_prefix):
+        if member_type is not None and row[3] != member_type:
+            return False
+        if menu_item is not None and row[5] != menu_item:
+            return False
+        if name_prefix:
+            prefix = name_prefix.lower()
+            return row[1].lower().startswith(prefix) or row[2].lower().startswith(prefix)
+        return True
+
+    @staticmethod
+    def _sort_key(row, order_by, descending):
+        column = database.GUEST_COLUMNS.index(order_by)
+        key = (row[column], row[0])
+        if descending:
+            # Negate numbers; strings are compared through the reversed list instead
+            return tuple(-value if isinstance(value, (int, float)) else _Reversed(value) for value in key)
+        return key
+
+    def _order(self, order_by, descending):
+        """
+        The guests sorted for a query, kept until the next change.
+
+        Returns:
+            tuple: (sort keys, rows) in the same order.
+        """
+        if order_by not in database.GUEST_COLUMNS:
+            raise ValueError(f"Cannot sort guests by {order_by!r}")
+        with self._lock:
+            ordered = self._sorted.get((order_by, descending))
+            if ordered is None:
+                rows = sorted(self.rows.values(), key=lambda row: self._sort_key(row, order_by, descending))
+                ordered = ([self._sort_key(row, order_by, descending) for row in rows], rows)
+                self._sorted[(order_by, descending)] = ordered
+            return ordered
+
+    # Storage
+
+    def _store(self, party_id, row):
+        """
+        Put a row in the replica (None removes it). The caller commits.
+        """
+        if row is None:
+            self.rows.pop(party_id, None)
+            self._connection.execute("DELETE FROM guests WHERE party_id = ?", (party_id,))
+        else:
+            self.rows[party_id] = row
+            self._connection.execute(_INSERT_ROW, row)
+        self._sorted.clear()
+
+    def _set_change_id(self, change_id):
+        self.last_change_id = change_id
+        self._connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('last_change_id', ?)", (str(change_id),))
+
+    def _queue(self, entry):
+        self._connection.execute("INSERT INTO outbox (entry) VALUES (?)", (json.dumps(entry),))
+
+    def _outbox(self):
+        with self._lock:
+            rows = self._connection.execute("SELECT seq, entry FROM outbox ORDER BY seq").fetchall()
+        return [(seq, json.loads(entry)) for seq, entry in rows]
+
+    def _amend_insert(self, party_id, field_index, value):
+        for seq, entry in self._outbox():
+            if entry["op"] == "insert" and entry["party_id"] == party_id:
+                entry["row"][field_index] = value
+                self._connection.execute("UPDATE outbox SET entry = ? WHERE seq = ?", (json.dumps(entry), seq))
+
+    def _drop_insert(self, party_id):
+        for seq, entry in self._outbox():
+            if entry["op"] == "insert" and entry["party_id"] == party_id:
+                self._connection.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+
+
+class _Reversed:
+    """
+    Wraps a string so it sorts in reverse, for descending keyset pages over text columns.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __gt__(self, other):
+        return self.value < other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __le__(self, other):
+        return self.value >= other.value
+
+    def __ge__(self, other):
+        return self.value <= other.value
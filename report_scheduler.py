@@ -0,0 +1,271 @@
+# report_scheduler.py
+#!/usr/env/bin python3
+
+"""
+Generates many reports at once on a pool of worker processes, e.g. the end-of-night reports for
+several events.
+
+Each report is a job naming its type, output file and the event's database. Attendee reports for large
+events are split into party_id ranges; every range is rendered to a part file by its own process while
+keeping partial totals, and as soon as a report's last part is done the parts are joined under one
+header, the partial totals are added up for the summary, and the file is complete. Report time then
+grows with the number of cores rather than the number of guests.
+
+    python report_scheduler.py attendee:event1.csv:event1.db menu:event1_menu.txt:event1.db attendee:event2.html:event2.db
+
+Workers open their own database connections, so an in-memory SQLite database can't be reported on here.
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import database
+import guest_management
+from report_sinks import sink_for_path
+
+# Number of worker processes
+WORKERS = os.cpu_count() or 2
+# Attendee reports with more guests than this are split into ranges of about this many guests
+PARTITION_ROWS = 50000
+
+
+class ReportJob:
+    """
+    One report to generate: its type, where to write it and which event's database to read.
+    """
+
+    def __init__(self, report_type, path, backend=None, sqlite_path=None, database_name=None):
+        """
+        Args:
+            report_type (str): Any type accepted by reports.generate_report.
+            path (str): Output file. Attendee reports are written as CSV, HTML or text depending on the
+                        extension; other reports are written as text.
+            backend (str): "mysql" or "sqlite". Defaults to the backend this process uses.
+            sqlite_path (str): The event's SQLite file. Defaults to database.SQLITE_PATH.
+            database_name (str): The event's MySQL schema. Defaults to database.DATABASE.
+        """
+        self.report_type = report_type
+        self.path = path
+        self.backend = backend or database.BACKEND
+        self.sqlite_path = sqlite_path or database.SQLITE_PATH
+        self.database_name = database_name or database.DATABASE
+
+    def __repr__(self):
+        return f"ReportJob({self.report_type!r}, {self.path!r})"
+
+
+def _configure(job):
+    """
+    Point this worker's database module at the job's event, dropping anything cached from the last one.
+    """
+    if (database.backend_name(), database.SQLITE_PATH, database.DATABASE) != (job.backend, job.sqlite_path, job.database_name):
+        database.DATABASE = job.database_name
+        guest_management.use_backend(job.backend, job.sqlite_path)
+
+
+def _plan(job):
+    """
+    Returns:
+        tuple: (lowest party_id, highest party_id, number of guests) for the job's event, or None if the query failed.
+    """
+    _configure(job)
+    result = database.run_query(f"SELECT MIN(party_id), MAX(party_id), COUNT(*) FROM {database.TABLE_NAME}")
+    return tuple(result[1][0]) if result else None
+
+
+def _write_part(job, id_range, part_path):
+    """
+    Render one party_id range of an attendee report to a part file.
+
+    Returns:
+        dict: The range's partial totals.
+    """
+    import reports
+    _configure(job)
+    with open(part_path, "w", newline="", encoding="utf-8") as file:
+        sink = sink_for_path(job.path, file)
+        sink.start_part(reports.ATTENDEE_COLUMNS, reports.ATTENDEE_WIDTHS)
+        return reports.stream_attendee_rows(sink, id_range)
+
+
+def _write_report(job):
+    """
+    Generate a whole (non-partitioned) report and write it out.
+
+    Returns:
+        dict: Totals for attendee reports, otherwise None.
+    """
+    import reports
+    _configure(job)
+    if job.report_type == "attendee":
+        return reports.export_attendee_report(job.path)
+    text = reports.generate_report(job.report_type)
+    with open(job.path, "w", encoding="utf-8") as file:
+        file.write(text + "\n")
+    return None
+
+
+def id_ranges(low, high, count, partition_rows=PARTITION_ROWS):
+    """
+    Split a party_id span into ranges holding roughly partition_rows guests each.
+
+    Args:
+        low (int): Lowest party_id.
+        high (int): Highest party_id.
+        count (int): Number of guests in the span.
+        partition_rows (int): Target guests per range.
+
+    Returns:
+        list: List of (lowest, highest) party_id tuples covering the span, in order.
+    """
+    parts = max(1, math.ceil(count / partition_rows))
+    step = max(1, math.ceil((high - low + 1) / parts))
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+
+def merge_totals(parts):
+    """
+    Add up partial attendee totals.
+
+    Args:
+        parts (iterable): Totals dicts as returned by reports.stream_attendee_rows.
+
+    Returns:
+        dict: The combined totals.
+    """
+    merged = {"members": 0, "guests": 0, "staff": 0, "fees": 0.0, "attendees": 0}
+    for totals in parts:
+        for key in merged:
+            merged[key] += totals[key]
+    return merged
+
+
+def _assemble(job, part_paths, totals):
+    """
+    Join an attendee report's part files under one header and finish it with the merged totals.
+    """
+    import reports
+    with open(job.path, "w", newline="", encoding="utf-8") as file:
+        sink = sink_for_path(job.path, file)
+        sink.start("Attendee List", reports.ATTENDEE_COLUMNS, reports.ATTENDEE_WIDTHS)
+        for part_path in part_paths:
+            with open(part_path, encoding="utf-8", newline="") as part:
+                shutil.copyfileobj(part, file)
+            os.remove(part_path)
+        sink.finish(reports.attendee_summary(totals))
+
+
+def run_reports(jobs, workers=None, partition_rows=PARTITION_ROWS, on_finished=None):
+    """
+    Generate every report on a pool of worker processes, writing each one out as soon as it is complete.
+
+    Args:
+        jobs (list): ReportJob objects.
+        workers (int): Number of processes. Defaults to WORKERS.
+        partition_rows (int): Attendee reports with more guests than this are split into ranges.
+        on_finished (callable): Called in this process as on_finished(job, result) when a report is written;
+                                result is the totals for attendee reports, None otherwise.
+
+    Returns:
+        dict: For each job's path, its result, or the exception if the job failed.
+    """
+    results = {}
+    # Per attendee job being assembled: [part paths, partial totals, parts still running, first error]
+    assembling = {}
+
+    def finished(job, result):
+        results[job.path] = result
+        if isinstance(result, Exception):
+            print(f"Report {job.path} failed: {result}")
+        elif on_finished is not None:
+            on_finished(job, result)
+
+    # Spawned workers start with fresh connections instead of copies of this process's
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers or WORKERS, mp_context=context) as pool:
+        running = {}
+        for job in jobs:
+            if job.report_type == "attendee":
+                running[pool.submit(_plan, job)] = ("plan", job, None)
+            else:
+                running[pool.submit(_write_report, job)] = ("report", job, None)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, job, index = running.pop(future)
+                error = future.exception()
+
+                if kind == "report":
+                    finished(job, error or future.result())
+
+                elif kind == "plan":
+                    plan = None if error else future.result()
+                    if error or plan is None:
+                        finished(job, error or RuntimeError("could not read the guest table"))
+                    elif not plan[2] or plan[2] <= partition_rows:
+                        running[pool.submit(_write_report, job)] = ("report", job, None)
+                    else:
+                        ranges = id_ranges(plan[0], plan[1], plan[2], partition_rows)
+                        part_paths = [f"{job.path}.part{number}" for number in range(len(ranges))]
+                        assembling[job.path] = [part_paths, [None] * len(ranges), len(ranges), None]
+                        for number, id_range in enumerate(ranges):
+                            running[pool.submit(_write_part, job, id_range, part_paths[number])] = ("part", job, number)
+
+                else:
+                    state = assembling[job.path]
+                    state[2] -= 1
+                    if error:
+                        state[3] = error
+                    else:
+                        state[1][index] = future.result()
+                    if state[2] == 0:
+                        del assembling[job.path]
+                        if state[3] is not None:
+                            for part_path in state[0]:
+                                if os.path.exists(part_path):
+                                    os.remove(part_path)
+                            finished(job, state[3])
+                        else:
+                            totals = merge_totals(state[1])
+                            _assemble(job, state[0], totals)
+                            finished(job, totals)
+
+    return results
+
+
+def parse_job(spec, backend=None):
+    """
+    Parse a command line job of the form report_type:output[:source], where source is the event's
+    SQLite file (with the sqlite backend) or MySQL schema name.
+
+    Returns:
+        ReportJob: The job.
+    """
+    report_type, path, *source = spec.split(":", 2)
+    backend = backend or database.BACKEND
+    source = source[0] if source else None
+    if backend == "sqlite":
+        return ReportJob(report_type, path, backend, sqlite_path=source)
+    return ReportJob(report_type, path, backend, database_name=source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate party planner reports in parallel.")
+    parser.add_argument("jobs", nargs="+", help="report_type:output[:sqlite file or MySQL schema]")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], help="database backend, defaults to PARTYPLANNER_BACKEND")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="number of worker processes")
+    parser.add_argument("--partition-rows", type=int, default=PARTITION_ROWS, help="guests per attendee report partition")
+    args = parser.parse_args()
+
+    jobs = [parse_job(spec, args.backend) for spec in args.jobs]
+    results = run_reports(jobs, args.workers, args.partition_rows,
+                          on_finished=lambda job, result: print(f"Wrote {job.path}"))
+    raise SystemExit(1 if any(isinstance(result, Exception) for result in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# report_sinks.py
+#!/usr/env/bin python3
+
+"""
+Output targets for streamed reports. A report calls start() once with its title and column headings,
+row() once per line of data, and finish() once with its summary lines, so a sink only ever holds one
+row at a time and output appears as soon as the first row is read.
+"""
+import csv
+import html
+import queue
+
+
+class ReportSink:
+    """
+    Base class for report sinks. Subclasses override the methods they need.
+    """
+
+    def start(self, title, columns, widths):
+        """
+        Begin a report.
+
+        Args:
+            title (str): The report title.
+            columns (list): Column headings.
+            widths (list): Column widths used by fixed-width text output.
+        """
+
+    def start_part(self, columns, widths):
+        """
+        Begin writing rows only, for one part of a report whose header and summary are written by
+        another sink (e.g. when partitions of a report are written in parallel and joined).
+
+        Args:
+            columns (list): Column headings.
+            widths (list): Column widths, for fixed-width layouts.
+        """
+
+    def row(self, values):
+        """
+        Write one data row.
+
+        Args:
+            values (tuple): One value per column, already formatted as strings.
+        """
+
+    def finish(self, summary):
+        """
+        End a report.
+
+        Args:
+            summary (list): Summary lines, as (label, value) tuples.
+        """
+
+    def fail(self, error):
+        """
+        End a report that could not be completed, instead of finish().
+
+        Args:
+            error (Exception): What went wrong.
+        """
+
+
+class TextSink(ReportSink):
+    """
+    Writes the fixed-width text layout used by the on-screen reports to a file-like object.
+    """
+
+    def __init__(self, file):
+        """
+        Args:
+            file: A writable text file-like object.
+        """
+        self.file = file
+        self.widths = []
+
+    def _rule(self):
+        return "-" * (sum(self.widths) + 3 * len(self.widths))
+
+    def start(self, title, columns, widths):
+        self.widths = widths
+        self.file.write(f"** {title} **\n")
+        self.file.write(self._rule() + "\n")
+        self.row(columns)
+        self.file.write(self._rule() + "\n")
+
+    def start_part(self, columns, widths):
+        self.widths = widths
+
+    def row(self, values):
+        cells = " | ".join(str(value).ljust(width) for value, width in zip(values, self.widths))
+        self.file.write(f"| {cells} |\n")
+
+    def finish(self, summary):
+        self.file.write(self._rule())
+        for label, value in summary:
+            self.file.write(f"\n{label}: {value}")
+
+
+class CsvSink(ReportSink):
+    """
+    Writes a report as CSV: a heading row, the data rows, a blank row, then the summary as label/value rows.
+    """
+
+    def __init__(self, file):
+        """
+        Args:
+            file: A writable text file-like object opened with newline="".
+        """
+        self.writer = csv.writer(file)
+
+    def start(self, title, columns, widths):
+        self.writer.writerow(columns)
+
+    def row(self, values):
+        self.writer.writerow(values)
+
+    def finish(self, summary):
+        self.writer.writerow([])
+        for label, value in summary:
+            self.writer.writerow([label, value])
+
+
+class HtmlSink(ReportSink):
+    """
+    Writes a report as a standalone HTML page with one table row per data row.
+    """
+
+    def __init__(self, file):
+        """
+        Args:
+            file: A writable text file-like object.
+        """
+        self.file = file
+
+    def start(self, title, columns, widths):
+        title = html.escape(title)
+        self.file.write(f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>{title}</title></head>\n<body>\n")
+        self.file.write(f"<h1>{title}</h1>\n<table>\n<thead><tr>")
+        self.file.write("".join(f"<th>{html.escape(str(column))}</th>" for column in columns))
+        self.file.write("</tr></thead>\n<tbody>\n")
+
+    def row(self, values):
+        self.file.write("<tr>" + "".join(f"<td>{html.escape(str(value))}</td>" for value in values) + "</tr>\n")
+
+    def finish(self, summary):
+        self.file.write("</tbody>\n</table>\n<dl>\n")
+        for label, value in summary:
+            self.file.write(f"<dt>{html.escape(label)}</dt><dd>{html.escape(str(value))}</dd>\n")
+        self.file.write("</dl>\n</body>\n</html>\n")
+
+
+class WidgetSink(TextSink):
+    """
+    Writes the text layout into a Tkinter Text widget. The report may be produced on a background thread:
+    text is queued and the main thread moves it into the widget every few milliseconds, so the report
+    fills in while it is still being read.
+    """
+
+    def __init__(self, widget, poll_ms=50):
+        """
+        Must be created on the Tk main thread.
+
+        Args:
+            widget (tk.Text): The widget to write into. Its current contents are replaced.
+            poll_ms (int): Milliseconds between moves of queued text into the widget.
+        """
+        super().__init__(self)
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self.pending = queue.SimpleQueue()
+        self.finished = False
+        self.widget.delete("1.0", "end")
+        self.widget.after(self.poll_ms, self._drain)
+
+    def write(self, text):
+        """
+        File-like write used by TextSink, queueing text for the widget. Safe to call from any thread.
+
+        Args:
+            text (str): Text to append.
+        """
+        self.pending.put(text)
+
+    def finish(self, summary):
+        super().finish(summary)
+        self.finished = True
+
+    def fail(self, error):
+        self.write(f"\nReport failed: {error}\n")
+        self.finished = True
+
+    def _drain(self):
+        chunks = []
+        while not self.pending.empty():
+            chunks.append(self.pending.get())
+
+        try:
+            if chunks:
+                self.widget.insert("end", "".join(chunks))
+            if not (self.finished and self.pending.empty()):
+                self.widget.after(self.poll_ms, self._drain)
+        except Exception:
+            # The widget was destroyed while the report was still streaming
+            pass
+
+
+def sink_for_path(path, file):
+    """
+    Pick a sink from a file name's extension (.csv, .html/.htm, anything else is plain text).
+
+    Args:
+        path (str): The output file name.
+        file: The opened, writable file-like object.
+
+    Returns:
+        ReportSink: A sink writing to file.
+    """
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return CsvSink(file)
+    if lowered.endswith((".html", ".htm")):
+        return HtmlSink(file)
+    return TextSink(file)
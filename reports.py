@@ -1,76 +1,185 @@
 # reports.py
 #!/usr/env/bin python3
 
-import database
+import io
+import guest_management
 import locale as lc
-
-lc.setlocale(lc.LC_ALL, "en_US")
-
-def generate_report(report_type):
+from guest_store import Guest
+from member_types import STAFF_TYPES
+from menu_choices import FOOD_OPTIONS
+from report_sinks import TextSink, sink_for_path
+
+LOCALE = "en_US"
+
+_locale_set = False
+
+def setup_locale():
+    """
+    Switch to the report locale the first time a report is made, instead of when the module is imported.
+    If the locale isn't installed the system default is kept.
+    """
+    global _locale_set
+    if _locale_set:
+        return
+    _locale_set = True
+    try:
+        lc.setlocale(lc.LC_ALL, LOCALE)
+    except lc.Error:
+        print(f"Locale {LOCALE} is not available, using the system default.")
+
+MENU_ITEMS = list(FOOD_OPTIONS)
+
+def generate_report(report_type, store=None):
+    """
+    Generate a report as text.
+
+    Args:
+        report_type (str): "attendee", "menu", "menu_by_type" or "finance".
+        store (GuestColumns): Guests to report on, e.g. an archived event opened with snapshots.load.
+                              Defaults to the guests in the database.
+
+    Returns:
+        str: The report.
+    """
+    setup_locale()
     if report_type == "attendee":
-        return generate_attendee_report()
+        return generate_attendee_report(store)
     elif report_type == "menu":
-        return generate_menu_report()
+        return generate_menu_report(store)
+    elif report_type == "menu_by_type":
+        return generate_menu_by_type_report(store)
+    elif report_type == "finance":
+        # NumPy takes a while to import, so it is only loaded for the finance report
+        import analytics
+        return analytics.generate_finance_report(store)
     else:
         return "Invalid report type specified."
 
-def generate_attendee_report():
-    guests = database.list_guests()
-    if not guests:
-        return "No guests found."
+def _aggregate(group_by, store=None):
+    if store is not None:
+        return store.aggregate(group_by)
+    return guest_management.aggregate_guests(group_by)
+
+ATTENDEE_COLUMNS = ["Name", "Type", "Menu Choice", "Fee Paid"]
+ATTENDEE_WIDTHS = [24, 21, 11, 8]
+
+def stream_attendee_rows(sink, id_range=None, store=None):
+    """
+    Write attendee rows to a sink from the local replica or straight from a server-side cursor, keeping
+    running totals as rows go by.
+
+    Args:
+        sink (report_sinks.ReportSink): Where the rows are written.
+        id_range (tuple): (lowest, highest) party_id to include, or None for every guest.
+        store (GuestColumns): Guests to read instead of the database; id_range is then ignored.
 
-    total_members = total_guests = total_staff = total_fees = 0
-    staff_types = ["Master of Ceremonies", "Keynote Speaker", "Usher", "Kitchen Staff"]
+    Returns:
+        dict: Totals for "members", "guests", "staff", "fees" and "attendees".
+    """
+    totals = {"members": 0, "guests": 0, "staff": 0, "fees": 0.0, "attendees": 0}
 
-    report = []
-    report.append("** Attendee List **")
-    report.append("-" * 76)
-    report.append("| Name                     | Type                  | Menu Choice | Fee Paid |")
-    report.append("-" * 76)
-    
-    for guest in guests:
-        name = f"{guest[1]} {guest[2]}"
-        type_ = guest[3]
-        menu_item = guest[5]
-        fee_paid = f"${guest[4]:.2f}"
+    rows = store.rows() if store is not None else guest_management.iter_guests(id_range=id_range)
+    for row in rows:
+        guest = Guest.from_row(row)
+        type_ = guest.member_type
 
-        report.append(f"| {name.ljust(24)} | {type_.ljust(21)} | {menu_item.ljust(11)} | {fee_paid.ljust(8)} |")
+        sink.row((guest.name, type_, guest.menu_item, f"${guest.amt_paid:.2f}"))
 
         if type_ == "Guest":
-            total_guests += 1
+            totals["guests"] += 1
         elif type_ == "Member":
-            total_members += 1
-        elif type_ in staff_types:
-            total_staff += 1
-        
-        total_fees += guest[4]
-
-    report.append("-" * 76)
-    report.append(f"Total Members: {total_members}")
-    report.append(f"Total Guests: {total_guests}")
-    report.append(f"Total Staff: {total_staff}")
-    report.append(f"Total Fees Paid: ${total_fees:.2f}")
+            totals["members"] += 1
+        elif type_ in STAFF_TYPES:
+            totals["staff"] += 1
+
+        totals["fees"] += guest.amt_paid
+        totals["attendees"] += 1
+
+    return totals
+
+def attendee_summary(totals):
+    """
+    Returns:
+        list: The attendee report's closing (label, value) lines for a totals dict.
+    """
+    return [
+        ("Total Members", totals["members"]),
+        ("Total Guests", totals["guests"]),
+        ("Total Staff", totals["staff"]),
+        ("Total Fees Paid", f"${totals['fees']:.2f}"),
+    ]
+
+def stream_attendee_report(sink, store=None):
+    """
+    Stream the attendee list to a report sink straight from a server-side cursor, keeping running totals
+    as rows go by, so memory use doesn't grow with the number of guests.
+
+    Args:
+        sink (report_sinks.ReportSink): Where the report is written.
+        store (GuestColumns): Guests to report on instead of the database.
+
+    Returns:
+        dict: Totals for "members", "guests", "staff", "fees" and "attendees".
+    """
+    setup_locale()
+    sink.start("Attendee List", ATTENDEE_COLUMNS, ATTENDEE_WIDTHS)
+    try:
+        totals = stream_attendee_rows(sink, store=store)
+    except Exception as err:
+        # Ends the sink, e.g. so a widget sink stops polling for rows that will never come
+        sink.fail(err)
+        raise
+    sink.finish(attendee_summary(totals))
+
+    return totals
+
+def generate_attendee_report(store=None):
+    output = io.StringIO()
+    totals = stream_attendee_report(TextSink(output), store)
+    if not totals["attendees"]:
+        return "No guests found."
 
-    return "\n".join(report)
+    return output.getvalue()
 
-def generate_menu_report():
-    guests = database.list_guests()
-    if not guests:
-        return "No guests found."
+def export_attendee_report(path, store=None):
+    """
+    Write the attendee list to a file, choosing text, CSV or HTML output from the file extension.
+
+    Args:
+        path (str): The file to write.
+        store (GuestColumns): Guests to report on instead of the database.
+
+    Returns:
+        dict: The report totals.
+    """
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        return stream_attendee_report(sink_for_path(path, file), store)
 
-    menu_count = {
-        "BEEF": 0,
-        "CHICKEN": 0,
-        "FISH": 0,
-        "PORK": 0,
-        "PASTA": 0,
-        "VEGAN": 0
-    }
-
-    for guest in guests:
-        menu_item = guest[5]
+def menu_counts(store=None):
+    """
+    Count each menu item with a GROUP BY menu_item query.
+
+    Args:
+        store (GuestColumns): Guests to count instead of the database.
+
+    Returns:
+        dict: Guest count for every item in MENU_ITEMS, or None if the query failed.
+    """
+    rows = _aggregate(("menu_item",), store)
+    if rows is None:
+        return None
+
+    menu_count = dict.fromkeys(MENU_ITEMS, 0)
+    for menu_item, count, _ in rows:
         if menu_item in menu_count:
-            menu_count[menu_item] += 1
+            menu_count[menu_item] += count
+
+    return menu_count
+
+def generate_menu_report(store=None):
+    menu_count = menu_counts(store)
+    if not menu_count or not any(menu_count.values()):
+        return "No guests found."
 
     report = ["** Menu Report **"]
     report.append("-" * 14)
@@ -80,3 +189,27 @@ def generate_menu_report():
     report.append("-" * 14)
 
     return "\n".join(report)
+
+def generate_menu_by_type_report(store=None):
+    rows = _aggregate(("member_type", "menu_item"), store)
+    if not rows:
+        return "No guests found."
+
+    # One row per member type, one column per menu item
+    breakdown = {}
+    for type_, menu_item, count, _ in rows:
+        breakdown.setdefault(type_, dict.fromkeys(MENU_ITEMS, 0))
+        if menu_item in MENU_ITEMS:
+            breakdown[type_][menu_item] += count
+
+    width = 25 + 10 * len(MENU_ITEMS)
+    report = ["** Menu by Member Type Report **"]
+    report.append("-" * width)
+    report.append("| " + "Type".ljust(21) + " |" + "".join(f" {item.ljust(7)} |" for item in MENU_ITEMS))
+    report.append("-" * width)
+    for type_, counts in breakdown.items():
+        report.append(f"| {type_.ljust(21)} |" + "".join(f" {str(counts[item]).ljust(7)} |" for item in MENU_ITEMS))
+
+    report.append("-" * width)
+
+    return "\n".join(report)
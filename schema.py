@@ -0,0 +1,167 @@
+# schema.py
+#!/usr/env/bin python3
+
+"""
+Creates and upgrades the guest table, and checks that the app's queries are served by indexes.
+
+Each migration has a version number; the versions already applied are recorded in the schema_version
+table, so migrate() only runs what is missing and is safe to call at every start-up. The table it builds
+has fixed-point fees, member types and menu items as text, and indexes on (member_type), (menu_item),
+(l_name, party_id) and (f_name) to match the filters, counts, name order and name searches in database.py.
+
+    python schema.py migrate   - apply pending migrations
+    python schema.py status    - show applied migrations
+    python schema.py check     - EXPLAIN the app's queries and flag full table and index scans
+"""
+import sys
+
+import database
+import live_sync
+import summaries
+import write_behind
+
+VERSION_TABLE = "schema_version"
+
+
+def _create_table():
+    return database.get_backend().table_statements(database.TABLE_NAME)
+
+
+def _column_types():
+    return database.get_backend().column_type_statements(database.TABLE_NAME)
+
+
+def _indexes():
+    backend = database.get_backend()
+    result = database.run_query(backend.index_names_query(), (database.TABLE_NAME,))
+    existing = {row[0] for row in result[1]} if result else set()
+    return backend.index_statements(database.TABLE_NAME, existing)
+
+
+def _text_categories_and_name_indexes():
+    return _column_types() + _indexes()
+
+
+# (version, description, function returning the statements to run)
+MIGRATIONS = [
+    (1, "create guest table", _create_table),
+    (2, "use fixed-point fees and fixed column types", _column_types),
+    (3, "index member_type, menu_item and names", _indexes),
+    (4, "add change log for live sync", live_sync.change_log_statements),
+    (5, "materialize guest summary", summaries.summary_statements),
+    (6, "record idempotency keys of journaled additions", write_behind.request_table_statements),
+    (7, "record station positions in the change log", live_sync.position_table_statements),
+    (8, "store categories as text, index (l_name, party_id) and f_name", _text_categories_and_name_indexes),
+]
+
+# The app's queries, with sample parameters, as run by database.py
+APP_QUERIES = [
+    ("guest by id", f"SELECT {database.SELECT_COLUMNS} FROM {database.TABLE_NAME} WHERE party_id = %s", (1,)),
+    ("page by id", f"SELECT {database.SELECT_COLUMNS} FROM {database.TABLE_NAME} WHERE party_id > %s ORDER BY party_id ASC LIMIT %s", (0, 100)),
+    ("page by name", f"SELECT {database.SELECT_COLUMNS} FROM {database.TABLE_NAME} ORDER BY l_name ASC, party_id ASC LIMIT %s", (100,)),
+    ("filter member type", f"SELECT {database.SELECT_COLUMNS} FROM {database.TABLE_NAME} WHERE member_type = %s ORDER BY party_id ASC LIMIT %s", ("Member", 100)),
+    ("filter menu item", f"SELECT {database.SELECT_COLUMNS} FROM {database.TABLE_NAME} WHERE menu_item = %s ORDER BY party_id ASC LIMIT %s", ("FISH", 100)),
+    ("name search", f"SELECT {database.SELECT_COLUMNS} FROM {database.TABLE_NAME} WHERE (f_name LIKE %s ESCAPE '!' OR l_name LIKE %s ESCAPE '!') "
+                    f"ORDER BY l_name ASC, party_id ASC LIMIT %s", ("Smi%", "Smi%", 100)),
+    ("count by member type", f"SELECT member_type, COUNT(*), COALESCE(SUM(amt_paid), 0) FROM {database.TABLE_NAME} GROUP BY member_type ORDER BY member_type", ()),
+    ("count by menu item", f"SELECT menu_item, COUNT(*), COALESCE(SUM(amt_paid), 0) FROM {database.TABLE_NAME} GROUP BY menu_item ORDER BY menu_item", ()),
+    ("changes since", f"SELECT change_id, party_id, op FROM {database.CHANGE_TABLE} WHERE change_id > %s ORDER BY change_id LIMIT %s", (0, 100)),
+]
+
+
+def applied_versions():
+    """
+    Returns:
+        dict: Description of every applied migration, keyed by version. Empty if none have run.
+    """
+    database.run_statements([
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        f"version INT NOT NULL PRIMARY KEY, description VARCHAR(100) NOT NULL, "
+        f"applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ])
+    result = database.run_query(f"SELECT version, description FROM {VERSION_TABLE} ORDER BY version")
+    return {row[0]: row[1] for row in result[1]} if result else {}
+
+
+def migrate():
+    """
+    Apply every migration that hasn't been applied yet, in order. Stops at the first failure.
+
+    Returns:
+        bool: True if the schema is up to date, False if a migration failed.
+    """
+    applied = applied_versions()
+
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+
+        record = f"INSERT INTO {VERSION_TABLE} (version, description) VALUES ({version}, '{description}')"
+        if not database.run_statements(statements() + [record]):
+            print(f"Schema migration {version} ({description}) failed.")
+            return False
+        print(f"Applied schema migration {version}: {description}")
+
+    summaries.ready = True
+    return True
+
+
+# How bad each kind of plan step is, worst last
+SCAN_KINDS = ["lookup", "index scan", "full scan"]
+
+
+def check_queries():
+    """
+    EXPLAIN each of the app's queries and report the worst way it reads its table.
+
+    Returns:
+        list: List of tuples (query name, "lookup", "index scan" or "full scan" (None if EXPLAIN failed), plan rows).
+    """
+    backend = database.get_backend()
+    results = []
+
+    for name, query, params in APP_QUERIES:
+        result = database.run_query(backend.explain(query), params)
+        if result is None:
+            results.append((name, None, []))
+            continue
+        columns, plan = result
+        kinds = [backend.scan_kind(columns, row) for row in plan] or ["lookup"]
+        results.append((name, max(kinds, key=SCAN_KINDS.index), plan))
+
+    return results
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+
+    if command == "migrate":
+        sys.exit(0 if migrate() else 1)
+
+    elif command == "status":
+        applied = applied_versions()
+        for version, description, _ in MIGRATIONS:
+            state = "applied" if version in applied else "pending"
+            print(f"{version:>3}  {state:<8} {description}")
+
+    elif command == "check":
+        full_scans = 0
+        for name, kind, plan in check_queries():
+            if kind is None:
+                print(f"{'ERROR':<11} {name}")
+                continue
+            print(f"{kind.upper() if kind == 'full scan' else kind:<11} {name}")
+            if kind != "lookup":
+                for row in plan:
+                    print(f"{'':<11} {row}")
+            if kind == "full scan":
+                full_scans += 1
+        sys.exit(1 if full_scans else 0)
+
+    else:
+        print("Usage: python schema.py [migrate|status|check]")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
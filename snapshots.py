@@ -0,0 +1,300 @@
+# snapshots.py
+#!/usr/env/bin python3
+
+"""
+Snapshots of the guest table in a compact binary column format, for archiving an event and reporting
+on it later without a database.
+
+A snapshot file holds the same columns as guest_store.GuestColumns: party ids (int64) and fees
+(float64) as fixed-width arrays, member types and menu items as one-byte codes into a small dictionary
+stored in the file, and first and last names as UTF-8 text with an offsets array. Every column starts on
+an 8-byte boundary, so load() memory-maps the file and uses the columns in place: opening an archive of
+a large event reads only the header, and numbers are read straight from the page cache.
+
+Snapshots written to a ".csv" path are plain CSV instead, streamed one row at a time, for other tools.
+
+File layout (little-endian):
+        HEADER     - Magic, format version, number of sections and number of guests
+        DIRECTORY  - (offset, length) in bytes of each section in SECTIONS
+        SECTIONS   - The column data, each padded to 8 bytes
+
+Variables:
+        SUFFIX     - The usual extension for snapshot files
+"""
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import database
+import guest_management
+from guest_store import Categories, GuestColumns
+
+SUFFIX = ".ppsnap"
+
+MAGIC = b"PPSNAP\r\n"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+ENTRY = struct.Struct("<QQ")
+ALIGNMENT = 8
+
+# Section name and array type code; None for the dictionary of member types and menu items (JSON)
+SECTIONS = (
+    ("party_ids", "q"),
+    ("amt_paid", "d"),
+    ("member_type_codes", "B"),
+    ("menu_item_codes", "B"),
+    ("f_name_offsets", "I"),
+    ("f_names", "B"),
+    ("l_name_offsets", "I"),
+    ("l_names", "B"),
+    ("categories", None),
+)
+
+
+def _encode_strings(values):
+    """
+    Returns:
+        tuple: (offsets array with one more entry than values, UTF-8 bytes of every value back to back).
+    """
+    offsets = array("I", [0])
+    blob = bytearray()
+    for value in values:
+        blob += value.encode("utf-8")
+        # Raises OverflowError past 4 GB of names, far beyond any event
+        offsets.append(len(blob))
+    return offsets, blob
+
+
+def _little_endian(column):
+    if sys.byteorder != "little" and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def _write_binary(path, store):
+    f_offsets, f_names = _encode_strings(store.f_names)
+    l_offsets, l_names = _encode_strings(store.l_names)
+    categories = json.dumps({"member_types": store.member_types.values,
+                             "menu_items": store.menu_items.values}).encode("utf-8")
+    sections = [store.party_ids, store.amt_paid, store.member_type_codes, store.menu_item_codes,
+                f_offsets, f_names, l_offsets, l_names, categories]
+
+    # Written to a temporary file first, so an interrupted save never leaves a half-written snapshot
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        position = HEADER.size + ENTRY.size * len(SECTIONS)
+        file.write(b"\0" * position)
+        directory = []
+        for data in sections:
+            if isinstance(data, array):
+                data = _little_endian(data)
+            data = memoryview(data).cast("B")
+            padding = -position % ALIGNMENT
+            file.write(b"\0" * padding)
+            position += padding
+            directory.append((position, len(data)))
+            file.write(data)
+            position += len(data)
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, len(SECTIONS), len(store)))
+        for entry in directory:
+            file.write(ENTRY.pack(*entry))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(database.GUEST_COLUMNS)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def save(path, store=None):
+    """
+    Write a snapshot of the guest list.
+
+    Args:
+        path (str): The file to write. A ".csv" path gets CSV, anything else the binary format.
+        store (GuestColumns): Guests already in memory. Defaults to every guest, read from the local replica
+                              when there is one, otherwise the database.
+
+    Returns:
+        int: Number of guests written.
+    """
+    if path.lower().endswith(".csv"):
+        # Streamed straight from the database when there's no store, so memory use stays flat
+        return _write_csv(path, store.rows() if store is not None else guest_management.iter_guests())
+
+    if store is None:
+        store = GuestColumns(guest_management.iter_guests())
+    _write_binary(path, store)
+    return len(store)
+
+
+class _Strings:
+    """
+    A read-only sequence of strings decoded on access from UTF-8 bytes and an offsets array.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class Snapshot(GuestColumns):
+    """
+    A snapshot file opened as a read-only GuestColumns. The columns are views of the memory-mapped file,
+    so reports and analytics read the file in place instead of loading it.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): A file written by save().
+
+        Raises:
+            ValueError: If the file isn't a snapshot or was written by a newer version.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path} is not a guest snapshot")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, self._count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a guest snapshot")
+        if version > VERSION:
+            self._map.close()
+            raise ValueError(f"{path} was written by a newer version (format {version})")
+
+        buffer = memoryview(self._map)
+        self._views = [buffer]
+        sections = {}
+        for number, (name, typecode) in enumerate(SECTIONS[:count]):
+            offset, length = ENTRY.unpack_from(self._map, HEADER.size + number * ENTRY.size)
+            view = buffer[offset:offset + length]
+            if typecode is not None:
+                view = view.cast(typecode)
+                if sys.byteorder != "little" and view.itemsize > 1:
+                    # Only big-endian machines pay for a copy
+                    view = array(typecode, view.tobytes())
+                    view.byteswap()
+                else:
+                    self._views.append(view)
+            sections[name] = view
+
+        categories = json.loads(bytes(sections["categories"]))
+        self.member_types = Categories(categories["member_types"])
+        self.menu_items = Categories(categories["menu_items"])
+        self.party_ids = sections["party_ids"]
+        self.amt_paid = sections["amt_paid"]
+        self.member_type_codes = sections["member_type_codes"]
+        self.menu_item_codes = sections["menu_item_codes"]
+        self.f_names = _Strings(sections["f_name_offsets"], sections["f_names"])
+        self.l_names = _Strings(sections["l_name_offsets"], sections["l_names"])
+
+    def __len__(self):
+        return self._count
+
+    def append(self, row):
+        raise TypeError("Snapshots are read-only; load them into a GuestColumns to change them")
+
+    def memory_bytes(self):
+        """
+        Returns:
+            int: Size of the mapped file; pages are only read into memory as they are used.
+        """
+        return len(self._map)
+
+    def close(self):
+        """
+        Unmap the file. Columns read from the snapshot can't be used afterwards.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self.f_names = self.l_names = None
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        for row in reader:
+            yield (int(row[0]), row[1], row[2], row[3], float(row[4]), row[5])
+
+
+def load(path):
+    """
+    Open a snapshot for reporting.
+
+    Args:
+        path (str): A snapshot written by save(), binary or CSV.
+
+    Returns:
+        GuestColumns: The guests (a memory-mapped Snapshot for binary files), or None if the file
+                      couldn't be read.
+    """
+    try:
+        if path.lower().endswith(".csv"):
+            return GuestColumns(_read_csv(path))
+        return Snapshot(path)
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        print(f"Error reading snapshot {path}: {e}")
+        return None
+
+
+def restore(path):
+    """
+    Add every guest in a snapshot to the database in use, e.g. to reopen an archived event.
+    Guests get new party ids.
+
+    Args:
+        path (str): A snapshot written by save(), binary or CSV.
+
+    Returns:
+        tuple: (number of guests added, list of (row_number, error message) for rows that were skipped),
+               or None if the snapshot couldn't be read.
+    """
+    store = load(path)
+    if store is None:
+        return None
+    try:
+        return database.add_guests(row[1:] for row in store.rows())
+    finally:
+        if isinstance(store, Snapshot):
+            store.close()
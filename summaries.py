@@ -0,0 +1,131 @@
+# summaries.py
+#!/usr/env/bin python3
+
+"""
+A materialized summary of the guest table: one row per member type and menu item holding the guest count
+and total fees.
+
+Triggers on the guest table adjust the matching summary row by the difference on every insert, update and
+delete, whichever station or function made the change, so the menu, menu by type and total figures in
+the reports read a few dozen summary rows instead of grouping every guest. reconcile() recounts from the
+guest table and rebuilds the summary if it has drifted (e.g. after rows were changed with triggers off).
+"""
+import database
+
+# Milliseconds between reconcile checks in the GUI
+RECONCILE_MS = 10 * 60 * 1000
+# Largest fee difference treated as rounding rather than drift
+FEE_TOLERANCE = 0.005
+
+# Set once the summary table and triggers exist (see schema.migrate); until then reads use the guest table
+ready = False
+
+
+def summary_statements():
+    """
+    Build the statements that create the summary table and its triggers for the backend in use, then fill it.
+
+    Returns:
+        list: SQL statements, safe to run more than once.
+    """
+    table = database.TABLE_NAME
+    summary = database.SUMMARY_TABLE
+    columns = f"INSERT INTO {summary} (member_type, menu_item, guest_count, fees)"
+    remove = (f"UPDATE {summary} SET guest_count = guest_count - 1, fees = fees - OLD.amt_paid "
+              f"WHERE member_type = OLD.member_type AND menu_item = OLD.menu_item")
+
+    if database.backend_name() == "sqlite":
+        add = (f"{columns} VALUES (NEW.member_type, NEW.menu_item, 1, NEW.amt_paid) "
+               f"ON CONFLICT (member_type, menu_item) DO UPDATE SET guest_count = guest_count + 1, fees = fees + excluded.fees")
+        statements = [
+            f"CREATE TABLE IF NOT EXISTS {summary} ("
+            f"member_type TEXT NOT NULL, menu_item TEXT NOT NULL, guest_count INTEGER NOT NULL DEFAULT 0, "
+            f"fees REAL NOT NULL DEFAULT 0, PRIMARY KEY (member_type, menu_item))",
+        ]
+        triggers = [
+            ("sum_ai", "INSERT", f"BEGIN {add}; END"),
+            ("sum_au", "UPDATE OF member_type, menu_item, amt_paid", f"BEGIN {remove}; {add}; END"),
+            ("sum_ad", "DELETE", f"BEGIN {remove}; END"),
+        ]
+    else:
+        add = (f"{columns} VALUES (NEW.member_type, NEW.menu_item, 1, NEW.amt_paid) "
+               f"ON DUPLICATE KEY UPDATE guest_count = guest_count + 1, fees = fees + NEW.amt_paid")
+        statements = [
+            f"CREATE TABLE IF NOT EXISTS {summary} ("
+            f"member_type VARCHAR(50) NOT NULL, menu_item VARCHAR(20) NOT NULL, guest_count INT NOT NULL DEFAULT 0, "
+            f"fees DECIMAL(12, 2) NOT NULL DEFAULT 0, PRIMARY KEY (member_type, menu_item))",
+        ]
+        triggers = [
+            ("sum_ai", "INSERT", f"FOR EACH ROW {add}"),
+            ("sum_au", "UPDATE", f"FOR EACH ROW BEGIN {remove}; {add}; END"),
+            ("sum_ad", "DELETE", f"FOR EACH ROW {remove}"),
+        ]
+
+    for suffix, event, body in triggers:
+        statements.append(f"DROP TRIGGER IF EXISTS {table}_{suffix}")
+        statements.append(f"CREATE TRIGGER {table}_{suffix} AFTER {event} ON {table} {body}")
+    return statements + rebuild_statements()
+
+
+def rebuild_statements():
+    """
+    Returns:
+        list: Statements replacing the summary with fresh totals from the guest table.
+    """
+    return [
+        f"DELETE FROM {database.SUMMARY_TABLE}",
+        f"INSERT INTO {database.SUMMARY_TABLE} (member_type, menu_item, guest_count, fees) "
+        f"SELECT member_type, menu_item, COUNT(*), COALESCE(SUM(amt_paid), 0) FROM {database.TABLE_NAME} "
+        f"GROUP BY member_type, menu_item",
+    ]
+
+
+def aggregate(group_by=()):
+    """
+    Count guests and total their fees per group from the summary, falling back to grouping the guest
+    table if the summary isn't installed or can't be read.
+
+    Args:
+        group_by (tuple): Columns to group by, any of database.GROUP_COLUMNS.
+
+    Returns:
+        list: List of tuples (*group values, guest count, total amt_paid), or None if both reads failed.
+    """
+    if ready:
+        rows = database.summary_aggregate(group_by)
+        if rows is not None:
+            return rows
+    return database.aggregate_guests(group_by)
+
+
+def reconcile(fix=True):
+    """
+    Compare the summary with a fresh count of the guest table.
+
+    Args:
+        fix (bool): Rebuild the summary if any group differs.
+
+    Returns:
+        list: List of tuples (member_type, menu_item, (summary count, summary fees), (actual count, actual fees))
+              for every group that differs, empty if none do, or None if either read failed.
+    """
+    actual = database.aggregate_guests(("member_type", "menu_item"))
+    stored = database.summary_aggregate(("member_type", "menu_item"))
+    if actual is None or stored is None:
+        return None
+
+    actual = {(row[0], row[1]): (row[2], row[3]) for row in actual}
+    stored = {(row[0], row[1]): (row[2], row[3]) for row in stored}
+
+    drift = []
+    for group in sorted(set(actual) | set(stored)):
+        have = stored.get(group, (0, 0.0))
+        want = actual.get(group, (0, 0.0))
+        if have[0] != want[0] or abs(have[1] - want[1]) > FEE_TOLERANCE:
+            drift.append(group + (have, want))
+
+    if drift:
+        print(f"Guest summary has drifted in {len(drift)} group(s).")
+        if fix and database.run_statements(rebuild_statements()):
+            print("Guest summary rebuilt.")
+    return drift
@@ -0,0 +1,276 @@
+# write_behind.py
+#!/usr/env/bin python3
+
+"""
+Write-behind for guest additions, so check-in at the door never waits for the database.
+
+A new guest is written to a journal on the local disk (a small SQLite file, committed before the call
+returns) and acknowledged at once. A background flusher sends pending entries to the guest table in
+batches and marks them flushed. Every entry carries an idempotency key that is stored with the guest
+in the same transaction, so a retry after a timeout, lost acknowledgement or crash never adds a guest twice.
+
+Variables:
+        JOURNAL_PATH   - The journal file (can be set with the PARTYPLANNER_JOURNAL environment variable)
+        ENABLED        - Whether the GUI queues additions (set PARTYPLANNER_WRITE_BEHIND=off to add them directly)
+        FLUSH_INTERVAL - Seconds between flushes when nothing wakes the flusher sooner
+        FLUSH_BATCH    - The maximum number of entries sent per flush
+        MAX_BACKOFF    - The longest wait in seconds between retries while the database is unreachable
+        MAX_ATTEMPTS   - The number of times the server may reject an entry before it is marked failed
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import database
+
+JOURNAL_PATH = os.environ.get("PARTYPLANNER_JOURNAL", "partyplanner_journal.db")
+ENABLED = os.environ.get("PARTYPLANNER_WRITE_BEHIND", "on") != "off"
+FLUSH_INTERVAL = 2.0
+FLUSH_BATCH = 200
+MAX_BACKOFF = 60.0
+MAX_ATTEMPTS = 5
+
+
+def request_table_statements():
+    """
+    Returns:
+        list: Statements creating the table of applied idempotency keys, safe to run more than once.
+    """
+    return [
+        f"CREATE TABLE IF NOT EXISTS {database.REQUEST_TABLE} ("
+        f"request_key VARCHAR(36) NOT NULL PRIMARY KEY, "
+        f"applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ]
+
+
+class GuestJournal:
+    """
+    A durable local queue of guest additions. Entries are "pending" until flushed, then "flushed",
+    or "failed" if the server keeps rejecting them.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        """
+        Args:
+            path (str): Journal file, or ":memory:" for a journal that doesn't survive restarts.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        # FULL makes each acknowledged entry survive a power cut
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, request_key TEXT NOT NULL UNIQUE, "
+            "f_name TEXT NOT NULL, l_name TEXT NOT NULL, member_type TEXT NOT NULL, amt_paid REAL NOT NULL, "
+            "menu_item TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+            "last_error TEXT, created_at REAL NOT NULL, flushed_at REAL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS journal_state ON journal (state, seq)")
+        self._connection.commit()
+
+    def append(self, row, key=None):
+        """
+        Record a guest addition.
+
+        Args:
+            row (tuple): Tuple containing guest information (f_name, l_name, member_type, amt_paid, menu_item).
+            key (str): Idempotency key. Defaults to a new random key; pass the same key to make a repeated
+                       submission of one form a no-op.
+
+        Returns:
+            str: The entry's key.
+        """
+        key = key or str(uuid.uuid4())
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO journal (request_key, f_name, l_name, member_type, amt_paid, menu_item, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, row[0], row[1], row[2], float(row[3] or 0), row[4], time.time()))
+            self._connection.commit()
+        return key
+
+    def pending(self, limit=FLUSH_BATCH):
+        """
+        Returns:
+            list: Up to limit pending entries, oldest first, as tuples (key, (f_name, l_name, member_type, amt_paid, menu_item)).
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT request_key, f_name, l_name, member_type, amt_paid, menu_item FROM journal "
+                "WHERE state = 'pending' ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        return [(row[0], tuple(row[1:])) for row in rows]
+
+    def mark_flushed(self, keys):
+        """
+        Args:
+            keys (iterable): Keys of entries now in the guest table.
+        """
+        with self._lock:
+            now = time.time()
+            self._connection.executemany("UPDATE journal SET state = 'flushed', flushed_at = ? WHERE request_key = ?",
+                                         [(now, key) for key in keys])
+            self._connection.commit()
+
+    def mark_rejected(self, errors, max_attempts=MAX_ATTEMPTS):
+        """
+        Count a server rejection against each entry; entries rejected max_attempts times are marked failed.
+
+        Args:
+            errors (list): List of (key, error message) tuples.
+            max_attempts (int): Rejections allowed before an entry is given up on.
+        """
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE journal SET attempts = attempts + 1, last_error = ?, "
+                "state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE state END WHERE request_key = ?",
+                [(message, max_attempts, key) for key, message in errors])
+            self._connection.commit()
+
+    def counts(self):
+        """
+        Returns:
+            dict: Number of "pending", "flushed" and "failed" entries.
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT state, COUNT(*) FROM journal GROUP BY state").fetchall()
+        counts = {"pending": 0, "flushed": 0, "failed": 0}
+        counts.update(rows)
+        return counts
+
+    def failures(self):
+        """
+        Returns:
+            list: Failed entries as tuples (key, (f_name, l_name, member_type, amt_paid, menu_item), last error).
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT request_key, f_name, l_name, member_type, amt_paid, menu_item, last_error FROM journal "
+                "WHERE state = 'failed' ORDER BY seq").fetchall()
+        return [(row[0], tuple(row[1:6]), row[6]) for row in rows]
+
+    def prune(self, older_than=24 * 60 * 60):
+        """
+        Forget flushed entries.
+
+        Args:
+            older_than (float): Only drop entries flushed at least this many seconds ago.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            cursor = self._connection.execute("DELETE FROM journal WHERE state = 'flushed' AND flushed_at < ?",
+                                              (time.time() - older_than,))
+            self._connection.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class Flusher:
+    """
+    Sends pending journal entries to the database on a background thread, backing off while it is unreachable.
+    """
+
+    def __init__(self, journal, interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH):
+        """
+        Args:
+            journal (GuestJournal): The journal to drain.
+            interval (float): Seconds between flushes when nothing calls wake().
+            batch_size (int): Maximum number of entries sent per batch.
+        """
+        self.journal = journal
+        self.interval = interval
+        self.batch_size = batch_size
+        self.subscribers = []
+        self.backoff = 0.0
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """
+        Register a function to hear about flushes.
+
+        Args:
+            callback (callable): Called on the flusher thread with (flushed keys, journal.counts()) after every
+                                 flush that sent something or failed.
+        """
+        self.subscribers.append(callback)
+
+    def start(self):
+        """
+        Start the background thread, if it isn't running.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="guest-journal-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the background thread, after it has tried one last flush.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """
+        Flush as soon as possible, e.g. right after an entry is appended.
+        """
+        self._wake.set()
+
+    def flush(self):
+        """
+        Send every pending entry now, in batches.
+
+        Returns:
+            bool: True if the journal was drained, False if the database could not be reached.
+        """
+        with self._flush_lock:
+            flushed = []
+            reachable = True
+            while True:
+                entries = self.journal.pending(self.batch_size)
+                if not entries:
+                    break
+                result = database.add_guests_once(entries)
+                if result is None:
+                    reachable = False
+                    self.last_error = "database unreachable"
+                    break
+                applied, errors = result
+                self.journal.mark_flushed(applied)
+                self.journal.mark_rejected(errors)
+                flushed.extend(applied)
+                if errors:
+                    # Rejected rows stay pending until they run out of attempts; retry them next time
+                    break
+
+            if reachable:
+                self.last_error = None
+            if flushed or not reachable:
+                counts = self.journal.counts()
+                for callback in self.subscribers:
+                    callback(flushed, counts)
+            return reachable
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.backoff or self.interval)
+            self._wake.clear()
+            if self.flush():
+                self.backoff = 0.0
+            else:
+                self.backoff = min(MAX_BACKOFF, (self.backoff or self.interval) * 2)
+        self.flush()